@@ -1,42 +1,168 @@
-from django.contrib import admin
-from .models import GymClass, TimeSlot, Booking, ContactMessage
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.utils import timezone
+
+from .export import CONTENT_TYPES, iter_export
+from .forms import CapacityForm, RecurrenceForm
+from .models import GymClass, TimeSlot, Booking, ContactMessage, EmailOutbox, ArchivedBooking, WaitlistEntry
+from .routers import ReplicaChangeListMixin
+from .scheduling import generate_time_slots
+from .waitlist import promote_waitlist
 
 @admin.register(GymClass)
-class GymClassAdmin(admin.ModelAdmin):
+class GymClassAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ('name', 'class_type', 'instructor', 'duration_minutes', 'is_active')
     list_filter = ('class_type', 'is_active')
     search_fields = ('name', 'instructor')
     list_per_page = 20
+    actions = ['generate_timeslots']
+
+    @admin.action(description='Generate recurring time slots')
+    def generate_timeslots(self, request, queryset):
+        form = RecurrenceForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            data = form.cleaned_data
+            generated, created, seconds = generate_time_slots(
+                queryset, data['weekdays'], data['times'], data['start_date'], data['end_date'],
+                capacity=data['capacity'],
+            )
+            self.message_user(
+                request,
+                f"Created {created} of {generated} time slots in {seconds:.2f}s.",
+                messages.SUCCESS,
+            )
+            return None
+        return TemplateResponse(request, 'admin/bookings/gymclass/generate_timeslots.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Generate recurring time slots',
+            'opts': self.model._meta,
+            'form': form,
+            'queryset': queryset,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
 
 @admin.register(TimeSlot)
-class TimeSlotAdmin(admin.ModelAdmin):
+class TimeSlotAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ('gym_class', 'start_time', 'end_time', 'available_spots', 'is_available')
     list_filter = ('gym_class', 'is_available')
     date_hierarchy = 'start_time'
     list_per_page = 20
+    actions = ['add_capacity']
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('gym_class')
 
+    def save_model(self, request, obj, form, change):
+        if 'available_spots' in form.changed_data and 'capacity' not in form.changed_data:
+            # Editing the free spots resizes the slot; record it so
+            # reconcile_capacity keeps the new size
+            active = obj.bookings.filter(status__in=['PENDING', 'CONFIRMED']).count() if change else 0
+            obj.capacity = max(obj.available_spots, 0) + active
+        super().save_model(request, obj, form, change)
+        if change and 'available_spots' in form.changed_data:
+            promote_waitlist([obj.pk])
+
+    @admin.action(description='Add capacity and promote waitlists')
+    def add_capacity(self, request, queryset):
+        form = CapacityForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            time_slot_ids = list(queryset.values_list('pk', flat=True))
+            with transaction.atomic():
+                # One UPDATE for every slot, then one promotion pass over all of them
+                TimeSlot.objects.add_spots(time_slot_ids, form.cleaned_data['extra_spots'])
+                promoted = promote_waitlist(time_slot_ids)
+            self.message_user(
+                request,
+                f"Added {form.cleaned_data['extra_spots']} spots to {len(time_slot_ids)} time slots "
+                f"and promoted {len(promoted)} waitlisted members.",
+                messages.SUCCESS,
+            )
+            return None
+        return TemplateResponse(request, 'admin/bookings/timeslot/add_capacity.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Add capacity',
+            'opts': self.model._meta,
+            'form': form,
+            'queryset': queryset,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
+
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ('booking_reference', 'full_name', 'email', 'gym_class', 'status', 'created_at')
-    list_filter = ('status', 'gym_class', 'created_at')
+    list_filter = ('status', 'gym_class', ('time_slot__start_time', admin.DateFieldListFilter), 'created_at')
     search_fields = ('first_name', 'last_name', 'email', 'booking_reference')
     readonly_fields = ('booking_reference', 'created_at', 'updated_at')
     list_per_page = 20
+    actions = ['export_csv', 'export_jsonl']
 
     def full_name(self, obj):
         return f"{obj.first_name} {obj.last_name}"
     full_name.short_description = 'Name'
+
+    @admin.action(description='Export selected bookings as CSV')
+    def export_csv(self, request, queryset):
+        return self._export(queryset, 'csv')
+
+    @admin.action(description='Export selected bookings as JSON lines')
+    def export_jsonl(self, request, queryset):
+        return self._export(queryset, 'jsonl')
+
+    def _export(self, queryset, export_format):
+        # Streamed in primary key chunks; "select all" over millions of rows
+        # never holds more than one chunk in memory.
+        response = StreamingHttpResponse(
+            iter_export(queryset, export_format), content_type=CONTENT_TYPES[export_format]
+        )
+        filename = f"bookings-{timezone.now():%Y%m%d-%H%M%S}.{export_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('gym_class', 'time_slot')
 
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = ('email', 'time_slot', 'status', 'booking_reference', 'created_at', 'promoted_at')
+    list_filter = ('status', 'gym_class')
+    search_fields = ('email', 'booking_reference')
+    readonly_fields = ('booking_reference', 'created_at', 'promoted_at')
+    list_per_page = 20
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('time_slot__gym_class')
+
 @admin.register(ContactMessage)
-class ContactMessageAdmin(admin.ModelAdmin):
+class ContactMessageAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
     list_display = ('name', 'email', 'is_read', 'created_at')
     list_filter = ('is_read', 'created_at')
     search_fields = ('name', 'email', 'message')
     readonly_fields = ('created_at',)
     list_per_page = 20
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject',)
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+    list_per_page = 20
+
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(ReplicaChangeListMixin, admin.ModelAdmin):
+    list_display = ('booking_reference', 'email', 'gym_class', 'status', 'created_at', 'archived_at')
+    list_filter = ('status', 'gym_class')
+    search_fields = ('email', 'booking_reference')
+    list_per_page = 20
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('gym_class', 'time_slot')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
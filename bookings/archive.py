@@ -0,0 +1,95 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedBooking, ArchivedTimeSlot, Booking, TimeSlot
+
+DEFAULTS = {
+    'RETENTION_DAYS': 365,
+    'BATCH_SIZE': 500,
+    # Sleep between batches to leave room for live traffic
+    'PAUSE_SECONDS': 0,
+}
+
+TIME_SLOT_FIELDS = (
+    'id', 'gym_class_id', 'start_time', 'end_time', 'capacity', 'available_spots', 'is_available', 'updated_at',
+)
+BOOKING_FIELDS = (
+    'id', 'booking_reference', 'first_name', 'last_name', 'email', 'phone', 'gym_class_id',
+    'time_slot_id', 'status', 'special_requests', 'created_at', 'updated_at',
+)
+
+
+def get_archive_settings():
+    return {**DEFAULTS, **getattr(settings, 'BOOKING_ARCHIVE', {})}
+
+
+def complete_past_bookings(batch_size, now=None):
+    """
+    Mark confirmed bookings of finished slots as COMPLETED, ``batch_size``
+    rows per transaction. Returns the number of bookings updated.
+    """
+    now = now or timezone.now()
+    completed = 0
+    while True:
+        pks = list(
+            Booking.objects.filter(status='CONFIRMED', time_slot__end_time__lt=now)
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return completed
+        # The status filter is repeated so a booking cancelled meanwhile is left alone
+        completed += Booking.objects.filter(pk__in=pks, status='CONFIRMED').update(
+            status='COMPLETED', updated_at=now
+        )
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Move up to ``batch_size`` slots that ended before ``cutoff``, with all
+    their bookings, into the archive tables in one short transaction.
+    Returns ``(time_slots, bookings)`` moved.
+    """
+    with transaction.atomic():
+        time_slots = list(
+            TimeSlot.objects.filter(end_time__lt=cutoff).order_by('end_time', 'id')
+            .values(*TIME_SLOT_FIELDS)[:batch_size]
+        )
+        if not time_slots:
+            return 0, 0
+        time_slot_ids = [slot['id'] for slot in time_slots]
+        bookings = list(Booking.objects.filter(time_slot_id__in=time_slot_ids).values(*BOOKING_FIELDS))
+
+        # ignore_conflicts keeps a rerun over rows copied by an earlier run harmless
+        ArchivedTimeSlot.objects.bulk_create(
+            [ArchivedTimeSlot(**slot) for slot in time_slots], ignore_conflicts=True
+        )
+        ArchivedBooking.objects.bulk_create(
+            [ArchivedBooking(**booking) for booking in bookings], ignore_conflicts=True
+        )
+        Booking.objects.filter(time_slot_id__in=time_slot_ids).delete()
+        TimeSlot.objects.filter(pk__in=time_slot_ids).delete()
+    return len(time_slots), len(bookings)
+
+
+def archive_before(cutoff, batch_size, pause=0):
+    """
+    Archive everything that ended before ``cutoff``, batch by batch. Each
+    batch commits on its own, so an interrupted run simply picks up where
+    it stopped. Returns ``(time_slots, bookings)`` moved.
+    """
+    total_slots = total_bookings = 0
+    while True:
+        time_slots, bookings = archive_batch(cutoff, batch_size)
+        if not time_slots:
+            return total_slots, total_bookings
+        total_slots += time_slots
+        total_bookings += bookings
+        if pause:
+            time.sleep(pause)
+
+
+def retention_cutoff(retention_days, now=None):
+    return (now or timezone.now()) - timedelta(days=retention_days)
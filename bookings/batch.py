@@ -0,0 +1,117 @@
+import uuid
+from collections import Counter
+from django.db import transaction
+from django.utils import timezone
+
+from .emails import send_batch_confirmations
+from .holds import release_lapsed_hold
+from .models import Booking, TimeSlot
+from .waitlist import leave_waitlists
+
+
+class BatchRejected(Exception):
+    """
+    Nothing was booked. ``failures`` maps item index to the reason.
+    """
+
+    def __init__(self, failures):
+        super().__init__(failures)
+        self.failures = failures
+
+
+def book_batch(items, mode='atomic'):
+    """
+    Book every item of a batch with a fixed number of queries: one locked
+    read of the slots, one duplicate check, one INSERT, one capacity UPDATE
+    per slot, one UPDATE closing waitlist entries and one outbox INSERT.
+    A member's own lapsed hold on a slot is released first, a few more
+    queries each.
+
+    In ``atomic`` mode any failing item rejects the whole batch; in
+    ``best_effort`` mode the items that fit are booked. Returns
+    ``(booked, failures)``: ``(item index, booking)`` pairs and a map of
+    item index to reason. Raises BatchRejected if nothing is booked.
+    """
+    now = timezone.now()
+    failures = {}
+    seen = set()
+    for index, item in enumerate(items):
+        key = (item['email'].lower(), item['time_slot'])
+        if key in seen:
+            failures[index] = "Duplicate of an earlier item in this batch"
+        seen.add(key)
+
+    with transaction.atomic():
+        # Locked in primary key order, so two overlapping batches queue up
+        # behind each other instead of deadlocking.
+        time_slots = {
+            time_slot.pk: time_slot
+            for time_slot in TimeSlot.objects.select_for_update(of=('self',)).select_related('gym_class')
+            .filter(pk__in={item['time_slot'] for item in items}).order_by('pk')
+        }
+        already_booked = set()
+        # The members' own holds that lapsed before the sweeper got to them
+        lapsed_holds = {}
+        for pk, email, time_slot_id, booking_status, expires_at in Booking.objects.filter(
+            time_slot_id__in=time_slots, email__in={item['email'] for item in items},
+            status__in=['PENDING', 'CONFIRMED'],
+        ).values_list('pk', 'email', 'time_slot_id', 'status', 'expires_at'):
+            if booking_status == 'PENDING' and expires_at is not None and expires_at <= now:
+                lapsed_holds[(email.lower(), time_slot_id)] = pk
+            else:
+                already_booked.add((email.lower(), time_slot_id))
+        free_spots = {
+            pk: time_slot.available_spots if time_slot.is_available else 0
+            for pk, time_slot in time_slots.items()
+        }
+
+        accepted = []
+        for index, item in enumerate(items):
+            if index in failures:
+                continue
+            time_slot = time_slots.get(item['time_slot'])
+            if time_slot is None:
+                failures[index] = "Time slot not found"
+            elif time_slot.gym_class_id != item['gym_class']:
+                failures[index] = "Time slot does not belong to this class"
+            elif not time_slot.gym_class.is_active:
+                failures[index] = "This class is not available"
+            elif time_slot.start_time < now:
+                failures[index] = "Cannot book past time slots"
+            elif (item['email'].lower(), time_slot.pk) in already_booked:
+                failures[index] = "You already have a booking for this time slot"
+            elif free_spots[time_slot.pk] + (
+                # A closed slot stays closed, even to a member whose hold lapsed
+                time_slot.is_available and (item['email'].lower(), time_slot.pk) in lapsed_holds
+            ) < 1:
+                failures[index] = "This time slot is fully booked"
+            else:
+                free_spots[time_slot.pk] -= 1
+                accepted.append((index, item, time_slot))
+
+        if not accepted or (failures and mode == 'atomic'):
+            raise BatchRejected(failures)
+
+        # Released before the INSERT, which they would otherwise trip
+        for _, item, time_slot in accepted:
+            lapsed_hold_id = lapsed_holds.get((item['email'].lower(), time_slot.pk))
+            if lapsed_hold_id:
+                release_lapsed_hold(lapsed_hold_id, now)
+
+        bookings = [
+            Booking(
+                booking_reference=f"GYM-{uuid.uuid4().hex[:8].upper()}",
+                first_name=item['first_name'], last_name=item['last_name'], email=item['email'],
+                phone=item['phone'], special_requests=item['special_requests'],
+                gym_class=time_slot.gym_class, time_slot=time_slot,
+            )
+            for _, item, time_slot in accepted
+        ]
+        Booking.objects.bulk_create(bookings)
+        for time_slot_id, count in sorted(Counter(time_slot.pk for _, _, time_slot in accepted).items()):
+            # Cannot fail: the slot is locked and was checked above
+            TimeSlot.objects.claim_spots(time_slot_id, count)
+        leave_waitlists(bookings)
+        send_batch_confirmations(bookings)
+
+    return [(index, booking) for (index, _, _), booking in zip(accepted, bookings)], failures
@@ -0,0 +1,267 @@
+import json
+import logging
+import math
+import queue
+import threading
+import time
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .metrics import QueryRecorder
+from .models import Booking, EmailOutbox, GymClass, TimeSlot
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of ``values``; 0 for an empty list.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class BookingBenchmark:
+    """
+    Seeds a tagged data set, fires concurrent requests through the full
+    Django stack and summarizes latency, throughput, queries and time spent
+    on slot row locks. Everything it creates is removed by ``cleanup``.
+    """
+
+    def __init__(self, classes=5, slots_per_class=20, seed_bookings=200, hot_capacity=20,
+                 member_bookings=50, concurrency=16, requests=200, use_cache=True):
+        self.classes = classes
+        self.slots_per_class = slots_per_class
+        self.seed_bookings = seed_bookings
+        self.hot_capacity = hot_capacity
+        self.member_bookings = member_bookings
+        self.concurrency = concurrency
+        self.requests = requests
+        self.use_cache = use_cache
+        self.tag = uuid.uuid4().hex[:8]
+        self.member_email = f'bench-{self.tag}-member@example.com'
+        self._counter = 0
+        self._counter_lock = threading.Lock()
+
+    def _email(self):
+        with self._counter_lock:
+            self._counter += 1
+            return f'bench-{self.tag}-{self._counter}@example.com'
+
+    def seed(self):
+        self.outbox_watermark = EmailOutbox.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        start = timezone.now() + timedelta(days=1)
+        GymClass.objects.bulk_create([
+            GymClass(
+                name=f'bench-{self.tag}-{index}', class_type='GROUP', description='Benchmark',
+                max_participants=max(self.hot_capacity, self.requests), instructor='Benchmark'
+            )
+            for index in range(self.classes)
+        ])
+        # Re-read rather than trust bulk_create, which cannot return ids on MySQL
+        self.gym_classes = list(GymClass.objects.filter(name__startswith=f'bench-{self.tag}-'))
+        TimeSlot.objects.bulk_create([
+            TimeSlot(
+                gym_class=gym_class,
+                start_time=start + timedelta(hours=index),
+                end_time=start + timedelta(hours=index + 1),
+                available_spots=gym_class.max_participants,
+            )
+            for gym_class in self.gym_classes
+            for index in range(self.slots_per_class + 1)
+        ])
+        slots = list(TimeSlot.objects.filter(gym_class__in=self.gym_classes).order_by('id'))
+        self.hot_slot = slots[0]
+        TimeSlot.objects.filter(pk=self.hot_slot.pk).update(available_spots=self.hot_capacity)
+        self.cold_slots = slots[1:]
+
+        # Background bookings, plus a long-standing member for my_bookings
+        bookings = []
+        for index in range(self.seed_bookings):
+            slot = self.cold_slots[index % len(self.cold_slots)]
+            bookings.append(Booking(
+                booking_reference=f'B{self.tag}{index:08d}', first_name='Bench', last_name=str(index),
+                email=self._email(), phone='0', gym_class_id=slot.gym_class_id, time_slot=slot,
+            ))
+        for index, slot in enumerate(self.cold_slots[:self.member_bookings]):
+            bookings.append(Booking(
+                booking_reference=f'M{self.tag}{index:08d}', first_name='Member', last_name=str(index),
+                email=self.member_email, phone='0', gym_class_id=slot.gym_class_id, time_slot=slot,
+            ))
+        Booking.objects.bulk_create(bookings, batch_size=1000)
+
+    def cleanup(self):
+        Booking.objects.filter(gym_class__in=self.gym_classes).delete()
+        TimeSlot.objects.filter(gym_class__in=self.gym_classes).delete()
+        GymClass.objects.filter(pk__in=[gym_class.pk for gym_class in self.gym_classes]).delete()
+        # Only the benchmark's own confirmations; other traffic shares the outbox
+        own = [
+            pk for pk, recipients in
+            EmailOutbox.objects.filter(id__gt=self.outbox_watermark).values_list('id', 'recipients').iterator()
+            if recipients and all(recipient.startswith(f'bench-{self.tag}-') for recipient in recipients)
+        ]
+        EmailOutbox.objects.filter(pk__in=own).delete()
+
+    def _booking_payload(self, time_slot):
+        return {
+            'first_name': 'Bench', 'last_name': 'Runner', 'email': self._email(), 'phone': '0',
+            'gym_class': time_slot.gym_class_id, 'time_slot': time_slot.id,
+        }
+
+    def scenarios(self):
+        booking_url = reverse('booking-list')
+        cold = self.cold_slots
+        return {
+            'hot_slot_booking': lambda i: ('post', booking_url, self._booking_payload(self.hot_slot)),
+            'cold_slot_booking': lambda i: ('post', booking_url, self._booking_payload(cold[i % len(cold)])),
+            'my_bookings': lambda i: ('get', reverse('booking-my-bookings'), {'email': self.member_email}),
+            'timeslots': lambda i: (
+                'get', reverse('timeslot-list'),
+                {'gym_class': self.gym_classes[i % len(self.gym_classes)].id}
+            ),
+        }
+
+    def _call(self, client, request):
+        method, url, data = request
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(recorder):
+                if method == 'post':
+                    response = client.post(url, data, content_type='application/json')
+                else:
+                    response = client.get(url, data)
+            status_code = response.status_code
+        except Exception:
+            status_code = 'error'
+        return time.perf_counter() - started, status_code, recorder
+
+    def _worker(self, pending, results, barrier):
+        client = Client()
+        barrier.wait()
+        try:
+            while True:
+                try:
+                    request = pending.get_nowait()
+                except queue.Empty:
+                    return
+                results.append(self._call(client, request))
+        finally:
+            connection.close()
+
+    def run_scenario(self, build_request):
+        pending = queue.Queue()
+        for index in range(self.requests):
+            pending.put(build_request(index))
+        results = []
+        barrier = threading.Barrier(self.concurrency + 1)
+        workers = [
+            threading.Thread(target=self._worker, args=(pending, results, barrier))
+            for _ in range(self.concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        wall = time.perf_counter() - started
+
+        latencies = [latency * 1000 for latency, _, _ in results]
+        lock_waits = [recorder.lock_time * 1000 for _, _, recorder in results]
+        status_counts = {}
+        for _, status_code, _ in results:
+            status_counts[str(status_code)] = status_counts.get(str(status_code), 0) + 1
+        queries = sum(recorder.queries for _, _, recorder in results)
+        return {
+            'requests': len(results),
+            'status_counts': status_counts,
+            'throughput_rps': round(len(results) / wall, 2) if wall else 0.0,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50), 3),
+                'p95': round(percentile(latencies, 95), 3),
+                'p99': round(percentile(latencies, 99), 3),
+                'max': round(max(latencies, default=0.0), 3),
+            },
+            'queries': {
+                'total': queries,
+                'per_request': round(queries / len(results), 2) if results else 0.0,
+                'time_ms': round(sum(recorder.query_time for _, _, recorder in results) * 1000, 3),
+            },
+            'lock_wait_ms': {
+                'total': round(sum(lock_waits), 3),
+                'p95': round(percentile(lock_waits, 95), 3),
+            },
+        }
+
+    def run(self, only=None):
+        overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        if not self.use_cache:
+            overrides['SCHEDULE_CACHE'] = {**getattr(settings, 'SCHEDULE_CACHE', {}), 'TIMEOUT': 0}
+        # Every scenario runs from one client; measure the booking path, not 429s
+        overrides['THROTTLING'] = {**getattr(settings, 'THROTTLING', {}), 'ENABLED': False}
+        self.seed()
+        # Expected 400s on the full hot slot would otherwise flood the log
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            with override_settings(**overrides):
+                results = {
+                    name: self.run_scenario(build_request)
+                    for name, build_request in self.scenarios().items()
+                    if not only or name in only
+                }
+            hot_slot = TimeSlot.objects.get(pk=self.hot_slot.pk)
+            hot_booked = Booking.objects.filter(time_slot=hot_slot).count()
+        finally:
+            request_logger.setLevel(level)
+            self.cleanup()
+            connections.close_all()
+        return {
+            'run': {
+                'timestamp': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'options': {
+                    'classes': self.classes, 'slots_per_class': self.slots_per_class,
+                    'seed_bookings': self.seed_bookings, 'hot_capacity': self.hot_capacity,
+                    'member_bookings': self.member_bookings, 'concurrency': self.concurrency,
+                    'requests': self.requests, 'use_cache': self.use_cache,
+                },
+                'hot_slot': {
+                    'capacity': self.hot_capacity,
+                    'booked': hot_booked,
+                    'available_spots': hot_slot.available_spots,
+                    'overbooked': hot_booked > self.hot_capacity,
+                },
+            },
+            'scenarios': results,
+        }
+
+
+def compare(current, previous):
+    """
+    Per-scenario change in p95 latency and throughput against an earlier run.
+    """
+    changes = {}
+    for name, result in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        changes[name] = {
+            'p95_ms': (before['latency_ms']['p95'], result['latency_ms']['p95']),
+            'throughput_rps': (before['throughput_rps'], result['throughput_rps']),
+        }
+    return changes
+
+
+def dump(results, path):
+    with open(path, 'w') as handle:
+        json.dump(results, handle, indent=2)
@@ -0,0 +1,154 @@
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+
+from .routers import get_replicas, use_primary
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 30,
+    'KEY_PREFIX': 'schedule',
+}
+
+CACHED_HEADERS = ('ETag',)
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def get_cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'SCHEDULE_CACHE', {})}
+
+
+def _cache():
+    return caches[get_cache_settings()['ALIAS']]
+
+
+def _version_key(scope):
+    return f"{get_cache_settings()['KEY_PREFIX']}:version:{scope}"
+
+
+def get_version(scope):
+    """
+    Return the current version token for ``scope``. Tokens start from the
+    clock rather than 1 so an evicted counter can never collide with
+    entries cached under an older token.
+    """
+    cache = _cache()
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _recent_write_key(scope):
+    return f"{get_cache_settings()['KEY_PREFIX']}:written:{scope}"
+
+
+def bump_version(*scopes):
+    cache = _cache()
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+    if get_replicas():
+        # Replicas may not have the write yet. Until they should, refills
+        # read the primary rather than cache lagging rows under the new version.
+        cache.set_many(
+            {_recent_write_key(scope): True for scope in scopes},
+            timeout=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+        )
+
+
+def recently_written(scopes):
+    return bool(get_replicas()) and bool(_cache().get_many([_recent_write_key(scope) for scope in scopes]))
+
+
+def invalidate_classes(gym_class_ids):
+    """
+    A class changed: its own listing and every time slot listing that nests it.
+    """
+    bump_version('classes', 'timeslots', *[f'timeslots:class:{pk}' for pk in gym_class_ids])
+
+
+def invalidate_time_slots(gym_class_ids):
+    bump_version('timeslots', *[f'timeslots:class:{pk}' for pk in gym_class_ids])
+
+
+def record(resource, hit):
+    name = 'hits' if hit else 'misses'
+    with _stats_lock:
+        counters = _stats.setdefault(resource, {'hits': 0, 'misses': 0})
+        counters[name] += 1
+
+
+def get_cache_stats():
+    with _stats_lock:
+        return {resource: dict(counters) for resource, counters in _stats.items()}
+
+
+class CachedResponseMixin:
+    """
+    Caches list and retrieve responses of a read-only viewset under keys
+    that embed the version tokens returned by ``get_cache_scopes``. Writers
+    bump those versions, so stale entries are never read again and simply
+    age out of the cache.
+    """
+    cache_resource = None
+
+    def get_cache_scopes(self):
+        return [self.cache_resource]
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(super().retrieve, request, *args, **kwargs)
+
+    def _cache_key(self, request):
+        options = get_cache_settings()
+        versions = ':'.join(str(get_version(scope)) for scope in self.get_cache_scopes())
+        query = '&'.join(f'{k}={v}' for k, v in sorted(request.query_params.lists()))
+        digest = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+        return f"{options['KEY_PREFIX']}:{self.cache_resource}:{versions}:{digest}"
+
+    def _cached_response(self, handler, request, *args, **kwargs):
+        options = get_cache_settings()
+        if not options['TIMEOUT']:
+            return handler(request, *args, **kwargs)
+
+        cache = _cache()
+        key = self._cache_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            record(self.cache_resource, hit=True)
+            data, headers = entry
+            # Validators are cached with the body, so a revalidation hit
+            # costs no queries either.
+            response = get_conditional_response(request, etag=headers.get('ETag')) or Response(data)
+            for header, value in headers.items():
+                response[header] = value
+            response['X-Cache'] = 'HIT'
+            return response
+
+        record(self.cache_resource, hit=False)
+        if recently_written(self.get_cache_scopes()):
+            with use_primary():
+                response = handler(request, *args, **kwargs)
+        else:
+            response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            headers = {
+                header: response[header] for header in CACHED_HEADERS if header in response
+            }
+            cache.set(key, (response.data, headers), timeout=options['TIMEOUT'])
+        response['X-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,61 @@
+from django.core import checks
+
+
+def _model_indexes(model):
+    """
+    Column lists of every index on ``model``, ignoring sort direction.
+    """
+    opts = model._meta
+    indexes = [[name.lstrip('-') for name in index.fields] for index in opts.indexes]
+    indexes += [list(fields) for fields in opts.unique_together]
+    indexes += [
+        list(constraint.fields) for constraint in opts.constraints
+        if getattr(constraint, 'fields', None) and getattr(constraint, 'condition', None) is None
+    ]
+    indexes += [
+        [field.name] for field in opts.concrete_fields
+        if (field.db_index or field.unique) and not field.primary_key
+    ]
+    return indexes
+
+
+def _ordering_is_indexed(pagination_class):
+    model = pagination_class.model
+    prefix = set(pagination_class.index_prefix)
+    columns = [name.lstrip('-') for name in pagination_class.ordering]
+    # Secondary indexes carry the primary key, so a trailing pk tie-breaker is free
+    if columns and columns[-1] in ('id', 'pk', model._meta.pk.name):
+        columns = columns[:-1]
+    for index in _model_indexes(model):
+        if set(index[:len(prefix)]) == prefix and index[len(prefix):len(prefix) + len(columns)] == columns:
+            return True
+    return False
+
+
+def _indexed_paginations(cls=None):
+    from .pagination import IndexedCursorPagination
+
+    cls = cls or IndexedCursorPagination
+    for subclass in cls.__subclasses__():
+        if subclass.model is not None:
+            yield subclass
+        yield from _indexed_paginations(subclass)
+
+
+@checks.register(checks.Tags.models)
+def check_cursor_pagination_indexes(app_configs=None, pagination_classes=None, **kwargs):
+    errors = []
+    if pagination_classes is None:
+        pagination_classes = set(_indexed_paginations())
+    for pagination_class in pagination_classes:
+        if not _ordering_is_indexed(pagination_class):
+            prefix = ', '.join(pagination_class.index_prefix)
+            errors.append(checks.Error(
+                f"{pagination_class.__name__} orders {pagination_class.model.__name__} by "
+                f"{', '.join(pagination_class.ordering)} but no index supports it"
+                + (f" after filtering on {prefix}" if prefix else "") + ".",
+                hint="Add a matching models.Index to the model's Meta.indexes.",
+                obj=pagination_class,
+                id='bookings.E001',
+            ))
+    return errors
@@ -0,0 +1,205 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WORKERS': 2,
+    'QUEUE_SIZE': 1000,
+    'ENQUEUE_TIMEOUT': 1.0,
+    'MAX_RETRIES': 3,
+    'RETRY_BACKOFF': 1.0,
+    'IDLE_TIMEOUT': 30.0,
+    'BACKEND': None,
+}
+
+_STOP = object()
+
+
+class EmailDeliveryService:
+    """
+    Delivers emails from a bounded queue with a small fixed pool of worker
+    threads. Each worker keeps its own backend connection open between
+    messages and closes it after it has been idle for a while.
+    """
+
+    def __init__(self, workers=2, queue_size=1000, enqueue_timeout=1.0, max_retries=3,
+                 retry_backoff=1.0, idle_timeout=30.0, backend=None):
+        self.workers = workers
+        self.enqueue_timeout = enqueue_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.idle_timeout = idle_timeout
+        self.backend = backend
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._counters = {
+            'enqueued': 0,
+            'rejected': 0,
+            'sent': 0,
+            'failed': 0,
+            'retried': 0,
+        }
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    @classmethod
+    def from_settings(cls):
+        options = {**DEFAULTS, **getattr(settings, 'EMAIL_DELIVERY', {})}
+        return cls(
+            workers=options['WORKERS'],
+            queue_size=options['QUEUE_SIZE'],
+            enqueue_timeout=options['ENQUEUE_TIMEOUT'],
+            max_retries=options['MAX_RETRIES'],
+            retry_backoff=options['RETRY_BACKOFF'],
+            idle_timeout=options['IDLE_TIMEOUT'],
+            backend=options['BACKEND'],
+        )
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(
+                    target=self._run, name=f'email-delivery-{index}', daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, message):
+        """
+        Queue an EmailMessage for delivery. Blocks for up to ``enqueue_timeout``
+        seconds when the queue is full and returns False if it stays full.
+        """
+        self.start()
+        try:
+            self._queue.put((message, time.monotonic()), timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._increment('rejected')
+            logger.error(f"Email queue full, dropped email to {message.to}")
+            return False
+        self._increment('enqueued')
+        return True
+
+    def drain(self, timeout=None):
+        """
+        Wait until every queued email has been handled. Returns False if
+        ``timeout`` seconds pass first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def shutdown(self, timeout=10.0):
+        """
+        Deliver what is already queued, then stop the workers.
+        """
+        with self._lock:
+            threads, self._threads = self._threads, []
+        if not threads:
+            return
+        self.drain(timeout)
+        for _ in threads:
+            self._queue.put(_STOP)
+        for thread in threads:
+            thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            latency_total = self._latency_total
+            latency_max = self._latency_max
+        handled = counters['sent'] + counters['failed']
+        counters['queue_depth'] = self._queue.qsize()
+        counters['latency_avg'] = latency_total / handled if handled else 0.0
+        counters['latency_max'] = latency_max
+        return counters
+
+    def _increment(self, name, latency=None):
+        with self._lock:
+            self._counters[name] += 1
+            if latency is not None:
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+
+    def _run(self):
+        connection = None
+        while True:
+            try:
+                item = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                connection = self._close(connection)
+                continue
+            try:
+                if item is _STOP:
+                    self._close(connection)
+                    return
+                message, enqueued_at = item
+                connection = self._deliver(connection, message, enqueued_at)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, connection, message, enqueued_at):
+        for attempt in range(self.max_retries + 1):
+            try:
+                if connection is None:
+                    connection = get_connection(self.backend, fail_silently=False)
+                    connection.open()
+                connection.send_messages([message])
+                self._increment('sent', time.monotonic() - enqueued_at)
+                logger.info(f"Email sent to {message.to}")
+                return connection
+            except Exception as e:
+                # Drop the connection; it may be the thing that broke.
+                connection = self._close(connection)
+                if attempt == self.max_retries:
+                    self._increment('failed', time.monotonic() - enqueued_at)
+                    logger.error(f"Failed to send email to {message.to}: {str(e)}")
+                    return connection
+                self._increment('retried')
+                time.sleep(self.retry_backoff * (2 ** attempt))
+        return connection
+
+    def _close(self, connection):
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                logger.exception("Error closing email connection")
+        return None
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_delivery_service():
+    """
+    Return the process-wide delivery service, creating it on first use.
+    """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = EmailDeliveryService.from_settings()
+                atexit.register(_service.shutdown)
+    return _service
+
+
+def build_message(subject, message, from_email, recipient_list, html_message=None, connection=None):
+    email = EmailMultiAlternatives(subject, message, from_email, recipient_list, connection=connection)
+    if html_message:
+        email.attach_alternative(html_message, 'text/html')
+    return email
@@ -1,34 +1,26 @@
 import logging
-import threading
-from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 
+from .delivery import build_message, get_delivery_service
+from .outbox import enqueue_email, enqueue_emails
+
 logger = logging.getLogger(__name__)
 
 def send_email_async(subject, message, from_email, recipient_list, html_message=None):
     """
-    Sends email in a separate thread to avoid blocking the API response.
-    """
-    def _send():
-        try:
-            send_mail(
-                subject,
-                message,
-                from_email,
-                recipient_list,
-                html_message=html_message,
-                fail_silently=False,
-            )
-            logger.info(f"Email sent to {recipient_list}")
-        except Exception as e:
-            logger.error(f"Failed to send email to {recipient_list}: {str(e)}")
-
-    thread = threading.Thread(target=_send)
-    thread.start()
+    Hands the email to the shared delivery service so the API response is
+    not blocked on SMTP. Returns False if the delivery queue is full.
+    """
+    email = build_message(subject, message, from_email, recipient_list, html_message=html_message)
+    return get_delivery_service().submit(email)
 
 def send_booking_confirmation(booking):
+    """
+    Writes the confirmation to the email outbox. Call inside the booking
+    transaction; the dispatch_outbox command delivers it after commit.
+    """
     subject = f"Booking Confirmation - {booking.gym_class.name}"
     
     # In a real app, use templates. For now, constructing string/HTML here or simple template.
@@ -65,7 +57,7 @@ def send_booking_confirmation(booking):
     
     plain_message = strip_tags(html_message)
     
-    send_email_async(
+    enqueue_email(
         subject,
         plain_message,
         settings.DEFAULT_FROM_EMAIL,
@@ -74,6 +66,10 @@ def send_booking_confirmation(booking):
     )
 
 def send_booking_cancellation(booking):
+    """
+    Writes the cancellation notice to the email outbox, like
+    send_booking_confirmation.
+    """
     subject = f"Booking Cancelled - {booking.gym_class.name}"
     
     html_message = f"""
@@ -90,7 +86,7 @@ def send_booking_cancellation(booking):
     
     plain_message = strip_tags(html_message)
     
-    send_email_async(
+    enqueue_email(
         subject,
         plain_message,
         settings.DEFAULT_FROM_EMAIL,
@@ -98,10 +94,67 @@ def send_booking_cancellation(booking):
         html_message=html_message
     )
 
-def send_contact_confirmation(contact_message):
-    subject = "We received your message"
-    
-    html_message = f"""
+def send_batch_confirmations(bookings):
+    """
+    Queues one combined confirmation per recipient for bookings made in a
+    single batch, in one outbox insert. Call inside the booking transaction.
+    """
+    by_email = {}
+    for booking in bookings:
+        by_email.setdefault(booking.email, []).append(booking)
+
+    messages = []
+    for email, own in by_email.items():
+        rows = "".join(
+            f"<li><strong>{booking.gym_class.name}</strong> - "
+            f"{booking.time_slot.start_time.strftime('%B %d, %Y at %I:%M %p')} "
+            f"(ref {booking.booking_reference})</li>"
+            for booking in own
+        )
+        subject = (
+            f"Booking Confirmation - {own[0].gym_class.name}" if len(own) == 1
+            else f"Booking Confirmation - {len(own)} classes"
+        )
+        html_message = f"""
+    <html>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            <h2 style="color: #DC2626;">Hi {own[0].first_name},</h2>
+            <p>Your bookings are confirmed!</p>
+            <ul>{rows}</ul>
+            <p>Please arrive 10 minutes early and bring a water bottle and towel.</p>
+            <p><em>The Gym Fitness Team</em></p>
+        </body>
+    </html>
+    """
+        messages.append((subject, strip_tags(html_message), settings.DEFAULT_FROM_EMAIL, [email], html_message))
+    enqueue_emails(messages)
+
+def send_waitlist_promotions(bookings):
+    """
+    Queues a "you're in" email for each booking promoted off a waitlist,
+    in one outbox insert. Call inside the promoting transaction.
+    """
+    messages = []
+    for booking in bookings:
+        subject = f"You're off the waitlist - {booking.gym_class.name}"
+        html_message = f"""
+    <html>
+        <body style="font-family: Arial, sans-serif;">
+            <h2 style="color: #DC2626;">Good news, {booking.first_name}!</h2>
+            <p>A spot opened up and you are now booked into <strong>{booking.gym_class.name}</strong> on {booking.time_slot.start_time.strftime("%B %d, %Y at %I:%M %p")}.</p>
+            <p><strong>Booking Reference:</strong> {booking.booking_reference}</p>
+            <p>Can't make it any more? Cancel with your reference so the next person in line gets the spot.</p>
+            <p><em>The Gym Fitness Team</em></p>
+        </body>
+    </html>
+    """
+        messages.append(
+            (subject, strip_tags(html_message), settings.DEFAULT_FROM_EMAIL, [booking.email], html_message)
+        )
+    enqueue_emails(messages)
+
+def _contact_confirmation_html(contact_message):
+    return f"""
     <html>
         <body style="font-family: Arial, sans-serif;">
             <h2>Hello {contact_message.name},</h2>
@@ -113,6 +166,11 @@ def send_contact_confirmation(contact_message):
         </body>
     </html>
     """
+
+def send_contact_confirmation(contact_message):
+    subject = "We received your message"
+    
+    html_message = _contact_confirmation_html(contact_message)
     
     plain_message = strip_tags(html_message)
     
@@ -123,3 +181,17 @@ def send_contact_confirmation(contact_message):
         [contact_message.email],
         html_message=html_message
     )
+
+def send_contact_confirmations(contact_messages):
+    """
+    Queues the confirmation of each buffered contact message in one outbox
+    insert. Call inside the transaction that saves the messages.
+    """
+    messages = []
+    for contact_message in contact_messages:
+        html_message = _contact_confirmation_html(contact_message)
+        messages.append((
+            "We received your message", strip_tags(html_message), settings.DEFAULT_FROM_EMAIL,
+            [contact_message.email], html_message
+        ))
+    enqueue_emails(messages)
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import threading
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BACKEND': 'bookings.events.InProcessBroker',
+    'QUEUE_SIZE': 100,
+    'HEARTBEAT_SECONDS': 15,
+    'MAX_SUBSCRIBERS': 5000,
+}
+
+EVICTED = object()
+
+
+def get_stream_settings():
+    return {**DEFAULTS, **getattr(settings, 'AVAILABILITY_STREAM', {})}
+
+
+class SubscriberLimitReached(Exception):
+    pass
+
+
+class Subscription:
+    """
+    One connected client. Events are delivered into a bounded asyncio queue
+    owned by the client's event loop.
+    """
+
+    def __init__(self, gym_class_ids, loop, queue_size):
+        self.gym_class_ids = frozenset(gym_class_ids)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.evicted = False
+
+    def wants(self, event):
+        return not self.gym_class_ids or event['gym_class'] in self.gym_class_ids
+
+    async def get(self, timeout):
+        """
+        Next event, ``None`` if ``timeout`` passes first, or ``EVICTED``.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class AvailabilityBroker:
+    """
+    Interface for availability fan-out. Subclass and point
+    AVAILABILITY_STREAM['BACKEND'] at it to use a shared transport.
+    """
+
+    def __init__(self, queue_size=100, max_subscribers=5000, **kwargs):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+
+    def subscribe(self, gym_class_ids):
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+    def publish(self, events):
+        raise NotImplementedError
+
+    def has_subscribers(self):
+        return True
+
+
+class InProcessBroker(AvailabilityBroker):
+    """
+    Fans events out to the subscribers of this process. ``publish`` may be
+    called from any thread; delivery is scheduled on each subscriber's loop.
+    A subscriber whose queue is full is evicted rather than buffered.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+
+    def subscribe(self, gym_class_ids):
+        subscription = Subscription(gym_class_ids, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            if len(self._subscriptions) >= self.max_subscribers:
+                raise SubscriberLimitReached()
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+    def has_subscribers(self):
+        return bool(self._subscriptions)
+
+    def publish(self, events):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            wanted = [event for event in events if subscription.wants(event)]
+            if wanted:
+                try:
+                    subscription.loop.call_soon_threadsafe(self._deliver, subscription, wanted)
+                except RuntimeError:
+                    # The client's loop has already closed
+                    self.unsubscribe(subscription)
+
+    def _deliver(self, subscription, events):
+        if subscription.evicted:
+            return
+        for event in events:
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._evict(subscription)
+                return
+
+    def _evict(self, subscription):
+        logger.warning("Evicting slow availability stream subscriber")
+        subscription.evicted = True
+        self.unsubscribe(subscription)
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(EVICTED)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                options = get_stream_settings()
+                _broker = import_string(options['BACKEND'])(
+                    queue_size=options['QUEUE_SIZE'],
+                    max_subscribers=options['MAX_SUBSCRIBERS'],
+                )
+    return _broker
+
+
+def availability_events(time_slots):
+    return [
+        {
+            'time_slot': slot['id'],
+            'gym_class': slot['gym_class_id'],
+            'available_spots': slot['available_spots'],
+            'is_available': slot['is_available'],
+        }
+        for slot in time_slots
+    ]
+
+
+def current_availability(gym_class_ids):
+    """
+    Snapshot of upcoming slots, sent when a client first connects.
+    """
+    from .models import TimeSlot
+
+    time_slots = TimeSlot.objects.filter(start_time__gt=timezone.now())
+    if gym_class_ids:
+        time_slots = time_slots.filter(gym_class_id__in=gym_class_ids)
+    return availability_events(
+        time_slots.values('id', 'gym_class_id', 'available_spots', 'is_available')
+    )
+
+
+def publish_time_slots(time_slot_ids):
+    from .models import TimeSlot
+
+    broker = get_broker()
+    if not broker.has_subscribers():
+        return
+    time_slots = TimeSlot.objects.filter(pk__in=time_slot_ids).values(
+        'id', 'gym_class_id', 'available_spots', 'is_available'
+    )
+    events = availability_events(time_slots)
+    if events:
+        broker.publish(events)
@@ -0,0 +1,101 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Booking
+
+# (column header, lookup) pairs; class and slot columns come from one join
+EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('booking_reference', 'booking_reference'),
+    ('status', 'status'),
+    ('first_name', 'first_name'),
+    ('last_name', 'last_name'),
+    ('email', 'email'),
+    ('phone', 'phone'),
+    ('gym_class', 'gym_class__name'),
+    ('class_type', 'gym_class__class_type'),
+    ('start_time', 'time_slot__start_time'),
+    ('end_time', 'time_slot__end_time'),
+    ('special_requests', 'special_requests'),
+    ('created_at', 'created_at'),
+)
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def filter_bookings(bookings=None, start_date=None, end_date=None, gym_class=None, status=None):
+    """
+    Narrow ``bookings`` to slots starting between ``start_date`` and
+    ``end_date`` (inclusive dates), one class and one status.
+    """
+    bookings = Booking.objects.all() if bookings is None else bookings
+    if start_date:
+        bookings = bookings.filter(
+            time_slot__start_time__gte=timezone.make_aware(datetime.combine(start_date, time.min))
+        )
+    if end_date:
+        bookings = bookings.filter(
+            time_slot__start_time__lt=timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+        )
+    if gym_class:
+        bookings = bookings.filter(gym_class_id=gym_class)
+    if status:
+        bookings = bookings.filter(status=status)
+    return bookings
+
+
+def iter_rows(bookings, chunk_size=2000):
+    """
+    Yield export rows as tuples, ``chunk_size`` at a time.
+
+    Walks the primary key instead of holding one cursor open: MySQL's
+    client library buffers an entire result set, so a single ``.iterator()``
+    over millions of rows would not keep memory flat there.
+    """
+    lookups = [lookup for _, lookup in EXPORT_COLUMNS]
+    bookings = bookings.order_by('pk').values_list(*lookups)
+    last_pk = 0
+    while True:
+        count = 0
+        for row in bookings.filter(pk__gt=last_pk)[:chunk_size].iterator(chunk_size=chunk_size):
+            count += 1
+            last_pk = row[0]
+            yield row
+        if count < chunk_size:
+            return
+
+
+class _Echo:
+    """
+    File-like object whose ``write`` hands back the line instead of
+    buffering it, so csv.writer can feed a streaming response.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([header for header, _ in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_jsonl(rows):
+    headers = [header for header, _ in EXPORT_COLUMNS]
+    for row in rows:
+        yield json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def iter_export(bookings, export_format='csv', chunk_size=2000):
+    rows = iter_rows(bookings, chunk_size)
+    if export_format == 'jsonl':
+        return iter_jsonl(rows)
+    return iter_csv(rows)
@@ -0,0 +1,87 @@
+from datetime import datetime, time, timedelta
+from django import forms
+from django.utils import timezone
+
+from .models import GymClass
+from .scheduling import WEEKDAYS
+
+
+class RecurrenceForm(forms.Form):
+    weekdays = forms.MultipleChoiceField(
+        choices=[(index, name.title()) for index, name in enumerate(WEEKDAYS)],
+        widget=forms.CheckboxSelectMultiple,
+    )
+    times = forms.CharField(help_text="Comma-separated start times, e.g. 06:00, 18:30")
+    start_date = forms.DateField()
+    end_date = forms.DateField()
+    capacity = forms.IntegerField(
+        required=False, min_value=0, help_text="Defaults to each class's max participants"
+    )
+
+    def clean_weekdays(self):
+        return [int(day) for day in self.cleaned_data['weekdays']]
+
+    def clean_times(self):
+        field = forms.TimeField()
+        return [field.clean(value.strip()) for value in self.cleaned_data['times'].split(',') if value.strip()]
+
+    def clean(self):
+        data = super().clean()
+        if data.get('start_date') and data.get('end_date') and data['end_date'] < data['start_date']:
+            raise forms.ValidationError("End date must be on or after start date")
+        return data
+
+
+class CapacityForm(forms.Form):
+    extra_spots = forms.IntegerField(min_value=1, help_text="Spots to add to each selected time slot")
+
+
+class TimeSlotSearchForm(forms.Form):
+    """
+    Query parameters of the time slot listing. Dates and class filters
+    narrow an index range and min_spots is checked from the index entry.
+    The time of day is computed from start_time for each row in that
+    range, so it does not shrink the scan.
+    """
+    gym_class = forms.IntegerField(required=False, min_value=1)
+    class_type = forms.ChoiceField(required=False, choices=GymClass.CLASS_TYPES)
+    instructor = forms.CharField(required=False, max_length=100)
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+    time_from = forms.TimeField(required=False)
+    time_to = forms.TimeField(required=False)
+    min_spots = forms.IntegerField(required=False, min_value=1)
+
+    def clean(self):
+        data = super().clean()
+        if data.get('date_from') and data.get('date_to') and data['date_to'] < data['date_from']:
+            raise forms.ValidationError("date_to must be on or after date_from")
+        if data.get('time_from') and data.get('time_to') and data['time_to'] < data['time_from']:
+            raise forms.ValidationError("time_to must be on or after time_from")
+        return data
+
+    def filter(self, queryset):
+        data = self.cleaned_data
+        if data.get('gym_class'):
+            queryset = queryset.filter(gym_class_id=data['gym_class'])
+        if data.get('class_type'):
+            queryset = queryset.filter(gym_class__class_type=data['class_type'], gym_class__is_active=True)
+        if data.get('instructor'):
+            queryset = queryset.filter(gym_class__instructor=data['instructor'], gym_class__is_active=True)
+        # Dates are gym-local days turned into a start_time range
+        if data.get('date_from'):
+            queryset = queryset.filter(
+                start_time__gte=timezone.make_aware(datetime.combine(data['date_from'], time.min))
+            )
+        if data.get('date_to'):
+            queryset = queryset.filter(
+                start_time__lt=timezone.make_aware(datetime.combine(data['date_to'] + timedelta(days=1), time.min))
+            )
+        # No index holds the time of day: these only filter the rows above
+        if data.get('time_from'):
+            queryset = queryset.filter(start_time__time__gte=data['time_from'])
+        if data.get('time_to'):
+            queryset = queryset.filter(start_time__time__lte=data['time_to'])
+        if data.get('min_spots'):
+            queryset = queryset.filter(available_spots__gte=data['min_spots'])
+        return queryset
@@ -0,0 +1,112 @@
+from datetime import timedelta
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .models import ScheduleEntry, TimeSlot
+
+ENTRY_FIELDS = (
+    'gym_class', 'day', 'start_time', 'end_time', 'class_name', 'class_type', 'instructor',
+    'available_spots', 'is_available',
+)
+
+
+def _entries(time_slots):
+    for slot in time_slots.filter(gym_class__is_active=True).values(
+        'id', 'gym_class_id', 'start_time', 'end_time', 'available_spots', 'is_available',
+        'gym_class__name', 'gym_class__class_type', 'gym_class__instructor',
+    ).iterator():
+        yield ScheduleEntry(
+            time_slot_id=slot['id'],
+            gym_class_id=slot['gym_class_id'],
+            day=timezone.localtime(slot['start_time']).date(),
+            start_time=slot['start_time'],
+            end_time=slot['end_time'],
+            class_name=slot['gym_class__name'],
+            class_type=slot['gym_class__class_type'],
+            instructor=slot['gym_class__instructor'],
+            available_spots=slot['available_spots'],
+            is_available=slot['is_available'],
+        )
+
+
+def refresh(time_slots, batch_size=2000):
+    """
+    Upsert the grid entries of every slot in the ``time_slots`` queryset
+    and drop those whose class is no longer active. Returns the number of
+    entries written.
+    """
+    options = {'update_conflicts': True, 'update_fields': ENTRY_FIELDS}
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['time_slot']
+    written = 0
+    with transaction.atomic():
+        ScheduleEntry.objects.filter(
+            time_slot__in=time_slots.filter(gym_class__is_active=False).values('pk')
+        ).delete()
+        batch = []
+        for entry in _entries(time_slots):
+            batch.append(entry)
+            if len(batch) == batch_size:
+                ScheduleEntry.objects.bulk_create(batch, **options)
+                written += len(batch)
+                batch = []
+        if batch:
+            ScheduleEntry.objects.bulk_create(batch, **options)
+            written += len(batch)
+    return written
+
+
+def refresh_time_slots(time_slot_ids):
+    return refresh(TimeSlot.objects.filter(pk__in=time_slot_ids))
+
+
+def refresh_availability(time_slot_ids):
+    """
+    Copy just the spot counts of ``time_slot_ids`` into the grid with one
+    UPDATE; what bookings and cancellations change.
+    """
+    time_slots = TimeSlot.objects.filter(pk=OuterRef('time_slot_id'))
+    return ScheduleEntry.objects.filter(time_slot_id__in=time_slot_ids).update(
+        available_spots=Subquery(time_slots.values('available_spots')),
+        is_available=Subquery(time_slots.values('is_available')),
+    )
+
+
+def refresh_gym_classes(gym_class_ids):
+    return refresh(TimeSlot.objects.filter(gym_class_id__in=gym_class_ids, start_time__gt=timezone.now()))
+
+
+def week_grid(start_date, days=7, class_type=None, instructor=None):
+    """
+    The schedule from ``start_date`` for ``days`` days, grouped by day,
+    class type and instructor, read with one index range scan.
+    """
+    entries = ScheduleEntry.objects.filter(day__gte=start_date, day__lt=start_date + timedelta(days=days))
+    if class_type:
+        entries = entries.filter(class_type=class_type)
+    if instructor:
+        entries = entries.filter(instructor=instructor)
+    rows = entries.order_by('day', 'class_type', 'instructor', 'start_time').values_list(
+        'day', 'class_type', 'instructor', 'time_slot_id', 'gym_class_id', 'class_name',
+        'start_time', 'end_time', 'available_spots', 'is_available',
+    )
+
+    grid = []
+    for day, class_type, instructor, *slot in rows:
+        if not grid or grid[-1]['date'] != day:
+            grid.append({'date': day, 'groups': []})
+        groups = grid[-1]['groups']
+        if not groups or (groups[-1]['class_type'], groups[-1]['instructor']) != (class_type, instructor):
+            groups.append({'class_type': class_type, 'instructor': instructor, 'slots': []})
+        time_slot_id, gym_class_id, class_name, start_time, end_time, available_spots, is_available = slot
+        groups[-1]['slots'].append({
+            'id': time_slot_id,
+            'gym_class': gym_class_id,
+            'class_name': class_name,
+            'start_time': start_time,
+            'end_time': end_time,
+            'available_spots': available_spots,
+            'is_available': is_available,
+        })
+    return grid
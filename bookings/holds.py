@@ -0,0 +1,77 @@
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Booking, TimeSlot
+from .waitlist import promote_waitlist
+
+DEFAULTS = {
+    'HOLD_SECONDS': 300,
+    'BATCH_SIZE': 500,
+}
+
+
+def get_hold_settings():
+    return {**DEFAULTS, **getattr(settings, 'BOOKING_HOLDS', {})}
+
+
+def hold_expiry(now=None):
+    return (now or timezone.now()) + timedelta(seconds=get_hold_settings()['HOLD_SECONDS'])
+
+
+def confirm_hold(booking_id, now=None):
+    """
+    Turn a live PENDING hold into a confirmed booking. Returns False if
+    the hold has lapsed or is no longer pending.
+    """
+    now = now or timezone.now()
+    return Booking.objects.filter(pk=booking_id, status='PENDING', expires_at__gt=now).update(
+        status='CONFIRMED', expires_at=None, updated_at=now
+    ) == 1
+
+
+def release_lapsed_hold(booking_id, now=None):
+    """
+    Expire one lapsed hold ahead of the sweeper and give its spot back.
+    Booking a slot calls it for the member's own hold there, which would
+    still trip unique_active_booking; other lapsed holds are left to the
+    sweeper. Returns False if a sweeper, cancel or confirm has the hold.
+    """
+    now = now or timezone.now()
+    time_slot_id = (
+        Booking.objects.select_for_update(skip_locked=True)
+        .filter(pk=booking_id, status='PENDING', expires_at__lte=now)
+        .values_list('time_slot_id', flat=True)
+        .first()
+    )
+    if time_slot_id is None:
+        return False
+    Booking.objects.filter(pk=booking_id).update(status='EXPIRED', updated_at=now)
+    return TimeSlot.objects.release_spots(time_slot_id)
+
+
+def release_expired_batch(batch_size, now=None):
+    """
+    Expire up to ``batch_size`` lapsed holds and return their spots, one
+    UPDATE per affected slot. Holds locked by a concurrent confirm, cancel
+    or sweeper are skipped. Returns the number of holds released.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        holds = list(
+            Booking.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', expires_at__lte=now)
+            .order_by('expires_at')
+            .values_list('id', 'time_slot_id')[:batch_size]
+        )
+        if not holds:
+            return 0
+        Booking.objects.filter(pk__in=[pk for pk, _ in holds]).update(status='EXPIRED', updated_at=now)
+        released = Counter(time_slot_id for _, time_slot_id in holds)
+        for time_slot_id, count in released.items():
+            TimeSlot.objects.release_spots(time_slot_id, count)
+        promote_waitlist(list(released))
+    return len(holds)
+
@@ -0,0 +1,84 @@
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+DEFAULTS = {
+    'TTL_SECONDS': 24 * 60 * 60,
+}
+
+
+def get_idempotency_settings():
+    return {**DEFAULTS, **getattr(settings, 'IDEMPOTENCY', {})}
+
+
+def get_key(request):
+    return request.headers.get(HEADER) or None
+
+
+def fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def find(key):
+    """
+    The stored response for ``key``, or None. Only committed, complete
+    records are ever visible, since a record is written in the same
+    transaction as the work it describes.
+    """
+    return IdempotencyKey.objects.filter(key=key, expires_at__gt=timezone.now()).first()
+
+
+def replay(record, request_fingerprint):
+    if record.fingerprint != request_fingerprint:
+        return Response(
+            {"error": "Idempotency key reused", "message": "This key was already used for a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return Response(record.response_body, status=record.status_code, headers={REPLAYED_HEADER: 'true'})
+
+
+def reserve(key, request_fingerprint):
+    """
+    Insert the record for ``key``. Call it first inside the transaction
+    doing the work: a concurrent retry then blocks on the unique key until
+    this transaction ends, and either fails with IntegrityError (replay the
+    committed record) or proceeds after a rollback.
+    """
+    now = timezone.now()
+    IdempotencyKey.objects.filter(key=key, expires_at__lte=now).delete()
+    return IdempotencyKey.objects.create(
+        key=key,
+        fingerprint=request_fingerprint,
+        expires_at=now + timedelta(seconds=get_idempotency_settings()['TTL_SECONDS']),
+    )
+
+
+def complete(record, status_code, data):
+    record.status_code = status_code
+    record.response_body = data
+    record.save(update_fields=['status_code', 'response_body'])
+
+
+def purge_expired(batch_size=1000):
+    """
+    Delete expired records in batches. Returns the number removed.
+    """
+    removed = 0
+    while True:
+        pks = list(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return removed
+        removed += IdempotencyKey.objects.filter(pk__in=pks).delete()[0]
@@ -0,0 +1,191 @@
+import atexit
+import logging
+import queue
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .emails import send_contact_confirmations
+from .models import ContactMessage
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Off: every submission is saved by its own request
+    'BUFFERED': False,
+    'BATCH_SIZE': 100,
+    'FLUSH_INTERVAL': 1.0,
+    'QUEUE_SIZE': 10000,
+    # A message repeating one from the same address within this window is dropped
+    'DEDUPE_SECONDS': 600,
+}
+
+
+def get_ingest_settings():
+    return {**DEFAULTS, **getattr(settings, 'CONTACT_INGEST', {})}
+
+
+def _dedupe_key(contact_message):
+    return contact_message.email.strip().lower(), contact_message.message.strip()
+
+
+def write_batch(contact_messages, dedupe_seconds):
+    """
+    Save unsaved ContactMessages with one INSERT and queue their
+    confirmations with another. Repeats within the batch and of messages
+    saved in the last ``dedupe_seconds`` are dropped, found with one
+    indexed read. Returns the messages written.
+    """
+    unique = {}
+    for contact_message in contact_messages:
+        unique.setdefault(_dedupe_key(contact_message), contact_message)
+    if not unique:
+        return []
+
+    # Matched on the lowercased address, as the keys are, so a resubmission
+    # with different case is caught on case-sensitive collations too
+    recent = ContactMessage.objects.annotate(email_lower=Lower('email')).filter(
+        email_lower__in={email for email, _ in unique},
+        created_at__gte=timezone.now() - timedelta(seconds=dedupe_seconds),
+    ).only('email', 'message')
+    for contact_message in recent:
+        unique.pop(_dedupe_key(contact_message), None)
+    fresh = list(unique.values())
+    if fresh:
+        with transaction.atomic():
+            ContactMessage.objects.bulk_create(fresh)
+            send_contact_confirmations(fresh)
+    return fresh
+
+
+class ContactBuffer:
+    """
+    Collects contact messages in a bounded queue and writes them from one
+    background thread, a batch every ``flush_interval`` seconds or as soon
+    as ``batch_size`` are waiting.
+    """
+
+    def __init__(self, batch_size=100, flush_interval=1.0, queue_size=10000, dedupe_seconds=600):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dedupe_seconds = dedupe_seconds
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        options = get_ingest_settings()
+        return cls(
+            batch_size=options['BATCH_SIZE'],
+            flush_interval=options['FLUSH_INTERVAL'],
+            queue_size=options['QUEUE_SIZE'],
+            dedupe_seconds=options['DEDUPE_SECONDS'],
+        )
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='contact-ingest', daemon=True)
+            self._thread.start()
+
+    def submit(self, contact_message):
+        """
+        Queue an unsaved ContactMessage. Returns False if the buffer is
+        full; the caller should then save it directly.
+        """
+        self.start()
+        try:
+            self._queue.put_nowait(contact_message)
+        except queue.Full:
+            return False
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def flush(self):
+        """
+        Write everything queued so far, a batch at a time. A batch that
+        fails is retried one message at a time; messages that still fail
+        go back on the queue for the next flush. Returns the number of
+        messages saved.
+        """
+        written = 0
+        failed = []
+        with self._flush_lock:
+            while True:
+                batch = []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    break
+                try:
+                    written += len(write_batch(batch, self.dedupe_seconds))
+                except Exception:
+                    logger.exception(f"Failed to save {len(batch)} buffered contact messages, retrying one by one")
+                    for contact_message in batch:
+                        try:
+                            written += len(write_batch([contact_message], self.dedupe_seconds))
+                        except Exception:
+                            failed.append(contact_message)
+            for contact_message in failed:
+                if not self._requeue(contact_message):
+                    logger.error(
+                        f"Contact buffer full, dropped message from {contact_message.email}: "
+                        f"{contact_message.message!r}"
+                    )
+        return written
+
+    def _requeue(self, contact_message):
+        try:
+            self._queue.put_nowait(contact_message)
+        except queue.Full:
+            return False
+        return True
+
+    def shutdown(self, timeout=10.0):
+        """
+        Write what is already queued, then stop the thread.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        thread.join(timeout)
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            close_old_connections()
+            self.flush()
+        self.flush()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_contact_buffer():
+    """
+    Return the process-wide contact buffer, creating it on first use.
+    """
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = ContactBuffer.from_settings()
+                atexit.register(_buffer.shutdown)
+    return _buffer
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.archive import archive_before, complete_past_bookings, get_archive_settings, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark finished bookings COMPLETED, then move slots and bookings older than the "
+        "retention window into the archive tables. Safe to interrupt and rerun."
+    )
+
+    def add_arguments(self, parser):
+        options = get_archive_settings()
+        parser.add_argument('--retention-days', type=int, default=options['RETENTION_DAYS'])
+        parser.add_argument('--batch-size', type=int, default=options['BATCH_SIZE'])
+        parser.add_argument(
+            '--pause', type=float, default=options['PAUSE_SECONDS'],
+            help="Seconds to sleep between archive batches."
+        )
+        parser.add_argument(
+            '--complete-only', action='store_true',
+            help="Only mark finished bookings COMPLETED; archive nothing."
+        )
+
+    def handle(self, *args, **options):
+        if options['retention_days'] < 0 or options['batch_size'] < 1:
+            raise CommandError("--retention-days must be >= 0 and --batch-size >= 1")
+        completed = complete_past_bookings(options['batch_size'])
+        self.stdout.write(f"Marked {completed} bookings completed")
+        if options['complete_only']:
+            return
+        try:
+            time_slots, bookings = archive_before(
+                retention_cutoff(options['retention_days']), options['batch_size'], options['pause']
+            )
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted; rerun to continue")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Archived {time_slots} time slots and {bookings} bookings"))
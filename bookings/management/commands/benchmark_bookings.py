@@ -0,0 +1,64 @@
+import json
+from django.core.management.base import BaseCommand
+
+from bookings.benchmark import BookingBenchmark, compare, dump
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test booking and read endpoints against the configured database "
+        "(SQLite or MySQL) and write the results as JSON. Seeds its own tagged "
+        "data and deletes it afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classes', type=int, default=5)
+        parser.add_argument('--slots-per-class', type=int, default=20)
+        parser.add_argument('--seed-bookings', type=int, default=200)
+        parser.add_argument('--member-bookings', type=int, default=50,
+                            help="Bookings held by the member queried by my_bookings")
+        parser.add_argument('--hot-capacity', type=int, default=20, help="Spots on the contended slot")
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=200, help="Requests per scenario")
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help="Only run this scenario; repeat for several")
+        parser.add_argument('--no-cache', action='store_true', help="Bypass the schedule response cache")
+        parser.add_argument('--output', default='bench_output.json')
+        parser.add_argument('--compare', help="Earlier results file to compare against")
+
+    def handle(self, *args, **options):
+        benchmark = BookingBenchmark(
+            classes=options['classes'],
+            slots_per_class=options['slots_per_class'],
+            seed_bookings=options['seed_bookings'],
+            hot_capacity=options['hot_capacity'],
+            member_bookings=options['member_bookings'],
+            concurrency=options['concurrency'],
+            requests=options['requests'],
+            use_cache=not options['no_cache'],
+        )
+        results = benchmark.run(only=options['scenarios'])
+        dump(results, options['output'])
+
+        for name, result in results['scenarios'].items():
+            latency = result['latency_ms']
+            self.stdout.write(
+                f"{name:<20} {result['throughput_rps']:>9.1f} req/s  "
+                f"p50 {latency['p50']:.1f}ms  p95 {latency['p95']:.1f}ms  p99 {latency['p99']:.1f}ms  "
+                f"{result['queries']['per_request']:.1f} queries/req  "
+                f"lock wait {result['lock_wait_ms']['total']:.1f}ms  {result['status_counts']}"
+            )
+        hot_slot = results['run']['hot_slot']
+        style = self.style.ERROR if hot_slot['overbooked'] else self.style.SUCCESS
+        self.stdout.write(style(f"Hot slot: {hot_slot['booked']} booked of {hot_slot['capacity']}"))
+
+        if options['compare']:
+            with open(options['compare']) as handle:
+                previous = json.load(handle)
+            for name, change in compare(results, previous).items():
+                (p95_before, p95_after), (rps_before, rps_after) = change['p95_ms'], change['throughput_rps']
+                self.stdout.write(
+                    f"{name:<20} p95 {p95_before:.1f} -> {p95_after:.1f}ms  "
+                    f"throughput {rps_before:.1f} -> {rps_after:.1f} req/s"
+                )
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
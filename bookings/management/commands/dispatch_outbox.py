@@ -0,0 +1,42 @@
+import time
+from django.core.management.base import BaseCommand
+
+from bookings.outbox import dispatch_batch, get_outbox_settings
+
+
+class Command(BaseCommand):
+    help = "Send pending emails from the outbox in batches. Safe to run several at once."
+
+    def add_arguments(self, parser):
+        options = get_outbox_settings()
+        parser.add_argument('--batch-size', type=int, default=options['BATCH_SIZE'])
+        parser.add_argument('--lease-seconds', type=int, default=options['LEASE_SECONDS'])
+        parser.add_argument('--max-attempts', type=int, default=options['MAX_ATTEMPTS'])
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep polling for new emails instead of exiting once the outbox is empty."
+        )
+        parser.add_argument(
+            '--interval', type=float, default=2.0,
+            help="Seconds to sleep between polls when the outbox is empty (with --loop)."
+        )
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        try:
+            while True:
+                sent, failed = dispatch_batch(
+                    batch_size=options['batch_size'],
+                    lease_seconds=options['lease_seconds'],
+                    max_attempts=options['max_attempts'],
+                )
+                total_sent += sent
+                total_failed += failed
+                if sent or failed:
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Sent {total_sent} emails, {total_failed} failed"))
@@ -0,0 +1,38 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.export import filter_bookings, iter_export
+from bookings.models import Booking
+
+
+class Command(BaseCommand):
+    help = "Stream bookings as CSV or JSON lines, e.g. --start 2025-01-01 --end 2025-03-31 --status COMPLETED"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--start', type=date.fromisoformat, help="First class date (YYYY-MM-DD)")
+        parser.add_argument('--end', type=date.fromisoformat, help="Last class date (YYYY-MM-DD)")
+        parser.add_argument('--gym-class', type=int, help="Class id")
+        parser.add_argument('--status', choices=[choice for choice, _ in Booking.STATUS_CHOICES])
+        parser.add_argument('--output', help="File to write; defaults to stdout")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options['start'] and options['end'] and options['end'] < options['start']:
+            raise CommandError("--end must not be before --start")
+        bookings = filter_bookings(
+            start_date=options['start'], end_date=options['end'],
+            gym_class=options['gym_class'], status=options['status'],
+        )
+        chunks = iter_export(bookings, options['format'], options['chunk_size'])
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', newline='') as handle:
+            lines = 0
+            for chunk in chunks:
+                handle.write(chunk)
+                lines += 1
+        rows = lines - 1 if options['format'] == 'csv' else lines
+        self.stderr.write(self.style.SUCCESS(f"Exported {rows} bookings to {options['output']}"))
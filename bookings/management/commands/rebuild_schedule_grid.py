@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from bookings import grid
+from bookings.models import ScheduleEntry, TimeSlot
+
+
+class Command(BaseCommand):
+    help = "Rebuild the schedule grid summary table from the time slots. Run once after migrating."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Include past time slots.")
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        time_slots = TimeSlot.objects.all()
+        if not options['all']:
+            time_slots = time_slots.filter(start_time__gt=timezone.now())
+        # Entries whose slot is gone are removed by the cascade; stale ones are overwritten
+        written = grid.refresh(time_slots, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} schedule entries ({ScheduleEntry.objects.count()} in the grid)"
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from bookings.reconcile import reconcile_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute available_spots of every upcoming time slot from its capacity and active "
+        "bookings, report the differences and fix them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without fixing it.")
+
+    def handle(self, *args, **options):
+        last_pk = 0
+        checked = drifted = overbooked = 0
+        while True:
+            last_pk, count, drifts = reconcile_batch(last_pk, options['batch_size'], fix=not options['dry_run'])
+            if last_pk is None:
+                break
+            checked += count
+            for drift in drifts:
+                drifted += 1
+                overbooked += drift.overbooked
+                self.stdout.write(str(drift))
+
+        verb = "Found" if options['dry_run'] else "Fixed"
+        summary = f"Checked {checked} time slots. {verb} {drifted} with drift"
+        if overbooked:
+            summary += f", {overbooked} overbooked"
+        self.stdout.write(self.style.SUCCESS(summary + "."))
@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+
+from bookings.holds import get_hold_settings, release_expired_batch
+
+
+class Command(BaseCommand):
+    help = "Expire lapsed PENDING holds and return their spots. Safe to run several at once."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=get_hold_settings()['BATCH_SIZE'])
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep sweeping instead of exiting once no lapsed holds remain."
+        )
+        parser.add_argument(
+            '--interval', type=float, default=10.0,
+            help="Seconds to sleep between sweeps when nothing is due (with --loop)."
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                released = release_expired_batch(options['batch_size'])
+                total += released
+                if released == options['batch_size']:
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Released {total} expired holds"))
@@ -0,0 +1,44 @@
+import logging
+import time
+from django.core.management.base import BaseCommand
+
+from bookings.reminders import get_reminder_settings, send_reminders
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Email a reminder for every confirmed booking of a class starting soon. Reruns skip bookings already reminded."
+
+    def add_arguments(self, parser):
+        options = get_reminder_settings()
+        parser.add_argument(
+            '--hours', type=float, default=options['HOURS_BEFORE'],
+            help="Remind bookings of classes starting within this many hours."
+        )
+        parser.add_argument('--batch-size', type=int, default=options['BATCH_SIZE'])
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep checking for due reminders instead of exiting after one run."
+        )
+        parser.add_argument(
+            '--interval', type=float, default=options['INTERVAL_SECONDS'],
+            help="Seconds to sleep between runs (with --loop)."
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                try:
+                    total += send_reminders(hours_before=options['hours'], batch_size=options['batch_size'])
+                except Exception:
+                    if not options['loop']:
+                        raise
+                    logger.exception("Sending reminders failed; retrying next run")
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Sent {total} reminders"))
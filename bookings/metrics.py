@@ -0,0 +1,285 @@
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def is_lock_statement(sql):
+    """
+    Statements that take or wait on a TimeSlot row lock: the conditional
+    capacity update and any SELECT ... FOR UPDATE.
+    """
+    sql = sql.lstrip().upper()
+    return (sql.startswith('UPDATE') and 'BOOKINGS_TIMESLOT' in sql) or 'FOR UPDATE' in sql
+
+
+class QueryRecorder:
+    """
+    ``connection.execute_wrapper`` hook that times every statement.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.lock_time = 0.0
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.query_time += elapsed
+            if is_lock_statement(sql):
+                self.lock_time += elapsed
+
+
+class ViewMetrics:
+    __slots__ = (
+        'count', 'buckets', 'latency', 'queries', 'query_time', 'lock_time', 'render_time', 'statuses'
+    )
+
+    def __init__(self):
+        self.count = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency = 0.0
+        self.queries = 0
+        self.query_time = 0.0
+        self.lock_time = 0.0
+        self.render_time = 0.0
+        self.statuses = {}
+
+    def add(self, other):
+        self.count += other.count
+        self.buckets = [mine + theirs for mine, theirs in zip(self.buckets, other.buckets)]
+        self.latency += other.latency
+        self.queries += other.queries
+        self.query_time += other.query_time
+        self.lock_time += other.lock_time
+        self.render_time += other.render_time
+        for status_class, count in other.statuses.copy().items():
+            self.statuses[status_class] = self.statuses.get(status_class, 0) + count
+
+
+# Each thread writes only to its own store, so recording never takes a
+# lock; a scrape sums the stores of every live thread plus the totals
+# folded in from threads that have exited.
+_local = threading.local()
+_stores = {}
+_retired = {}
+_stores_lock = threading.Lock()
+
+
+class _StoreHandle:
+    """
+    Lives in the thread-local, so it goes away with its thread.
+    """
+    __slots__ = ('__weakref__',)
+
+
+def _retire(handle_id, store):
+    with _stores_lock:
+        _stores.pop(handle_id, None)
+        for view, metrics in store.items():
+            _retired.setdefault(view, ViewMetrics()).add(metrics)
+
+
+def _thread_store():
+    try:
+        return _local.store
+    except AttributeError:
+        store = _local.store = {}
+        handle = _local.handle = _StoreHandle()
+        with _stores_lock:
+            _stores[id(handle)] = store
+        weakref.finalize(handle, _retire, id(handle), store)
+        return store
+
+
+def record(view, latency, recorder, status_code):
+    store = _thread_store()
+    metrics = store.get(view)
+    if metrics is None:
+        metrics = store[view] = ViewMetrics()
+    metrics.count += 1
+    metrics.buckets[bisect_left(LATENCY_BUCKETS, latency)] += 1
+    metrics.latency += latency
+    metrics.queries += recorder.queries
+    metrics.query_time += recorder.query_time
+    metrics.lock_time += recorder.lock_time
+    metrics.render_time += recorder.render_time
+    status_class = f'{status_code // 100}xx'
+    metrics.statuses[status_class] = metrics.statuses.get(status_class, 0) + 1
+
+
+def snapshot():
+    """
+    Per-view totals merged across all threads.
+    """
+    merged = {}
+    with _stores_lock:
+        stores = list(_stores.values())
+        for view, metrics in _retired.items():
+            merged.setdefault(view, ViewMetrics()).add(metrics)
+    for store in stores:
+        for view, metrics in store.copy().items():
+            merged.setdefault(view, ViewMetrics()).add(metrics)
+    return merged
+
+
+def view_label(view_func, method):
+    """
+    ``ViewSet.action`` for DRF views, the function name otherwise.
+    """
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return getattr(view_func, '__name__', 'unknown')
+    actions = getattr(view_func, 'actions', None) or {}
+    return f"{view_class.__name__}.{actions.get(method.lower(), method.lower())}"
+
+
+# The recorder of the request being handled. A context variable rather
+# than a wrapper on one connection: it follows the request into the
+# thread that runs a sync view under ASGI, and covers every alias.
+_current_recorder = ContextVar('metrics_recorder', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class MetricsMiddleware:
+    """
+    Records latency, query count and time, slot lock wait and response
+    rendering time for every request, keyed by view action.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = request._metrics_recorder = QueryRecorder()
+        token = _current_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        return self._record(request, started, recorder, response)
+
+    async def __acall__(self, request):
+        recorder = request._metrics_recorder = QueryRecorder()
+        token = _current_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        return self._record(request, started, recorder, response)
+
+    def _record(self, request, started, recorder, response):
+        view = getattr(request, '_metrics_view', 'unresolved')
+        record(view, time.perf_counter() - started, recorder, response.status_code)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view = view_label(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        # DRF responses render after the view returns; time that step
+        recorder = request._metrics_recorder
+        started = time.perf_counter()
+
+        def rendered(response):
+            recorder.render_time += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def render_metrics():
+    from .cache import get_cache_stats
+
+    lines = [
+        '# HELP gym_request_duration_seconds Request latency by view action.',
+        '# TYPE gym_request_duration_seconds histogram',
+    ]
+    merged = sorted(snapshot().items())
+    for view, metrics in merged:
+        label = f'view="{_escape(view)}"'
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, metrics.buckets):
+            cumulative += count
+            lines.append(f'gym_request_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+        lines.append(f'gym_request_duration_seconds_bucket{{{label},le="+Inf"}} {metrics.count}')
+        lines.append(f'gym_request_duration_seconds_sum{{{label}}} {metrics.latency:.6f}')
+        lines.append(f'gym_request_duration_seconds_count{{{label}}} {metrics.count}')
+
+    counters = [
+        ('gym_responses_total', 'Responses by view action and status class.', None),
+        ('gym_db_queries_total', 'Database queries by view action.', 'queries'),
+        ('gym_db_query_seconds_total', 'Time spent in database queries.', 'query_time'),
+        ('gym_slot_lock_wait_seconds_total', 'Time spent in statements holding or waiting on TimeSlot row locks.', 'lock_time'),
+        ('gym_serialization_seconds_total', 'Time spent rendering responses.', 'render_time'),
+    ]
+    for name, help_text, attribute in counters:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for view, metrics in merged:
+            label = f'view="{_escape(view)}"'
+            if attribute is None:
+                for status_class, count in sorted(metrics.statuses.items()):
+                    lines.append(f'{name}{{{label},status="{status_class}"}} {count}')
+            else:
+                lines.append(f'{name}{{{label}}} {getattr(metrics, attribute)}')
+
+    lines += [
+        '# HELP gym_schedule_cache_requests_total Schedule cache lookups by result.',
+        '# TYPE gym_schedule_cache_requests_total counter',
+    ]
+    for resource, counts in sorted(get_cache_stats().items()):
+        for result in ('hits', 'misses'):
+            lines.append(
+                f'gym_schedule_cache_requests_total{{resource="{_escape(resource)}",result="{result}"}} {counts[result]}'
+            )
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition of this process's metrics. Restricted to
+    the addresses in METRICS_ALLOWED_IPS.
+    """
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4')
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-17 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_modification_tracking'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['email', 'created_at', 'status'], name='bookings_bo_email_c87c7b_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='bookings_bo_email_180273_idx',
+        ),
+    ]
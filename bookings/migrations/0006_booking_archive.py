@@ -0,0 +1,71 @@
+# Generated by Django 6.0 on 2026-10-17 18:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_my_bookings_covering_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('booking_reference', models.CharField(max_length=20, unique=True)),
+                ('first_name', models.CharField(max_length=100)),
+                ('last_name', models.CharField(max_length=100)),
+                ('email', models.EmailField(max_length=254)),
+                ('phone', models.CharField(max_length=20)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('CONFIRMED', 'Confirmed'), ('CANCELLED', 'Cancelled'), ('COMPLETED', 'Completed')], max_length=20)),
+                ('special_requests', models.CharField(blank=True, max_length=500)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTimeSlot',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('available_spots', models.IntegerField()),
+                ('is_available', models.BooleanField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['start_time'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['end_time'], name='bookings_ti_end_tim_ae1dbb_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedbooking',
+            name='gym_class',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_bookings', to='bookings.gymclass'),
+        ),
+        migrations.AddField(
+            model_name='archivedtimeslot',
+            name='gym_class',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_time_slots', to='bookings.gymclass'),
+        ),
+        migrations.AddField(
+            model_name='archivedbooking',
+            name='time_slot',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='bookings', to='bookings.archivedtimeslot'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedbooking',
+            index=models.Index(fields=['email', 'created_at'], name='bookings_ar_email_9372a9_idx'),
+        ),
+    ]
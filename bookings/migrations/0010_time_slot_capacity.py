@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 18:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0009_waitlist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeslot',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
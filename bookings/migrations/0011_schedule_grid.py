@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-17 18:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0010_time_slot_capacity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleEntry',
+            fields=[
+                ('time_slot', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='schedule_entry', serialize=False, to='bookings.timeslot')),
+                ('day', models.DateField()),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('class_name', models.CharField(max_length=100)),
+                ('class_type', models.CharField(choices=[('PERSONAL', 'Personal Training'), ('GROUP', 'Group Fitness'), ('YOGA', 'Yoga'), ('STRENGTH', 'Strength'), ('CARDIO', 'Cardio'), ('NUTRITION', 'Nutrition')], max_length=20)),
+                ('instructor', models.CharField(max_length=100)),
+                ('available_spots', models.IntegerField()),
+                ('is_available', models.BooleanField()),
+                ('gym_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bookings.gymclass')),
+            ],
+            options={
+                'verbose_name_plural': 'schedule entries',
+                'ordering': ['day', 'class_type', 'instructor', 'start_time'],
+                'indexes': [models.Index(fields=['day', 'class_type', 'instructor', 'start_time'], name='bookings_sc_day_7a3061_idx')],
+            },
+        ),
+    ]
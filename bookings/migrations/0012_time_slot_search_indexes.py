@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-17 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0011_schedule_grid'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='timeslot',
+            name='bookings_ti_is_avai_4e0a80_idx',
+        ),
+        migrations.AddIndex(
+            model_name='gymclass',
+            index=models.Index(fields=['is_active', 'instructor'], name='bookings_gy_is_acti_0dedde_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['is_available', 'start_time', 'available_spots'], name='bookings_ti_is_avai_d76476_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['gym_class', 'is_available', 'start_time'], name='bookings_ti_gym_cla_1866d6_idx'),
+        ),
+    ]
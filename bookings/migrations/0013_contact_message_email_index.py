@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-17 18:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0012_time_slot_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['email', 'created_at'], name='bookings_co_email_19dfba_idx'),
+        ),
+    ]
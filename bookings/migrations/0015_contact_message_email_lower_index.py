@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-17 18:43
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0014_booking_reminders'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='contactmessage',
+            name='bookings_co_email_19dfba_idx',
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(django.db.models.functions.text.Lower('email'), models.F('created_at'), name='contact_email_lower_created'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-17 18:45
+
+from django.db import migrations, models
+
+
+def backfill_capacity(apps, schema_editor):
+    """
+    Record the size of every slot whose spots were edited away from its
+    class's max participants, so reconcile_capacity does not reset them.
+    """
+    TimeSlot = apps.get_model('bookings', 'TimeSlot')
+    time_slots = (
+        TimeSlot.objects.filter(capacity__isnull=True)
+        .annotate(active=models.Count('bookings', filter=models.Q(bookings__status__in=['PENDING', 'CONFIRMED'])))
+        .values_list('pk', 'available_spots', 'active', 'gym_class__max_participants')
+        .order_by('pk')
+    )
+    last_pk = 0
+    while True:
+        rows = list(time_slots.filter(pk__gt=last_pk)[:1000])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        TimeSlot.objects.bulk_update([
+            TimeSlot(pk=pk, capacity=max(available_spots, 0) + active)
+            for pk, available_spots, active, max_participants in rows
+            if max(available_spots, 0) + active != max_participants
+        ], ['capacity'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0015_contact_message_email_lower_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedtimeslot',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_capacity, migrations.RunPython.noop),
+    ]
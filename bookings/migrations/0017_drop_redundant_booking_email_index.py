@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-17 18:48
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0016_backfill_time_slot_capacity'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='bookings_bo_email_90a5d5_idx',
+        ),
+    ]
@@ -1,7 +1,11 @@
 import uuid
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, Lower
 from django.utils import timezone
 
+from .signals import time_slots_changed
+
 class GymClass(models.Model):
     CLASS_TYPES = [
         ('PERSONAL', 'Personal Training'),
@@ -20,41 +24,161 @@ class GymClass(models.Model):
     instructor = models.CharField(max_length=100)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['name']
         indexes = [
             models.Index(fields=['is_active', 'class_type']),
+            # Time slot search by instructor
+            models.Index(fields=['is_active', 'instructor']),
         ]
 
     def __str__(self):
         return f"{self.name} ({self.get_class_type_display()})"
 
 
+class TimeSlotQuerySet(models.QuerySet):
+    def claim_spots(self, time_slot_id, count=1):
+        """
+        Atomically take ``count`` spots from an open time slot with a single
+        conditional UPDATE. Returns True if the spots were claimed.
+        """
+        # is_available is assigned before available_spots: MySQL evaluates SET
+        # clauses left to right, so it must see the pre-decrement value.
+        updated = self.filter(
+            pk=time_slot_id, is_available=True, available_spots__gte=count
+        ).update(
+            is_available=models.Case(
+                models.When(available_spots__gt=count, then=models.Value(True)),
+                default=models.Value(False),
+            ),
+            available_spots=models.F('available_spots') - count,
+            updated_at=timezone.now(),
+        )
+        if updated:
+            self._notify_changed([time_slot_id])
+        return updated == 1
+
+    def release_spots(self, time_slot_id, count=1):
+        """
+        Atomically return ``count`` spots to a time slot and reopen it.
+        """
+        updated = self.filter(pk=time_slot_id).update(
+            available_spots=models.F('available_spots') + count,
+            is_available=True,
+            updated_at=timezone.now(),
+        )
+        if updated:
+            self._notify_changed([time_slot_id])
+        return updated == 1
+
+    def add_spots(self, time_slot_ids, count):
+        """
+        Raise the capacity of every slot in ``time_slot_ids`` by ``count``
+        with one UPDATE and reopen them. Returns the number of slots updated.
+        """
+        class_capacity = GymClass.objects.filter(pk=models.OuterRef('gym_class_id')).values('max_participants')
+        updated = self.filter(pk__in=time_slot_ids).update(
+            capacity=Coalesce('capacity', models.Subquery(class_capacity)) + count,
+            available_spots=models.F('available_spots') + count,
+            is_available=True,
+            updated_at=timezone.now(),
+        )
+        if updated:
+            self._notify_changed(list(time_slot_ids))
+        return updated
+
+    def _notify_changed(self, time_slot_ids):
+        transaction.on_commit(
+            lambda: time_slots_changed.send(sender=self.model, time_slot_ids=time_slot_ids),
+            using=self.db,
+        )
+
+
 class TimeSlot(models.Model):
     gym_class = models.ForeignKey(GymClass, on_delete=models.CASCADE, related_name='time_slots')
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
+    # Spots this slot offers; empty means the class's max_participants.
+    # available_spots is kept in step with it by hand (reconcile_capacity).
+    capacity = models.PositiveIntegerField(null=True, blank=True)
     available_spots = models.IntegerField()
     is_available = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TimeSlotQuerySet.as_manager()
 
     class Meta:
         ordering = ['start_time']
         unique_together = ['gym_class', 'start_time']
         indexes = [
-            models.Index(fields=['is_available', 'start_time']),
+            # Upcoming open slots in cursor order; min_spots is checked
+            # from the index without reading the row
+            models.Index(fields=['is_available', 'start_time', 'available_spots']),
+            # The same, for one class (?gym_class=, ?class_type=, ?instructor=)
+            models.Index(fields=['gym_class', 'is_available', 'start_time']),
+            # Completion and archival sweeps walk finished slots
+            models.Index(fields=['end_time']),
+            # Reminder runs walk the slots starting soon, full or not
+            models.Index(fields=['start_time']),
         ]
 
     def __str__(self):
         return f"{self.gym_class.name} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
 
 
+class ScheduleEntry(models.Model):
+    """
+    Flat copy of a time slot for the weekly schedule grid, kept in step
+    by bookings.grid whenever the slot or its class changes.
+    """
+    time_slot = models.OneToOneField(
+        TimeSlot, on_delete=models.CASCADE, primary_key=True, related_name='schedule_entry'
+    )
+    gym_class = models.ForeignKey(GymClass, on_delete=models.CASCADE, related_name='+')
+    # Local calendar day of start_time
+    day = models.DateField()
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    class_name = models.CharField(max_length=100)
+    class_type = models.CharField(max_length=20, choices=GymClass.CLASS_TYPES)
+    instructor = models.CharField(max_length=100)
+    available_spots = models.IntegerField()
+    is_available = models.BooleanField()
+
+    class Meta:
+        ordering = ['day', 'class_type', 'instructor', 'start_time']
+        verbose_name_plural = 'schedule entries'
+        indexes = [
+            # A week of the grid, already in display order
+            models.Index(fields=['day', 'class_type', 'instructor', 'start_time']),
+        ]
+
+    def __str__(self):
+        return f"{self.class_name} - {self.start_time:%Y-%m-%d %H:%M}"
+
+
+class BookingQuerySet(models.QuerySet):
+    def active(self, now=None):
+        """
+        Bookings that still count against their slot: confirmed ones and
+        holds that have not lapsed, whether or not the sweeper has run.
+        """
+        now = now or timezone.now()
+        return self.filter(
+            models.Q(status='CONFIRMED')
+            | models.Q(status='PENDING') & (models.Q(expires_at__isnull=True) | models.Q(expires_at__gt=now))
+        )
+
+
 class Booking(models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
         ('CONFIRMED', 'Confirmed'),
         ('CANCELLED', 'Cancelled'),
         ('COMPLETED', 'Completed'),
+        ('EXPIRED', 'Expired'),
     ]
 
     booking_reference = models.CharField(max_length=20, unique=True)
@@ -66,13 +190,24 @@ class Booking(models.Model):
     time_slot = models.ForeignKey(TimeSlot, on_delete=models.PROTECT, related_name='bookings')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='CONFIRMED')
     special_requests = models.CharField(max_length=500, blank=True)
+    # When a PENDING hold lapses and its spot goes back to the slot
+    expires_at = models.DateTimeField(null=True, blank=True)
+    # Set by send_reminders once the class reminder has gone out
+    reminder_sent_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = BookingQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['email', 'status', 'created_at']),
+            # Expired hold sweep
+            models.Index(fields=['status', 'expires_at']),
+            # Keyset pagination of the booking list
+            models.Index(fields=['created_at']),
+            # my_bookings: seek by email in page order, filter status from the index
+            models.Index(fields=['email', 'created_at', 'status']),
         ]
         # Unique constraint to prevent duplicate bookings for same slot by same email
         constraints = [
@@ -87,6 +222,117 @@ class Booking(models.Model):
         return f"{self.booking_reference} - {self.email}"
 
 
+class WaitlistEntry(models.Model):
+    """
+    A member queued for a full time slot. Entries are promoted to
+    confirmed bookings, oldest first, whenever the slot frees up.
+    """
+    STATUS_CHOICES = [
+        ('WAITING', 'Waiting'),
+        ('PROMOTED', 'Promoted'),
+        ('LEFT', 'Left'),
+    ]
+
+    time_slot = models.ForeignKey(TimeSlot, on_delete=models.CASCADE, related_name='waitlist_entries')
+    gym_class = models.ForeignKey(GymClass, on_delete=models.CASCADE, related_name='waitlist_entries')
+    first_name = models.CharField(max_length=100)
+    last_name = models.CharField(max_length=100)
+    email = models.EmailField()
+    phone = models.CharField(max_length=20)
+    special_requests = models.CharField(max_length=500, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='WAITING')
+    # Reference of the booking created on promotion
+    booking_reference = models.CharField(max_length=20, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    promoted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        verbose_name_plural = 'waitlist entries'
+        indexes = [
+            # Next in line for a slot
+            models.Index(fields=['time_slot', 'status', 'created_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['email', 'time_slot'],
+                condition=models.Q(status='WAITING'),
+                name='unique_waiting_entry'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.email} waiting for {self.time_slot_id} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    The response to a request sent with an ``Idempotency-Key`` header,
+    replayed to retries of the same request until ``expires_at``.
+    """
+    key = models.CharField(max_length=255, unique=True)
+    # Hash of the request body, so a key reused for a different request is refused
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response_body = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key} ({self.status_code})"
+
+
+class ArchivedTimeSlot(models.Model):
+    """
+    A finished time slot moved out of the live table by the archival job.
+    Keeps the original primary key.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    gym_class = models.ForeignKey(GymClass, on_delete=models.PROTECT, related_name='archived_time_slots')
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    capacity = models.PositiveIntegerField(null=True, blank=True)
+    available_spots = models.IntegerField()
+    is_available = models.BooleanField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['start_time']
+
+    def __str__(self):
+        return f"{self.gym_class.name} - {self.start_time.strftime('%Y-%m-%d %H:%M')} (archived)"
+
+
+class ArchivedBooking(models.Model):
+    """
+    A booking of an archived time slot. Keeps the original primary key.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    booking_reference = models.CharField(max_length=20, unique=True)
+    first_name = models.CharField(max_length=100)
+    last_name = models.CharField(max_length=100)
+    email = models.EmailField()
+    phone = models.CharField(max_length=20)
+    gym_class = models.ForeignKey(GymClass, on_delete=models.PROTECT, related_name='archived_bookings')
+    time_slot = models.ForeignKey(ArchivedTimeSlot, on_delete=models.PROTECT, related_name='bookings')
+    status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES)
+    special_requests = models.CharField(max_length=500, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Booking history by email, in page order
+            models.Index(fields=['email', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.booking_reference} - {self.email} (archived)"
+
+
 class ContactMessage(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField()
@@ -99,7 +345,41 @@ class ContactMessage(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['is_read', 'created_at']),
+            # Duplicate check of buffered contact submissions, by lowercased address
+            models.Index(Lower('email'), 'created_at', name='contact_email_lower_created'),
         ]
 
     def __str__(self):
         return f"Message from {self.name} - {self.created_at.strftime('%Y-%m-%d')}"
+
+
+class EmailOutbox(models.Model):
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Rows are claimed by pushing this forward, so a crashed dispatcher's
+    # batch becomes visible again once the lease runs out.
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name_plural = 'email outbox'
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
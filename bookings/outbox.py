@@ -0,0 +1,134 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .delivery import build_message
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BATCH_SIZE': 100,
+    'LEASE_SECONDS': 300,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BACKOFF': 60,
+}
+
+
+def get_outbox_settings():
+    return {**DEFAULTS, **getattr(settings, 'EMAIL_OUTBOX', {})}
+
+
+def enqueue_email(subject, message, from_email, recipient_list, html_message=None):
+    """
+    Record an email in the outbox. Call it inside the transaction that
+    produced the email so it is only sent if that transaction commits.
+    """
+    return EmailOutbox.objects.create(
+        subject=subject,
+        body=message,
+        html_body=html_message or '',
+        from_email=from_email,
+        recipients=list(recipient_list),
+    )
+
+
+def enqueue_emails(messages):
+    """
+    Bulk form of ``enqueue_email`` for ``(subject, message, from_email,
+    recipient_list, html_message)`` tuples: one INSERT for all of them.
+    """
+    return EmailOutbox.objects.bulk_create([
+        EmailOutbox(
+            subject=subject,
+            body=message,
+            html_body=html_message or '',
+            from_email=from_email,
+            recipients=list(recipient_list),
+        )
+        for subject, message, from_email, recipient_list, html_message in messages
+    ])
+
+
+def claim_batch(batch_size, lease_seconds):
+    """
+    Claim up to ``batch_size`` due emails for this dispatcher. Rows locked
+    by another dispatcher are skipped, and claimed rows are hidden from
+    everyone else for ``lease_seconds``.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', available_at__lte=now)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if ids:
+            EmailOutbox.objects.filter(id__in=ids).update(
+                available_at=now + timedelta(seconds=lease_seconds)
+            )
+    return list(EmailOutbox.objects.filter(id__in=ids))
+
+
+def dispatch_batch(batch_size=None, lease_seconds=None, max_attempts=None, retry_backoff=None):
+    """
+    Claim one batch and send it over a single connection.
+    Returns a ``(sent, failed)`` tuple.
+    """
+    options = get_outbox_settings()
+    batch_size = batch_size or options['BATCH_SIZE']
+    lease_seconds = lease_seconds or options['LEASE_SECONDS']
+    max_attempts = max_attempts or options['MAX_ATTEMPTS']
+    retry_backoff = options['RETRY_BACKOFF'] if retry_backoff is None else retry_backoff
+
+    entries = claim_batch(batch_size, lease_seconds)
+    if not entries:
+        return 0, 0
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        # Nothing can be sent this round; release the batch for a retry.
+        for entry in entries:
+            _record_failure(entry, e, max_attempts, retry_backoff)
+        return 0, len(entries)
+
+    sent_ids = []
+    failed = 0
+    try:
+        for entry in entries:
+            message = build_message(
+                entry.subject, entry.body, entry.from_email, entry.recipients,
+                html_message=entry.html_body, connection=connection
+            )
+            try:
+                message.send()
+            except Exception as e:
+                failed += 1
+                _record_failure(entry, e, max_attempts, retry_backoff)
+            else:
+                sent_ids.append(entry.id)
+    finally:
+        connection.close()
+
+    if sent_ids:
+        EmailOutbox.objects.filter(id__in=sent_ids).update(status='SENT', sent_at=timezone.now())
+    logger.info(f"Outbox batch dispatched: {len(sent_ids)} sent, {failed} failed")
+    return len(sent_ids), failed
+
+
+def _record_failure(entry, error, max_attempts, retry_backoff):
+    attempts = entry.attempts + 1
+    logger.error(f"Failed to send outbox email {entry.id} to {entry.recipients}: {str(error)}")
+    EmailOutbox.objects.filter(id=entry.id).update(
+        attempts=F('attempts') + 1,
+        last_error=str(error),
+        status='FAILED' if attempts >= max_attempts else 'PENDING',
+        available_at=timezone.now() + timedelta(seconds=retry_backoff * (2 ** (attempts - 1))),
+    )
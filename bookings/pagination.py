@@ -0,0 +1,38 @@
+from rest_framework.pagination import CursorPagination
+
+from .models import ArchivedBooking, Booking, TimeSlot
+
+
+class IndexedCursorPagination(CursorPagination):
+    """
+    Keyset pagination: each page seeks past the last row of the previous
+    one instead of counting and offsetting, so deep pages cost the same as
+    the first. ``ordering`` must be served by an index on ``model`` that may
+    lead with the equality-filtered ``index_prefix`` columns; the
+    bookings.E001 system check enforces this.
+    """
+    model = None
+    index_prefix = ()
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class BookingCursorPagination(IndexedCursorPagination):
+    model = Booking
+    ordering = ('-created_at', '-id')
+
+
+class MyBookingsCursorPagination(BookingCursorPagination):
+    index_prefix = ('email',)
+
+
+class TimeSlotCursorPagination(IndexedCursorPagination):
+    model = TimeSlot
+    ordering = ('start_time', 'id')
+    index_prefix = ('is_available',)
+
+
+class ArchivedBookingCursorPagination(IndexedCursorPagination):
+    model = ArchivedBooking
+    ordering = ('-created_at', '-id')
+    index_prefix = ('email',)
@@ -0,0 +1,81 @@
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Booking, TimeSlot
+from .signals import time_slots_changed
+from .waitlist import promote_waitlist
+
+ACTIVE_STATUSES = ('PENDING', 'CONFIRMED')
+
+
+class Drift:
+    __slots__ = ('time_slot_id', 'capacity', 'active', 'available_spots', 'expected')
+
+    def __init__(self, time_slot_id, capacity, active, available_spots, expected):
+        self.time_slot_id = time_slot_id
+        self.capacity = capacity
+        self.active = active
+        self.available_spots = available_spots
+        self.expected = expected
+
+    @property
+    def overbooked(self):
+        return self.active > self.capacity
+
+    def __str__(self):
+        line = (
+            f"time slot {self.time_slot_id}: available_spots {self.available_spots} -> {self.expected} "
+            f"(capacity {self.capacity}, {self.active} active bookings)"
+        )
+        return line + " OVERBOOKED" if self.overbooked else line
+
+
+def reconcile_batch(after_pk, batch_size, fix=True, now=None):
+    """
+    Check up to ``batch_size`` upcoming slots with ids above ``after_pk``
+    against one grouped count of their active bookings, and correct the
+    drifted ones with a single UPDATE. Returns ``(last_pk, checked,
+    drifts)``; ``last_pk`` is None once there is nothing left.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        # Locking the batch makes concurrent bookings and cancellations of
+        # these slots wait, so the count and the fix see the same bookings.
+        time_slots = TimeSlot.objects.filter(pk__gt=after_pk, start_time__gt=now).order_by('pk')
+        if fix:
+            time_slots = time_slots.select_for_update(of=('self',))
+        time_slots = list(
+            time_slots.annotate(slot_capacity=Coalesce('capacity', 'gym_class__max_participants'))
+            .values_list('pk', 'slot_capacity', 'available_spots', 'is_available')[:batch_size]
+        )
+        if not time_slots:
+            return None, 0, []
+
+        active = dict(
+            Booking.objects.filter(
+                time_slot_id__in=[pk for pk, _, _, _ in time_slots], status__in=ACTIVE_STATUSES
+            ).values_list('time_slot_id').annotate(count=models.Count('id')).order_by()
+        )
+        drifts = []
+        for pk, capacity, available_spots, is_available in time_slots:
+            expected = max(capacity - active.get(pk, 0), 0)
+            if available_spots != expected or is_available != (expected > 0):
+                drifts.append(Drift(pk, capacity, active.get(pk, 0), available_spots, expected))
+
+        if fix and drifts:
+            TimeSlot.objects.filter(pk__in=[drift.time_slot_id for drift in drifts]).update(
+                available_spots=models.Case(
+                    *[models.When(pk=drift.time_slot_id, then=models.Value(drift.expected)) for drift in drifts]
+                ),
+                is_available=models.Case(
+                    *[models.When(pk=drift.time_slot_id, then=models.Value(drift.expected > 0)) for drift in drifts]
+                ),
+                updated_at=now,
+            )
+            fixed = [drift.time_slot_id for drift in drifts]
+            transaction.on_commit(lambda: time_slots_changed.send(sender=TimeSlot, time_slot_ids=fixed))
+            # Spots that were wrongly shown as taken go to the waitlist first
+            promote_waitlist([drift.time_slot_id for drift in drifts if drift.expected > drift.available_spots])
+    return time_slots[-1][0], len(time_slots), drifts
+
@@ -0,0 +1,97 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .delivery import build_message
+from .models import Booking
+
+DEFAULTS = {
+    'HOURS_BEFORE': 24,
+    'BATCH_SIZE': 100,
+    'INTERVAL_SECONDS': 300,
+}
+
+
+def get_reminder_settings():
+    return {**DEFAULTS, **getattr(settings, 'BOOKING_REMINDERS', {})}
+
+
+def due_reminders(hours_before, now=None):
+    """
+    Confirmed bookings of slots starting within ``hours_before`` hours that
+    have not been reminded yet: one query, a range on the time slot
+    start_time index joined to bookings by slot.
+    """
+    now = now or timezone.now()
+    return Booking.objects.select_related('gym_class', 'time_slot').filter(
+        status='CONFIRMED',
+        reminder_sent_at__isnull=True,
+        time_slot__start_time__gt=now,
+        time_slot__start_time__lte=now + timedelta(hours=hours_before),
+    ).order_by('time_slot__start_time', 'pk')
+
+
+def claim_batch(hours_before, batch_size, now=None):
+    """
+    Lock up to ``batch_size`` due bookings, skipping rows another run has
+    locked, and stamp them as reminded before any email goes out, so two
+    overlapping runs never pick the same booking. Status is read here,
+    per batch, so a booking cancelled mid-run is not reminded.
+    """
+    with transaction.atomic():
+        bookings = list(
+            due_reminders(hours_before, now).select_for_update(skip_locked=True, of=('self',))[:batch_size]
+        )
+        if bookings:
+            Booking.objects.filter(pk__in=[booking.pk for booking in bookings]).update(
+                reminder_sent_at=timezone.now()
+            )
+    return bookings
+
+
+def send_reminders(hours_before=None, batch_size=None, now=None):
+    """
+    Email every due reminder over one backend connection, claiming and
+    sending ``batch_size`` bookings at a time. If a send fails, its batch
+    is released for the next run and the error is raised. Returns the
+    number of reminders sent.
+    """
+    options = get_reminder_settings()
+    hours_before = hours_before or options['HOURS_BEFORE']
+    batch_size = batch_size or options['BATCH_SIZE']
+    bookings = claim_batch(hours_before, batch_size, now)
+    if not bookings:
+        return 0
+
+    # Compiled once here (and kept by the cached template loader), rendered per booking
+    html_template = get_template('bookings/emails/reminder.html')
+    text_template = get_template('bookings/emails/reminder.txt')
+    sent = 0
+    with get_connection() as connection:
+        while bookings:
+            messages = []
+            for booking in bookings:
+                context = {
+                    'first_name': booking.first_name,
+                    'class_name': booking.gym_class.name,
+                    'start_time': timezone.localtime(booking.time_slot.start_time),
+                    'duration': booking.gym_class.duration_minutes,
+                    'instructor': booking.gym_class.instructor,
+                    'booking_reference': booking.booking_reference,
+                }
+                messages.append(build_message(
+                    f"Reminder - {booking.gym_class.name}", text_template.render(context),
+                    settings.DEFAULT_FROM_EMAIL, [booking.email],
+                    html_message=html_template.render(context), connection=connection,
+                ))
+            try:
+                connection.send_messages(messages)
+            except Exception:
+                Booking.objects.filter(pk__in=[booking.pk for booking in bookings]).update(reminder_sent_at=None)
+                raise
+            sent += len(bookings)
+            bookings = claim_batch(hours_before, batch_size, now) if len(bookings) == batch_size else []
+    return sent
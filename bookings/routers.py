@@ -0,0 +1,139 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def get_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+@contextmanager
+def use_replica():
+    """
+    Let reads inside the block go to a replica. Anything not wrapped in
+    this (or a view with ``replica_reads = True``) reads from the primary.
+    """
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """
+    Read from the primary inside the block, even in a replica-reading view.
+    """
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_allowed(request):
+    """
+    Safe requests from clients that have not written recently.
+    """
+    return request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends opted-in reads to a random replica from DATABASE_REPLICAS and
+    everything else, including any read inside a transaction on the
+    primary, to the default database.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if not replicas or not _replica_reads.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in get_replicas()
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Routes safe requests to views marked ``replica_reads = True`` onto the
+    replicas, and pins a client to the primary for REPLICA_PIN_SECONDS after
+    it writes so it always reads its own writes.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # process_view only sets the flag; this token puts it back, in
+        # whichever context (or sync_to_async thread) the view ran
+        token = _replica_reads.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        return self._pin(request, response)
+
+    async def __acall__(self, request):
+        token = _replica_reads.set(False)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        return self._pin(request, response)
+
+    def _pin(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400 and get_replicas():
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        if getattr(view_class, 'replica_reads', False) and replica_allowed(request):
+            _replica_reads.set(True)
+
+
+class ReplicaChangeListMixin:
+    """
+    ModelAdmin mixin that serves changelist pages from a replica.
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        if not replica_allowed(request):
+            return super().changelist_view(request, extra_context)
+        with use_replica():
+            response = super().changelist_view(request, extra_context)
+            # Render inside the block so template-time queries use the replica too
+            if hasattr(response, 'render'):
+                response.render()
+            return response
@@ -0,0 +1,74 @@
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache, grid
+from .models import TimeSlot
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+
+def expand_recurrence(gym_class, weekdays, times, start_date, end_date, capacity=None, duration_minutes=None):
+    """
+    Yield unsaved TimeSlots for ``gym_class`` on every ``weekdays`` day
+    (0 = Monday) at each of ``times`` from ``start_date`` to ``end_date``
+    inclusive, in the current time zone.
+    """
+    tz = timezone.get_current_timezone()
+    spots = gym_class.max_participants if capacity is None else capacity
+    duration = timedelta(minutes=duration_minutes or gym_class.duration_minutes)
+    weekdays = set(weekdays)
+    day = start_date
+    while day <= end_date:
+        if day.weekday() in weekdays:
+            for start in times:
+                start_time = timezone.make_aware(datetime.combine(day, start), tz)
+                yield TimeSlot(
+                    gym_class=gym_class,
+                    start_time=start_time,
+                    end_time=start_time + duration,
+                    capacity=capacity,
+                    available_spots=spots,
+                    is_available=spots > 0,
+                )
+        day += timedelta(days=1)
+
+
+def generate_time_slots(gym_classes, weekdays, times, start_date, end_date, capacity=None, batch_size=5000):
+    """
+    Expand the recurrence for every class in ``gym_classes`` and insert the
+    slots in ``bulk_create`` batches, skipping any that clash with an
+    existing (gym_class, start_time). Returns ``(generated, created, seconds)``.
+    """
+    gym_classes = list(gym_classes)
+    tz = timezone.get_current_timezone()
+    existing = TimeSlot.objects.filter(
+        gym_class__in=gym_classes,
+        start_time__gte=timezone.make_aware(datetime.combine(start_date, datetime.min.time()), tz),
+        start_time__lt=timezone.make_aware(datetime.combine(end_date + timedelta(days=1), datetime.min.time()), tz),
+    )
+    time_slots = (
+        slot
+        for gym_class in gym_classes
+        for slot in expand_recurrence(gym_class, weekdays, times, start_date, end_date, capacity)
+    )
+
+    started = time.monotonic()
+    before = existing.count()
+    generated = 0
+    with transaction.atomic():
+        while True:
+            batch = list(islice(time_slots, batch_size))
+            if not batch:
+                break
+            generated += len(batch)
+            TimeSlot.objects.bulk_create(batch, batch_size=batch_size, ignore_conflicts=True)
+        # bulk_create skips post_save, so fill the schedule grid and
+        # invalidate cached listings here
+        grid.refresh(existing)
+        gym_class_ids = [gym_class.pk for gym_class in gym_classes]
+        transaction.on_commit(lambda: cache.invalidate_time_slots(gym_class_ids))
+    created = existing.count() - before
+    return generated, created, time.monotonic() - started
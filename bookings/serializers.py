@@ -1,7 +1,7 @@
 from django.utils import timezone
 import uuid
 from rest_framework import serializers
-from .models import GymClass, TimeSlot, Booking, ContactMessage
+from .models import GymClass, TimeSlot, Booking, ContactMessage, ArchivedBooking, WaitlistEntry
 
 class GymClassSerializer(serializers.ModelSerializer):
     class Meta:
@@ -46,13 +46,47 @@ class BookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = ['id', 'booking_reference', 'first_name', 'last_name', 'email', 'phone', 
-                  'gym_class', 'time_slot', 'status', 'special_requests', 'created_at', 'updated_at']
-        read_only_fields = ['booking_reference', 'status', 'created_at', 'updated_at']
+                  'gym_class', 'time_slot', 'status', 'special_requests', 'expires_at', 'created_at', 'updated_at']
+        read_only_fields = ['booking_reference', 'status', 'expires_at', 'created_at', 'updated_at']
+
+
+class BookingCompactSerializer(serializers.ModelSerializer):
+    """
+    Flat booking shape for list screens: no nested class or slot objects.
+    """
+    class_name = serializers.CharField(source='gym_class.name', read_only=True)
+    start_time = serializers.DateTimeField(source='time_slot.start_time', read_only=True)
+    end_time = serializers.DateTimeField(source='time_slot.end_time', read_only=True)
+
+    # Columns to load with .only(); cursor pagination also needs created_at
+    load_fields = (
+        'id', 'booking_reference', 'status', 'created_at',
+        'gym_class__name', 'time_slot__start_time', 'time_slot__end_time',
+    )
+
+    class Meta:
+        model = Booking
+        fields = ['id', 'booking_reference', 'status', 'class_name', 'start_time', 'end_time', 'created_at']
+        read_only_fields = fields
+
+
+class ArchivedBookingSerializer(serializers.ModelSerializer):
+    class_name = serializers.CharField(source='gym_class.name', read_only=True)
+    start_time = serializers.DateTimeField(source='time_slot.start_time', read_only=True)
+    end_time = serializers.DateTimeField(source='time_slot.end_time', read_only=True)
+
+    class Meta:
+        model = ArchivedBooking
+        fields = ['id', 'booking_reference', 'status', 'class_name', 'start_time', 'end_time', 'created_at', 'archived_at']
+        read_only_fields = fields
 
 
 class BookingCreateSerializer(serializers.ModelSerializer):
     gym_class = serializers.PrimaryKeyRelatedField(queryset=GymClass.objects.filter(is_active=True))
     time_slot = serializers.PrimaryKeyRelatedField(queryset=TimeSlot.objects.filter(is_available=True))
+    # Set by validate(): the member's own lapsed hold on the slot, which
+    # the view releases before saving so it does not count as a duplicate
+    lapsed_hold_id = None
 
     class Meta:
         model = Booking
@@ -61,23 +95,30 @@ class BookingCreateSerializer(serializers.ModelSerializer):
     def validate(self, data):
         time_slot = data.get('time_slot')
         email = data.get('email')
+        now = timezone.now()
 
-        # Check availability
+        existing_booking = False
+        if email and time_slot:
+            for pk, booking_status, expires_at in Booking.objects.filter(
+                email=email, 
+                time_slot=time_slot, 
+                status__in=['PENDING', 'CONFIRMED']
+            ).values_list('pk', 'status', 'expires_at'):
+                if booking_status == 'PENDING' and expires_at is not None and expires_at <= now:
+                    self.lapsed_hold_id = pk
+                else:
+                    existing_booking = True
+
+        # Check availability; the lapsed hold gives its spot back first
         if time_slot:
-            if not time_slot.is_available or time_slot.available_spots <= 0:
+            if not time_slot.is_available or time_slot.available_spots + bool(self.lapsed_hold_id) <= 0:
                  raise serializers.ValidationError({"time_slot": "This time slot is no longer available"})
-            if time_slot.start_time < timezone.now():
+            if time_slot.start_time < now:
                 raise serializers.ValidationError({"time_slot": "Cannot book past time slots"})
 
         # Check for duplicates
-        if email and time_slot:
-            existing_booking = Booking.objects.filter(
-                email=email, 
-                time_slot=time_slot, 
-                status__in=['PENDING', 'CONFIRMED']
-            ).exists()
-            if existing_booking:
-                raise serializers.ValidationError({"detail": "You already have a booking for this time slot"})
+        if existing_booking:
+            raise serializers.ValidationError({"detail": "You already have a booking for this time slot"})
 
         return data
 
@@ -86,6 +127,52 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class BookingBatchItemSerializer(serializers.Serializer):
+    """
+    One booking of a batch. Slot and class are plain ids here: the batch
+    checks them all against one locked read of the slots.
+    """
+    first_name = serializers.CharField(max_length=100)
+    last_name = serializers.CharField(max_length=100)
+    email = serializers.EmailField()
+    phone = serializers.CharField(max_length=20)
+    gym_class = serializers.IntegerField()
+    time_slot = serializers.IntegerField()
+    special_requests = serializers.CharField(max_length=500, required=False, allow_blank=True, default='')
+
+
+class BookingBatchSerializer(serializers.Serializer):
+    MAX_ITEMS = 50
+
+    mode = serializers.ChoiceField(choices=['atomic', 'best_effort'], default='atomic')
+    bookings = BookingBatchItemSerializer(many=True, allow_empty=False, max_length=MAX_ITEMS)
+
+
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    time_slot = serializers.PrimaryKeyRelatedField(queryset=TimeSlot.objects.all())
+
+    class Meta:
+        model = WaitlistEntry
+        fields = ['id', 'first_name', 'last_name', 'email', 'phone', 'time_slot', 'special_requests',
+                  'status', 'booking_reference', 'created_at']
+        read_only_fields = ['status', 'booking_reference', 'created_at']
+        # unique_waiting_entry is left to the database: the view answers a
+        # repeated join with the existing entry instead of an error
+        validators = []
+
+    def validate(self, data):
+        time_slot = data['time_slot']
+        if time_slot.start_time < timezone.now():
+            raise serializers.ValidationError({"time_slot": "Cannot join the waitlist of a past time slot"})
+        if Booking.objects.active().filter(email=data['email'], time_slot=time_slot).exists():
+            raise serializers.ValidationError({"detail": "You already have a booking for this time slot"})
+        return data
+
+    def create(self, validated_data):
+        validated_data['gym_class_id'] = validated_data['time_slot'].gym_class_id
+        return super().create(validated_data)
+
+
 class ContactMessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ContactMessage
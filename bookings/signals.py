@@ -0,0 +1,63 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from . import cache, events
+
+# Sent after commit whenever TimeSlot capacity is changed with a queryset
+# update (which bypasses post_save). Receives ``time_slot_ids``.
+time_slots_changed = Signal()
+
+
+@receiver(time_slots_changed)
+def invalidate_changed_time_slots(sender, time_slot_ids, **kwargs):
+    from .models import TimeSlot
+
+    gym_class_ids = set(
+        TimeSlot.objects.filter(pk__in=time_slot_ids).values_list('gym_class_id', flat=True)
+    )
+    cache.invalidate_time_slots(gym_class_ids)
+
+
+@receiver(time_slots_changed)
+def publish_changed_time_slots(sender, time_slot_ids, **kwargs):
+    events.publish_time_slots(time_slot_ids)
+
+
+@receiver(time_slots_changed)
+def update_schedule_grid_availability(sender, time_slot_ids, **kwargs):
+    from .grid import refresh_availability
+
+    refresh_availability(time_slot_ids)
+
+
+@receiver(post_save, sender='bookings.TimeSlot')
+@receiver(post_delete, sender='bookings.TimeSlot')
+def invalidate_saved_time_slot(sender, instance, **kwargs):
+    transaction.on_commit(lambda: cache.invalidate_time_slots([instance.gym_class_id]))
+
+
+@receiver(post_save, sender='bookings.TimeSlot')
+def publish_saved_time_slot(sender, instance, **kwargs):
+    transaction.on_commit(lambda: events.publish_time_slots([instance.pk]))
+
+
+@receiver(post_save, sender='bookings.TimeSlot')
+def refresh_saved_time_slot_grid(sender, instance, **kwargs):
+    from .grid import refresh_time_slots
+
+    transaction.on_commit(lambda: refresh_time_slots([instance.pk]))
+
+
+@receiver(post_save, sender='bookings.GymClass')
+@receiver(post_delete, sender='bookings.GymClass')
+def invalidate_saved_gym_class(sender, instance, **kwargs):
+    transaction.on_commit(lambda: cache.invalidate_classes([instance.pk]))
+
+
+@receiver(post_save, sender='bookings.GymClass')
+def refresh_saved_gym_class_grid(sender, instance, created, **kwargs):
+    from .grid import refresh_gym_classes
+
+    if not created:
+        transaction.on_commit(lambda: refresh_gym_classes([instance.pk]))
@@ -1,10 +1,76 @@
+import asyncio
+import csv
+import gc
+from importlib import import_module
+import json
+import os
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+from django.apps import apps as django_apps
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.mail import get_connection
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.db import DatabaseError, connection, connections
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from asgiref.sync import sync_to_async
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
 from django.utils import timezone
-from datetime import timedelta
-from .models import GymClass, TimeSlot, Booking
+from datetime import time, timedelta
+from . import metrics
+from .admin import TimeSlotAdmin
+from .benchmark import BookingBenchmark, percentile
+from .cache import get_cache_stats
+from .checks import check_cursor_pagination_indexes
+from .export import iter_rows
+from .ingest import ContactBuffer, write_batch
+from .delivery import EmailDeliveryService, build_message
+from .events import EVICTED, InProcessBroker, SubscriberLimitReached
+from .models import ArchivedBooking, ArchivedTimeSlot, ContactMessage, GymClass, IdempotencyKey, ScheduleEntry, WaitlistEntry, TimeSlot, Booking, EmailOutbox
+from .outbox import dispatch_batch
+from .metrics import QueryRecorder
+from .pagination import IndexedCursorPagination
+from .reminders import claim_batch, send_reminders
+from .waitlist import promote_waitlist
+from .scheduling import generate_time_slots
+from .throttling import MemoryStore, reset_store
+from .routers import PIN_COOKIE, PrimaryReplicaRouter, _replica_reads, use_replica
+from .views import TimeSlotViewSet
 
+# Most tests book from one client address far faster than a member would;
+# ThrottlingTests covers the limits themselves.
+without_throttling = override_settings(THROTTLING={'ENABLED': False})
+
+
+class QueryBudgetMixin:
+    """
+    Reusable assertion that a GET stays within a fixed number of queries.
+    Call it before and after growing the data set to prove the cost does
+    not scale with the number of rows on the page.
+    """
+    def assertQueryBudget(self, budget, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(
+            len(queries), budget,
+            f"{url} ran {len(queries)} queries, budget is {budget}:\n"
+            + "\n".join(query['sql'] for query in queries)
+        )
+        return response
+
+
+@without_throttling
 class BookingAPITests(APITestCase):
     def setUp(self):
         self.gym_class = GymClass.objects.create(
@@ -92,3 +158,1725 @@ class BookingAPITests(APITestCase):
         
         self.time_slot.refresh_from_db()
         self.assertEqual(self.time_slot.available_spots, 2)
+
+
+@without_throttling
+class ListQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.gym_class = GymClass.objects.create(
+            name='HIIT',
+            class_type='CARDIO',
+            description='Intervals',
+            max_participants=10
+        )
+        self.start = timezone.now() + timedelta(days=1)
+        self.count = 0
+        cache.clear()
+
+    def _add_bookings(self, n):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create_bookings(n)
+
+    def _create_bookings(self, n):
+        for _ in range(n):
+            start = self.start + timedelta(hours=self.count)
+            time_slot = TimeSlot.objects.create(
+                gym_class=self.gym_class,
+                start_time=start,
+                end_time=start + timedelta(minutes=60),
+                available_spots=10
+            )
+            Booking.objects.create(
+                booking_reference=f'GYM-{self.count:08d}',
+                first_name='Member',
+                last_name=str(self.count),
+                email='member@example.com',
+                phone='123',
+                gym_class=self.gym_class,
+                time_slot=time_slot
+            )
+            self.count += 1
+
+    def test_list_endpoints_cost_constant_queries(self):
+        endpoints = [
+            (1, reverse('booking-list'), None),
+            (2, reverse('timeslot-list'), None),
+            (1, reverse('booking-my-bookings'), {'email': 'member@example.com'}),
+        ]
+        self._add_bookings(1)
+        for budget, url, data in endpoints:
+            self.assertQueryBudget(budget, url, data)
+        self._add_bookings(30)
+        for budget, url, data in endpoints:
+            response = self.assertQueryBudget(budget, url, data)
+            self.assertTrue(response.data)
+
+
+@without_throttling
+class ConcurrentBookingTests(TransactionTestCase):
+    """
+    Fires many simultaneous bookings at one slot and checks that the
+    conditional capacity update never hands out more spots than exist.
+    """
+    capacity = 5
+    workers = 20
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Shared-cache in-memory SQLite cannot serve concurrent writers")
+        self.gym_class = GymClass.objects.create(
+            name='Spin 6am',
+            class_type='CARDIO',
+            description='Early spin',
+            max_participants=self.capacity
+        )
+        start = timezone.now() + timedelta(days=1)
+        self.time_slot = TimeSlot.objects.create(
+            gym_class=self.gym_class,
+            start_time=start,
+            end_time=start + timedelta(minutes=45),
+            available_spots=self.capacity
+        )
+
+    def _book(self, index, barrier, results, headers=None):
+        client = APIClient()
+        data = {
+            'first_name': 'Rider',
+            'last_name': str(index),
+            'email': f'rider{index}@example.com',
+            'phone': '123',
+            'gym_class': self.gym_class.id,
+            'time_slot': self.time_slot.id
+        }
+        try:
+            barrier.wait()
+            results.append(client.post(reverse('booking-list'), data, format='json', **(headers or {})).status_code)
+        finally:
+            connection.close()
+
+    def _run(self, target_args):
+        barrier = threading.Barrier(len(target_args))
+        results = []
+        threads = [
+            threading.Thread(target=self._book, args=(index, barrier, results, headers))
+            for index, headers in target_args
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_parallel_retries_with_one_idempotency_key_book_once(self):
+        results = self._run([(0, {'HTTP_IDEMPOTENCY_KEY': 'same-tap'})] * 8)
+        self.assertEqual(results, [status.HTTP_201_CREATED] * 8)
+        self.assertEqual(Booking.objects.filter(time_slot=self.time_slot).count(), 1)
+        self.time_slot.refresh_from_db()
+        self.assertEqual(self.time_slot.available_spots, self.capacity - 1)
+
+    def test_parallel_bookings_never_overbook(self):
+        results = self._run([(index, None) for index in range(self.workers)])
+
+        self.time_slot.refresh_from_db()
+        booked = Booking.objects.filter(time_slot=self.time_slot).count()
+        self.assertEqual(results.count(status.HTTP_201_CREATED), booked)
+        self.assertEqual(results.count(status.HTTP_400_BAD_REQUEST), self.workers - booked)
+        self.assertEqual(booked, self.capacity)
+        self.assertEqual(self.time_slot.available_spots, self.capacity - booked)
+        self.assertGreaterEqual(self.time_slot.available_spots, 0)
+        self.assertEqual(self.time_slot.is_available, self.time_slot.available_spots > 0)
+
+
+class FlakyEmailBackend(LocmemEmailBackend):
+    """
+    Locmem backend whose first send attempt fails, to exercise retries.
+    """
+    failures = 0
+
+    def send_messages(self, messages):
+        if FlakyEmailBackend.failures == 0:
+            FlakyEmailBackend.failures += 1
+            raise ConnectionError("SMTP connection dropped")
+        return super().send_messages(messages)
+
+
+class EmailDeliveryServiceTests(APITestCase):
+    def _message(self, index):
+        return build_message(
+            f'Subject {index}', 'Body', 'gym@example.com', [f'member{index}@example.com'],
+            html_message='<p>Body</p>'
+        )
+
+    def test_delivers_queued_emails_and_counts_them(self):
+        service = EmailDeliveryService(workers=2, queue_size=50)
+        for index in range(10):
+            self.assertTrue(service.submit(self._message(index)))
+        self.assertTrue(service.drain(timeout=5))
+        service.shutdown()
+
+        self.assertEqual(len(mail.outbox), 10)
+        self.assertEqual(mail.outbox[0].alternatives[0].mimetype, 'text/html')
+        stats = service.stats()
+        self.assertEqual(stats['enqueued'], 10)
+        self.assertEqual(stats['sent'], 10)
+        self.assertEqual(stats['queue_depth'], 0)
+
+    def test_retries_after_a_failed_send(self):
+        FlakyEmailBackend.failures = 0
+        service = EmailDeliveryService(
+            workers=1, retry_backoff=0, backend='bookings.tests.FlakyEmailBackend'
+        )
+        service.submit(self._message(1))
+        service.shutdown()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(service.stats()['retried'], 1)
+
+    def test_rejects_when_queue_is_full(self):
+        service = EmailDeliveryService(workers=0, queue_size=1, enqueue_timeout=0)
+        self.assertTrue(service.submit(self._message(1)))
+        self.assertFalse(service.submit(self._message(2)))
+        self.assertEqual(service.stats()['rejected'], 1)
+        self.assertEqual(service.stats()['queue_depth'], 1)
+
+
+@without_throttling
+class EmailOutboxTests(APITestCase):
+    def setUp(self):
+        self.gym_class = GymClass.objects.create(
+            name='Pilates',
+            class_type='GROUP',
+            description='Core work',
+            max_participants=5
+        )
+        start = timezone.now() + timedelta(days=2)
+        self.time_slot = TimeSlot.objects.create(
+            gym_class=self.gym_class,
+            start_time=start,
+            end_time=start + timedelta(minutes=50),
+            available_spots=1
+        )
+        self.data = {
+            'first_name': 'Ann',
+            'last_name': 'Lee',
+            'email': 'ann@example.com',
+            'phone': '123',
+            'gym_class': self.gym_class.id,
+            'time_slot': self.time_slot.id
+        }
+
+    def test_booking_writes_outbox_row_and_dispatcher_sends_it(self):
+        response = self.client.post(reverse('booking-list'), self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(mail.outbox), 0)
+        entry = EmailOutbox.objects.get()
+        self.assertEqual(entry.recipients, ['ann@example.com'])
+
+        call_command('dispatch_outbox', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('Pilates', mail.outbox[0].subject)
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'SENT')
+        self.assertIsNotNone(entry.sent_at)
+        self.assertEqual(dispatch_batch(), (0, 0))
+
+    def test_rolled_back_booking_leaves_no_email(self):
+        # Full between validation and the capacity claim
+        with mock.patch.object(TimeSlot.objects, 'claim_spots', return_value=False):
+            response = self.client.post(reverse('booking-list'), self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Booking.objects.exists())
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    def test_failed_send_is_retried_later(self):
+        EmailOutbox.objects.create(
+            subject='Hi', body='Body', from_email='gym@example.com', recipients=['a@example.com']
+        )
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=ConnectionError("down")):
+            self.assertEqual(dispatch_batch(retry_backoff=60), (0, 1))
+        entry = EmailOutbox.objects.get()
+        self.assertEqual(entry.status, 'PENDING')
+        self.assertEqual(entry.attempts, 1)
+        self.assertGreater(entry.available_at, timezone.now())
+        # Not due yet
+        self.assertEqual(dispatch_batch(), (0, 0))
+
+
+@without_throttling
+class ScheduleCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.yoga = GymClass.objects.create(
+            name='Yoga', class_type='YOGA', description='Stretch', max_participants=10
+        )
+        self.boxing = GymClass.objects.create(
+            name='Boxing', class_type='CARDIO', description='Punch', max_participants=10
+        )
+        start = timezone.now() + timedelta(days=1)
+        self.yoga_slot = TimeSlot.objects.create(
+            gym_class=self.yoga, start_time=start,
+            end_time=start + timedelta(hours=1), available_spots=5
+        )
+        TimeSlot.objects.create(
+            gym_class=self.boxing, start_time=start,
+            end_time=start + timedelta(hours=1), available_spots=5
+        )
+        self.url = reverse('timeslot-list')
+
+    def _get(self, url, data=None):
+        response = self.client.get(url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_second_read_is_served_from_cache(self):
+        before = get_cache_stats().get('timeslots', {'hits': 0, 'misses': 0})
+        self.assertEqual(self._get(self.url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self._get(self.url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(len(response.data['results']), 2)
+        after = get_cache_stats()['timeslots']
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+
+    def test_booking_invalidates_only_its_class(self):
+        yoga_params = {'gym_class': self.yoga.id}
+        boxing_params = {'gym_class': self.boxing.id}
+        self._get(self.url, yoga_params)
+        self._get(self.url, boxing_params)
+
+        data = {
+            'first_name': 'Kim', 'last_name': 'Park', 'email': 'kim@example.com', 'phone': '1',
+            'gym_class': self.yoga.id, 'time_slot': self.yoga_slot.id
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('booking-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self._get(self.url, yoga_params)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['available_spots'], 4)
+        self.assertEqual(self._get(self.url, boxing_params)['X-Cache'], 'HIT')
+
+    def test_class_edit_invalidates_class_and_slot_listings(self):
+        classes_url = reverse('gymclass-list')
+        self._get(classes_url)
+        self._get(self.url)
+        self.yoga.instructor = 'Sam'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.yoga.save()
+        response = self._get(classes_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn('Sam', [row['instructor'] for row in response.data['results']])
+        self.assertEqual(self._get(self.url)['X-Cache'], 'MISS')
+
+
+@without_throttling
+class CursorPaginationTests(APITestCase):
+    def setUp(self):
+        self.gym_class = GymClass.objects.create(
+            name='Rowing', class_type='CARDIO', description='Erg', max_participants=10
+        )
+        start = timezone.now() + timedelta(days=1)
+        for index in range(7):
+            time_slot = TimeSlot.objects.create(
+                gym_class=self.gym_class, start_time=start + timedelta(hours=index),
+                end_time=start + timedelta(hours=index + 1), available_spots=10
+            )
+            Booking.objects.create(
+                booking_reference=f'GYM-PAGE{index:04d}', first_name='Row', last_name=str(index),
+                email='rower@example.com', phone='1', gym_class=self.gym_class,
+                time_slot=time_slot
+            )
+        # Identical timestamps force the id tie-breaker to keep pages stable
+        Booking.objects.update(created_at=timezone.now())
+
+    def _walk(self, url, data):
+        seen = []
+        while url:
+            response = self.client.get(url, data)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen += [row['id'] for row in response.data['results']]
+            url, data = response.data['next'], None
+        return seen
+
+    def test_pages_cover_every_booking_once(self):
+        expected = list(Booking.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(self._walk(reverse('booking-list'), {'page_size': 3}), expected)
+        self.assertEqual(
+            self._walk(reverse('booking-my-bookings'), {'email': 'rower@example.com', 'page_size': 2}),
+            expected
+        )
+
+    def test_orderings_are_backed_by_indexes(self):
+        self.assertEqual(check_cursor_pagination_indexes(), [])
+
+        class UnindexedPagination(IndexedCursorPagination):
+            model = Booking
+            ordering = ('last_name', 'id')
+
+        errors = check_cursor_pagination_indexes(pagination_classes=[UnindexedPagination])
+        self.assertEqual([error.id for error in errors], ['bookings.E001'])
+
+
+@override_settings(SCHEDULE_CACHE={'TIMEOUT': 0})
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.gym_class = GymClass.objects.create(
+            name='Barre', class_type='GROUP', description='Ballet fitness', max_participants=10
+        )
+        start = timezone.now() + timedelta(days=1)
+        self.time_slot = TimeSlot.objects.create(
+            gym_class=self.gym_class, start_time=start,
+            end_time=start + timedelta(hours=1), available_spots=3
+        )
+        self.url = reverse('timeslot-list')
+        self.params = {'gym_class': self.gym_class.id}
+
+    def test_unchanged_list_returns_304_without_queries(self):
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        # The ETag comes from the cache versions, not from the rows
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_booking_changes_the_validator(self):
+        etag = self.client.get(self.url, self.params)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(TimeSlot.objects.claim_spots(self.time_slot.id))
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['results'][0]['available_spots'], 2)
+
+    def test_slot_leaving_the_list_changes_the_validator(self):
+        etag = self.client.get(self.url, self.params)['ETag']
+        # Newest updated_at and row count could both be unchanged here
+        with self.captureOnCommitCallbacks(execute=True):
+            self.time_slot.is_available = False
+            self.time_slot.save()
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [])
+
+    def test_class_edit_changes_the_slot_validator(self):
+        etag = self.client.get(self.url, self.params)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.gym_class.instructor = 'Alex'
+            self.gym_class.save()
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cached_response_revalidates_without_queries(self):
+        with override_settings(SCHEDULE_CACHE={'TIMEOUT': 30}):
+            cache.clear()
+            etag = self.client.get(self.url, self.params)['ETag']
+            with self.assertNumQueries(0):
+                response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+
+class AvailabilityStreamTests(TransactionTestCase):
+    def test_broker_delivers_only_subscribed_classes(self):
+        async def scenario():
+            broker = InProcessBroker(queue_size=10)
+            subscription = broker.subscribe({1})
+            # Publish from another thread, as request threads do
+            events = [
+                {'time_slot': 5, 'gym_class': 2, 'available_spots': 1, 'is_available': True},
+                {'time_slot': 6, 'gym_class': 1, 'available_spots': 0, 'is_available': False},
+            ]
+            await asyncio.to_thread(broker.publish, events)
+            received = await subscription.get(timeout=1)
+            idle = await subscription.get(timeout=0.01)
+            broker.unsubscribe(subscription)
+            return received, idle, broker.subscriber_count()
+
+        received, idle, remaining = asyncio.run(scenario())
+        self.assertEqual(received['time_slot'], 6)
+        self.assertIsNone(idle)
+        self.assertEqual(remaining, 0)
+
+    def test_slow_subscriber_is_evicted(self):
+        async def scenario():
+            broker = InProcessBroker(queue_size=2)
+            subscription = broker.subscribe(set())
+            events = [
+                {'time_slot': pk, 'gym_class': 1, 'available_spots': 1, 'is_available': True}
+                for pk in range(5)
+            ]
+            broker.publish(events)
+            await asyncio.sleep(0)
+            return await subscription.get(timeout=1), broker.subscriber_count()
+
+        event, remaining = asyncio.run(scenario())
+        self.assertIs(event, EVICTED)
+        self.assertEqual(remaining, 0)
+
+    def test_subscriber_limit(self):
+        async def scenario():
+            broker = InProcessBroker(max_subscribers=1)
+            broker.subscribe(set())
+            broker.subscribe(set())
+
+        with self.assertRaises(SubscriberLimitReached):
+            asyncio.run(scenario())
+
+    def test_stream_sends_snapshot_then_booking_changes(self):
+        gym_class = GymClass.objects.create(
+            name='Kettlebells', class_type='STRENGTH', description='Swing', max_participants=4
+        )
+        start = timezone.now() + timedelta(days=1)
+        time_slot = TimeSlot.objects.create(
+            gym_class=gym_class, start_time=start,
+            end_time=start + timedelta(hours=1), available_spots=1
+        )
+
+        async def scenario():
+            response = await AsyncClient().get(
+                reverse('availability-stream'), {'gym_class': str(gym_class.id)}
+            )
+            stream = response.streaming_content
+            snapshot = await anext(stream)
+            await sync_to_async(TimeSlot.objects.claim_spots)(time_slot.id)
+            change = await asyncio.wait_for(anext(stream), 1)
+            await stream.aclose()
+            return response, snapshot, change
+
+        response, snapshot, change = asyncio.run(scenario())
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        def payload(chunk):
+            return json.loads(chunk.decode().split('data: ')[1])
+
+        self.assertEqual(payload(snapshot)['available_spots'], 1)
+        self.assertEqual(payload(change), {
+            'time_slot': time_slot.id, 'gym_class': gym_class.id,
+            'available_spots': 0, 'is_available': False,
+        })
+
+
+class TimeSlotGenerationTests(APITestCase):
+    def setUp(self):
+        self.gym_class = GymClass.objects.create(
+            name='Circuit', class_type='STRENGTH', description='Stations',
+            duration_minutes=45, max_participants=12
+        )
+
+    def test_command_expands_recurrence_and_skips_existing(self):
+        args = [
+            'generate_timeslots', '--gym-class', str(self.gym_class.id), '--days', 'mon,wed',
+            '--times', '06:00,18:30', '--start', '2030-01-07', '--end', '2030-01-20',
+        ]
+        out = StringIO()
+        call_command(*args, stdout=out)
+        self.assertIn('Generated 8 slots (8 new', out.getvalue())
+
+        slots = TimeSlot.objects.filter(gym_class=self.gym_class)
+        self.assertEqual(slots.count(), 8)
+        first = slots.first()
+        self.assertEqual(first.start_time.weekday(), 0)
+        self.assertEqual(first.end_time - first.start_time, timedelta(minutes=45))
+        self.assertEqual(first.available_spots, 12)
+
+        out = StringIO()
+        call_command(*args, '--capacity', '5', stdout=out)
+        self.assertIn('(0 new, 8 already existed)', out.getvalue())
+        self.assertEqual(slots.count(), 8)
+
+    def test_admin_action_generates_slots(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        url = reverse('admin:bookings_gymclass_changelist')
+        data = {'action': 'generate_timeslots', '_selected_action': [self.gym_class.id]}
+        response = self.client.post(url, data)
+        self.assertContains(response, 'Generate time slots')
+
+        response = self.client.post(url, {
+            **data, 'apply': '1', 'weekdays': ['5'], 'times': '09:00',
+            'start_date': '2030-01-01', 'end_date': '2030-01-31', 'capacity': '8',
+        })
+        self.assertEqual(response.status_code, 302)
+        slots = TimeSlot.objects.filter(gym_class=self.gym_class)
+        self.assertEqual(slots.count(), 4)
+        self.assertTrue(all(slot.available_spots == 8 for slot in slots))
+
+
+class BenchmarkHarnessTests(TransactionTestCase):
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Shared-cache in-memory SQLite cannot serve concurrent writers")
+
+    def test_benchmark_writes_results_and_cleans_up(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command(
+                'benchmark_bookings', '--classes', '2', '--slots-per-class', '3', '--seed-bookings', '5',
+                '--member-bookings', '2', '--hot-capacity', '3', '--concurrency', '4', '--requests', '8',
+                '--output', output, stdout=StringIO()
+            )
+            with open(output) as handle:
+                results = json.load(handle)
+
+        self.assertEqual(
+            set(results['scenarios']),
+            {'hot_slot_booking', 'cold_slot_booking', 'my_bookings', 'timeslots'}
+        )
+        hot = results['scenarios']['hot_slot_booking']
+        self.assertEqual(hot['requests'], 8)
+        self.assertEqual(hot['status_counts'], {'201': 3, '400': 5})
+        self.assertGreater(hot['lock_wait_ms']['total'], 0)
+        self.assertLessEqual(hot['latency_ms']['p50'], hot['latency_ms']['p99'])
+        self.assertFalse(results['run']['hot_slot']['overbooked'])
+        self.assertFalse(GymClass.objects.exists())
+        self.assertFalse(Booking.objects.exists())
+
+
+class BenchmarkHelperTests(APITestCase):
+    def test_percentile_uses_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_cleanup_keeps_other_outbox_rows(self):
+        benchmark = BookingBenchmark(classes=1, slots_per_class=1, seed_bookings=1, member_bookings=1)
+        benchmark.seed()
+        EmailOutbox.objects.create(
+            subject='Booking Confirmation', body='', from_email='gym@example.com',
+            recipients=[f'bench-{benchmark.tag}-9@example.com']
+        )
+        member = EmailOutbox.objects.create(
+            subject='Booking Confirmation', body='', from_email='gym@example.com', recipients=['member@example.com']
+        )
+        benchmark.cleanup()
+        self.assertEqual(list(EmailOutbox.objects.values_list('pk', flat=True)), [member.pk])
+        self.assertFalse(GymClass.objects.exists())
+
+
+@without_throttling
+class MetricsTests(APITestCase):
+    def setUp(self):
+        self.gym_class = GymClass.objects.create(
+            name='Stretch', class_type='YOGA', description='Mobility', max_participants=5
+        )
+        start = timezone.now() + timedelta(days=1)
+        self.time_slot = TimeSlot.objects.create(
+            gym_class=self.gym_class, start_time=start,
+            end_time=start + timedelta(hours=1), available_spots=5
+        )
+
+    def _metric(self, body, name, view):
+        for line in body.splitlines():
+            if line.startswith(f'{name}{{view="{view}"'):
+                return float(line.rsplit(' ', 1)[1])
+        return None
+
+    def test_records_per_action_latency_queries_and_lock_wait(self):
+        before = self.client.get(reverse('metrics')).content.decode()
+        created_before = self._metric(before, 'gym_request_duration_seconds_count', 'BookingViewSet.create') or 0
+
+        data = {
+            'first_name': 'Lee', 'last_name': 'Ray', 'email': 'lee@example.com', 'phone': '1',
+            'gym_class': self.gym_class.id, 'time_slot': self.time_slot.id
+        }
+        self.client.post(reverse('booking-list'), data, format='json')
+        self.client.get(reverse('booking-my-bookings'), {'email': 'lee@example.com'})
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertEqual(
+            self._metric(body, 'gym_request_duration_seconds_count', 'BookingViewSet.create'),
+            created_before + 1
+        )
+        self.assertGreater(self._metric(body, 'gym_db_queries_total', 'BookingViewSet.create'), 0)
+        self.assertGreater(self._metric(body, 'gym_slot_lock_wait_seconds_total', 'BookingViewSet.create'), 0)
+        self.assertGreater(self._metric(body, 'gym_serialization_seconds_total', 'BookingViewSet.my_bookings'), 0)
+        self.assertIn('le="+Inf"', body)
+
+    def test_exited_threads_are_folded_into_the_totals(self):
+        recorder = QueryRecorder()
+        recorder.queries = 2
+        gc.collect()
+        stores = len(metrics._stores)
+        before = metrics.snapshot().get('ThreadTest.list')
+        count = before.count if before else 0
+
+        threads = [threading.Thread(target=metrics.record, args=('ThreadTest.list', 0.01, recorder, 200)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        gc.collect()
+
+        # At most: threads left over from earlier tests may exit meanwhile
+        self.assertLessEqual(len(metrics._stores), stores)
+        self.assertEqual(metrics.snapshot()['ThreadTest.list'].count, count + 3)
+
+    async def test_async_requests_are_recorded(self):
+        # Awaited on the test's own loop, so the view's sync work shares the
+        # test connection
+        response = await self.async_client.get(reverse('gymclass-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(metrics.snapshot()['GymClassViewSet.list'].queries, 0)
+        # Read on the thread that ran the view, where its connection lives
+        wrappers = await sync_to_async(lambda: list(connection.execute_wrappers))()
+        self.assertIn(metrics.record_query, wrappers)
+
+    def test_rejects_scrapes_from_other_addresses(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.1.2.3')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class MyBookingsTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.gym_class = GymClass.objects.create(
+            name='Boxfit', class_type='CARDIO', description='Pads', max_participants=10
+        )
+        now = timezone.now()
+        self.bookings = {}
+        for label, offset, booking_status in [
+            ('past', -timedelta(days=2), 'COMPLETED'),
+            ('upcoming', timedelta(days=2), 'CONFIRMED'),
+            ('cancelled', timedelta(days=3), 'CANCELLED'),
+        ]:
+            time_slot = TimeSlot.objects.create(
+                gym_class=self.gym_class, start_time=now + offset,
+                end_time=now + offset + timedelta(hours=1), available_spots=10
+            )
+            self.bookings[label] = Booking.objects.create(
+                booking_reference=f'GYM-{label.upper()}', first_name='Max', last_name='Fit',
+                email='max@example.com', phone='1', gym_class=self.gym_class,
+                time_slot=time_slot, status=booking_status
+            )
+        self.url = reverse('booking-my-bookings')
+
+    def _references(self, **params):
+        response = self.assertQueryBudget(1, self.url, {'email': 'max@example.com', **params})
+        return [row['booking_reference'] for row in response.data['results']]
+
+    def test_filters_upcoming_and_past(self):
+        self.assertEqual(self._references(), ['GYM-UPCOMING', 'GYM-PAST'])
+        self.assertEqual(self._references(when='upcoming'), ['GYM-UPCOMING'])
+        self.assertEqual(self._references(when='past'), ['GYM-PAST'])
+        response = self.client.get(self.url, {'email': 'max@example.com', 'when': 'soon'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_compact_shape(self):
+        response = self.assertQueryBudget(
+            1, self.url, {'email': 'max@example.com', 'when': 'upcoming', 'compact': '1'}
+        )
+        row = response.data['results'][0]
+        self.assertEqual(
+            set(row), {'id', 'booking_reference', 'status', 'class_name', 'start_time', 'end_time', 'created_at'}
+        )
+        self.assertEqual(row['class_name'], 'Boxfit')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+@without_throttling
+class ReplicaRoutingTests(APITestCase):
+    def setUp(self):
+        self.gym_class = GymClass.objects.create(
+            name='Row', class_type='CARDIO', description='Erg', max_participants=5
+        )
+        start = timezone.now() + timedelta(days=1)
+        self.time_slot = TimeSlot.objects.create(
+            gym_class=self.gym_class, start_time=start,
+            end_time=start + timedelta(hours=1), available_spots=5
+        )
+        self.router = PrimaryReplicaRouter()
+        cache.clear()
+
+    def test_router_only_uses_replica_when_opted_in(self):
+        self.assertEqual(self.router.db_for_read(TimeSlot), 'default')
+        with use_replica():
+            # Test cases run inside a transaction, which pins reads to the primary
+            self.assertEqual(self.router.db_for_read(TimeSlot), 'default')
+            with mock.patch.object(connection, 'in_atomic_block', False):
+                self.assertEqual(self.router.db_for_read(TimeSlot), 'replica')
+        self.assertEqual(self.router.db_for_write(TimeSlot), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'bookings'))
+
+    def _opted_in_reads(self, method, url, data=None):
+        seen = []
+
+        def db_for_read(router, model, **hints):
+            seen.append(_replica_reads.get())
+            return 'default'
+
+        with mock.patch.object(PrimaryReplicaRouter, 'db_for_read', db_for_read):
+            response = getattr(self.client, method)(url, data, format='json')
+        return response, seen
+
+    def test_safe_schedule_reads_opt_in_and_writes_pin_the_client(self):
+        response, seen = self._opted_in_reads('get', reverse('timeslot-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(seen and all(seen))
+
+        data = {
+            'first_name': 'Ada', 'last_name': 'Oar', 'email': 'ada@example.com', 'phone': '1',
+            'gym_class': self.gym_class.id, 'time_slot': self.time_slot.id
+        }
+        response, seen = self._opted_in_reads('post', reverse('booking-list'), data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(any(seen))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        # The pin cookie now rides along, so this client reads from the primary
+        cache.clear()
+        response, seen = self._opted_in_reads('get', reverse('timeslot-list'))
+        self.assertTrue(seen)
+        self.assertFalse(any(seen))
+
+
+    async def test_async_reads_opt_in(self):
+        seen = []
+
+        def db_for_read(router, model, **hints):
+            seen.append(_replica_reads.get())
+            return 'default'
+
+        with mock.patch.object(PrimaryReplicaRouter, 'db_for_read', db_for_read):
+            response = await self.async_client.get(reverse('gymclass-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(seen and all(seen))
+        self.assertFalse(_replica_reads.get())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], SCHEDULE_CACHE={'TIMEOUT': 30})
+class ReplicaLagTests(TransactionTestCase):
+    """
+    A real second SQLite database stands in for a replica that has not
+    caught up with the primary yet.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # Registered here rather than in settings, so the runner neither
+        # checks nor creates it; allowed for this class once it exists
+        cls.databases = {'default', 'replica'}
+        cls.directory = tempfile.mkdtemp()
+        # SQLite whatever the primary runs on, without its backend options
+        connections.settings['replica'] = {
+            **connections.settings['default'],
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.directory, 'replica.sqlite3'),
+            'OPTIONS': {},
+        }
+        with connections['replica'].schema_editor() as editor:
+            editor.create_model(GymClass)
+            editor.create_model(TimeSlot)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        start = timezone.now() + timedelta(days=1)
+        for alias in ('default', 'replica'):
+            gym_class = GymClass.objects.using(alias).create(
+                pk=1, name='Row', class_type='CARDIO', description='Erg', max_participants=5
+            )
+            TimeSlot.objects.using(alias).create(
+                pk=1, gym_class=gym_class, start_time=start, end_time=start + timedelta(hours=1), available_spots=5
+            )
+        cache.clear()
+
+    def _spots(self):
+        response = self.client.get(reverse('timeslot-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results'][0]['available_spots']
+
+    def test_refill_after_a_write_reads_the_primary(self):
+        self.assertEqual(self._spots(), 5)
+        TimeSlot.objects.filter(pk=1).update(available_spots=3)
+        cache.clear()
+        # Without a recent write the listing really comes from the replica
+        self.assertEqual(self._spots(), 5)
+
+        TimeSlot.objects.claim_spots(1)
+        self.assertEqual(self._spots(), 2)
+        # And the primary's rows are what got cached
+        self.assertEqual(self._spots(), 2)
+
+
+class ArchiveTests(APITestCase):
+    def setUp(self):
+        self.gym_class = GymClass.objects.create(
+            name='Spin', class_type='CARDIO', description='Bikes', max_participants=10
+        )
+        now = timezone.now()
+        self.slots = {}
+        for label, offset in [('old', -timedelta(days=400)), ('recent', -timedelta(days=2)), ('future', timedelta(days=2))]:
+            self.slots[label] = TimeSlot.objects.create(
+                gym_class=self.gym_class, start_time=now + offset,
+                end_time=now + offset + timedelta(hours=1), capacity=12, available_spots=10
+            )
+        for index, (label, booking_status) in enumerate([
+            ('old', 'CONFIRMED'), ('old', 'CANCELLED'), ('recent', 'CONFIRMED'), ('future', 'CONFIRMED'),
+        ]):
+            Booking.objects.create(
+                booking_reference=f'GYM-ARCH{index}', first_name='Sam', last_name='Lap',
+                email=f'sam{index}@example.com' if label == 'old' else 'sam@example.com', phone='1',
+                gym_class=self.gym_class, time_slot=self.slots[label], status=booking_status
+            )
+
+    def test_completes_then_archives_in_batches(self):
+        out = StringIO()
+        call_command('archive_bookings', '--batch-size', '1', stdout=out)
+        self.assertIn('Archived 1 time slots and 2 bookings', out.getvalue())
+
+        self.assertEqual(Booking.objects.get(booking_reference='GYM-ARCH2').status, 'COMPLETED')
+        self.assertEqual(Booking.objects.get(booking_reference='GYM-ARCH3').status, 'CONFIRMED')
+        self.assertFalse(TimeSlot.objects.filter(pk=self.slots['old'].pk).exists())
+        self.assertEqual(ArchivedTimeSlot.objects.get().pk, self.slots['old'].pk)
+        self.assertEqual(ArchivedTimeSlot.objects.get().capacity, 12)
+        self.assertEqual(
+            dict(ArchivedBooking.objects.values_list('booking_reference', 'status')),
+            {'GYM-ARCH0': 'COMPLETED', 'GYM-ARCH1': 'CANCELLED'}
+        )
+
+        # A rerun finds nothing left to move
+        out = StringIO()
+        call_command('archive_bookings', stdout=out)
+        self.assertIn('Archived 0 time slots and 0 bookings', out.getvalue())
+
+    def test_history_reads_the_archive(self):
+        call_command('archive_bookings', stdout=StringIO())
+        response = self.client.get(reverse('booking-history'), {'email': 'sam0@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        row = response.data['results'][0]
+        self.assertEqual(row['booking_reference'], 'GYM-ARCH0')
+        self.assertEqual(row['class_name'], 'Spin')
+        self.assertEqual(
+            self.client.get(reverse('booking-history')).status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.yoga = GymClass.objects.create(
+            name='Yin', class_type='YOGA', description='Slow', max_participants=10
+        )
+        self.hiit = GymClass.objects.create(
+            name='Tabata', class_type='CARDIO', description='Fast', max_participants=10
+        )
+        start = timezone.now() + timedelta(days=1)
+        for index, (gym_class, booking_status) in enumerate([
+            (self.yoga, 'CONFIRMED'), (self.yoga, 'CANCELLED'), (self.hiit, 'CONFIRMED'),
+        ]):
+            time_slot = TimeSlot.objects.create(
+                gym_class=gym_class, start_time=start + timedelta(hours=index),
+                end_time=start + timedelta(hours=index + 1), available_spots=10
+            )
+            Booking.objects.create(
+                booking_reference=f'GYM-EXP{index}', first_name='Kim', last_name='Row',
+                email=f'kim{index}@example.com', phone='1', gym_class=gym_class,
+                time_slot=time_slot, status=booking_status
+            )
+
+    def test_rows_are_read_in_fixed_size_chunks(self):
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(iter_rows(Booking.objects.all(), chunk_size=2))
+        self.assertEqual([row[1] for row in rows], ['GYM-EXP0', 'GYM-EXP1', 'GYM-EXP2'])
+        self.assertEqual(len(queries), 2)
+        self.assertIn('LIMIT 2', queries[0]['sql'])
+
+    def test_command_filters_and_formats(self):
+        out = StringIO()
+        call_command('export_bookings', '--gym-class', str(self.yoga.id), '--chunk-size', '1', stdout=out)
+        rows = list(csv.DictReader(StringIO(out.getvalue())))
+        self.assertEqual([row['booking_reference'] for row in rows], ['GYM-EXP0', 'GYM-EXP1'])
+        self.assertEqual(rows[0]['gym_class'], 'Yin')
+
+        out = StringIO()
+        call_command('export_bookings', '--format', 'jsonl', '--status', 'CONFIRMED', stdout=out)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([line['booking_reference'] for line in lines], ['GYM-EXP0', 'GYM-EXP2'])
+        self.assertEqual(lines[1]['class_type'], 'CARDIO')
+
+        out = StringIO()
+        tomorrow = (timezone.now() + timedelta(days=1)).date()
+        call_command('export_bookings', '--end', str(tomorrow - timedelta(days=1)), stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 1)
+
+    def test_admin_action_streams_csv(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        response = self.client.post(reverse('admin:bookings_booking_changelist'), {
+            'action': 'export_csv', 'select_across': '1', 'index': '0',
+            '_selected_action': [Booking.objects.first().pk],
+        })
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(list(csv.DictReader(StringIO(body)))), 3)
+
+
+@without_throttling
+class IdempotencyKeyTests(APITestCase):
+    def setUp(self):
+        self.gym_class = GymClass.objects.create(
+            name='Kettlebell', class_type='STRENGTH', description='Swings', max_participants=5
+        )
+        start = timezone.now() + timedelta(days=1)
+        self.time_slot = TimeSlot.objects.create(
+            gym_class=self.gym_class, start_time=start,
+            end_time=start + timedelta(hours=1), available_spots=5
+        )
+        self.data = {
+            'first_name': 'Jo', 'last_name': 'Swing', 'email': 'jo@example.com', 'phone': '1',
+            'gym_class': self.gym_class.id, 'time_slot': self.time_slot.id
+        }
+        self.url = reverse('booking-list')
+
+    def _post(self, key, data=None):
+        return self.client.post(self.url, data or self.data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_without_touching_the_slot(self):
+        first = self._post('retry-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        with CaptureQueriesContext(connection) as queries:
+            retry = self._post('retry-1')
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(len(queries), 1)
+
+        self.time_slot.refresh_from_db()
+        self.assertEqual(self.time_slot.available_spots, 4)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_key_reused_for_another_request_is_refused(self):
+        self._post('reuse-1')
+        response = self._post('reuse-1', {**self.data, 'email': 'other@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_expired_keys_are_not_replayed_and_get_purged(self):
+        self._post('old-1')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        # The booking exists, so without a live record this is a plain duplicate
+        self.assertEqual(self._post('old-1').status_code, status.HTTP_400_BAD_REQUEST)
+
+        out = StringIO()
+        call_command('purge_idempotency_keys', stdout=out)
+        self.assertIn('Removed 1', out.getvalue())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+@without_throttling
+class BookingHoldTests(APITestCase):
+    def setUp(self):
+        self.gym_class = GymClass.objects.create(
+            name='Barre', class_type='GROUP', description='Ballet', max_participants=3
+        )
+        start = timezone.now() + timedelta(days=1)
+        self.time_slot = TimeSlot.objects.create(
+            gym_class=self.gym_class, start_time=start,
+            end_time=start + timedelta(hours=1), available_spots=3
+        )
+
+    def _hold(self, email='ana@example.com'):
+        response = self.client.post(reverse('booking-hold'), {
+            'first_name': 'Ana', 'last_name': 'Plie', 'email': email, 'phone': '1',
+            'gym_class': self.gym_class.id, 'time_slot': self.time_slot.id
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['status'], 'PENDING')
+        self.assertIsNotNone(response.data['expires_at'])
+        return response.data
+
+    def _confirm(self, hold):
+        return self.client.post(
+            reverse('booking-confirm', args=[hold['id']]),
+            {'booking_reference': hold['booking_reference']}, format='json'
+        )
+
+    def _spots(self):
+        self.time_slot.refresh_from_db()
+        return self.time_slot.available_spots
+
+    def test_hold_then_confirm(self):
+        hold = self._hold()
+        self.assertEqual(self._spots(), 2)
+        self.assertFalse(EmailOutbox.objects.exists())
+
+        response = self._confirm(hold)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'CONFIRMED')
+        self.assertIsNone(response.data['expires_at'])
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+        self.assertEqual(self._confirm(hold).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._spots(), 2)
+
+    def test_sweeper_releases_lapsed_holds_once(self):
+        lapsed = [self._hold(f'late{index}@example.com') for index in range(2)]
+        live = self._hold('ontime@example.com')
+        Booking.objects.filter(pk__in=[hold['id'] for hold in lapsed]).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(self._spots(), 0)
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('release_expired_holds', '--batch-size', '1', stdout=out)
+        self.assertIn('Released 2 expired holds', out.getvalue())
+        self.assertEqual(self._spots(), 2)
+        self.assertEqual(Booking.objects.get(pk=live['id']).status, 'PENDING')
+
+        # An expired hold can neither be confirmed nor give its spot back twice
+        self.assertEqual(self._confirm(lapsed[1]).status_code, status.HTTP_410_GONE)
+        response = self.client.post(
+            reverse('booking-cancel', args=[lapsed[1]['id']]),
+            {'booking_reference': lapsed[1]['booking_reference']}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._spots(), 2)
+        self.assertEqual(self._confirm(live).status_code, status.HTTP_200_OK)
+
+    def test_lapsed_hold_stops_counting_before_the_sweep(self):
+        mine = self._hold()
+        Booking.objects.filter(pk=mine['id']).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        # The member's own lapsed hold no longer makes this a duplicate
+        again = self._hold()
+        self.assertEqual(Booking.objects.get(pk=mine['id']).status, 'EXPIRED')
+        self.assertEqual(self._spots(), 2)
+        self.assertEqual(self._confirm(again).status_code, status.HTTP_200_OK)
+
+        # Other members' lapsed holds keep their spots until the sweep
+        others = [self._hold(f'other{index}@example.com') for index in range(2)]
+        Booking.objects.filter(pk=others[0]['id']).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self._confirm(others[0]).status_code, status.HTTP_410_GONE)
+        self.assertEqual(self._spots(), 0)
+        response = self.client.post(reverse('booking-hold'), {
+            'first_name': 'Ana', 'last_name': 'Plie', 'email': 'late@example.com', 'phone': '1',
+            'gym_class': self.gym_class.id, 'time_slot': self.time_slot.id
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_lapsed_hold_does_not_reopen_a_closed_slot(self):
+        mine = self._hold()
+        Booking.objects.filter(pk=mine['id']).update(expires_at=timezone.now() - timedelta(seconds=1))
+        TimeSlot.objects.filter(pk=self.time_slot.pk).update(is_available=False)
+        response = self.client.post(reverse('booking-batch'), {'bookings': [{
+            'first_name': 'Ana', 'last_name': 'Plie', 'email': 'ana@example.com', 'phone': '1',
+            'gym_class': self.gym_class.id, 'time_slot': self.time_slot.id
+        }]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Booking.objects.get(pk=mine['id']).status, 'PENDING')
+
+
+class WaitlistTests(APITestCase):
+    def setUp(self):
+        self.gym_class = GymClass.objects.create(
+            name='Reformer', class_type='GROUP', description='Pilates', max_participants=1
+        )
+        start = timezone.now() + timedelta(days=1)
+        self.time_slots = [
+            TimeSlot.objects.create(
+                gym_class=self.gym_class, start_time=start + timedelta(hours=index),
+                end_time=start + timedelta(hours=index + 1), available_spots=0, is_available=False
+            )
+            for index in range(2)
+        ]
+        self.booking = Booking.objects.create(
+            booking_reference='GYM-FULL', first_name='First', last_name='In', email='first@example.com',
+            phone='1', gym_class=self.gym_class, time_slot=self.time_slots[0]
+        )
+
+    def _join(self, email, time_slot=None):
+        return self.client.post(reverse('waitlist-list'), {
+            'first_name': 'Wait', 'last_name': 'Er', 'email': email, 'phone': '1',
+            'time_slot': (time_slot or self.time_slots[0]).id
+        }, format='json')
+
+    def test_join_queues_one_entry_per_member(self):
+        first = self._join('w1@example.com')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(first.data['position'], 1)
+        self.assertEqual(self._join('w2@example.com').data['position'], 2)
+
+        retry = self._join('w1@example.com')
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(WaitlistEntry.objects.count(), 2)
+
+        leave = self.client.post(reverse('waitlist-leave', args=[first.data['id']]), {'email': 'w1@example.com'})
+        self.assertEqual(leave.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._join('w3@example.com').data['position'], 2)
+
+        TimeSlot.objects.filter(pk=self.time_slots[1].pk).update(available_spots=1, is_available=True)
+        self.assertEqual(self._join('w1@example.com', self.time_slots[1]).status_code, status.HTTP_409_CONFLICT)
+
+    def test_cancel_promotes_the_next_member(self):
+        self._join('w1@example.com')
+        self._join('w2@example.com')
+        response = self.client.post(
+            reverse('booking-cancel', args=[self.booking.id]), {'booking_reference': 'GYM-FULL'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        promoted = WaitlistEntry.objects.get(email='w1@example.com')
+        self.assertEqual(promoted.status, 'PROMOTED')
+        booking = Booking.objects.get(booking_reference=promoted.booking_reference)
+        self.assertEqual((booking.email, booking.status), ('w1@example.com', 'CONFIRMED'))
+        self.assertEqual(WaitlistEntry.objects.get(email='w2@example.com').status, 'WAITING')
+        self.time_slots[0].refresh_from_db()
+        self.assertEqual(self.time_slots[0].available_spots, 0)
+        self.assertFalse(self.time_slots[0].is_available)
+        self.assertTrue(EmailOutbox.objects.filter(subject__startswith="You're off the waitlist").exists())
+
+    @without_throttling
+    def test_booking_directly_leaves_the_waitlist(self):
+        self._join('w1@example.com')
+        self._join('w2@example.com')
+        TimeSlot.objects.add_spots([self.time_slots[0].id], 1)
+        response = self.client.post(reverse('booking-list'), {
+            'first_name': 'Wait', 'last_name': 'Er', 'email': 'w1@example.com', 'phone': '1',
+            'gym_class': self.gym_class.id, 'time_slot': self.time_slots[0].id
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(WaitlistEntry.objects.get(email='w1@example.com').status, 'LEFT')
+
+        # Cancelling hands the spot to the next member, not back to w1
+        booking = Booking.objects.get(email='w1@example.com')
+        self.client.post(
+            reverse('booking-cancel', args=[booking.id]), {'booking_reference': booking.booking_reference},
+            format='json'
+        )
+        self.assertEqual(WaitlistEntry.objects.get(email='w2@example.com').status, 'PROMOTED')
+        self.assertFalse(Booking.objects.filter(email='w1@example.com', status='CONFIRMED').exists())
+
+    def test_promotion_closes_entries_of_members_already_booked(self):
+        self._join('w1@example.com')
+        self._join('w2@example.com')
+        TimeSlot.objects.add_spots([self.time_slots[0].id], 2)
+        # Booked behind the waitlist's back, as the admin can
+        Booking.objects.create(
+            booking_reference='GYM-ADMIN', first_name='Wait', last_name='Er', email='w1@example.com',
+            phone='1', gym_class=self.gym_class, time_slot=self.time_slots[0]
+        )
+
+        promoted = promote_waitlist([self.time_slots[0].id])
+        self.assertEqual([booking.email for booking in promoted], ['w2@example.com'])
+        self.assertEqual(WaitlistEntry.objects.get(email='w1@example.com').status, 'LEFT')
+
+    def test_bulk_promotion_costs_a_fixed_number_of_queries(self):
+        for time_slot in self.time_slots:
+            for index in range(3):
+                self._join(f'w{index}-{time_slot.id}@example.com', time_slot)
+        TimeSlot.objects.add_spots([slot.id for slot in self.time_slots], 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            promoted = promote_waitlist([slot.id for slot in self.time_slots])
+        self.assertEqual(len(promoted), 4)
+        # slots, booked entries, next in line, entry lock, bookings, entries, one claim per slot, outbox, savepoint
+        self.assertLessEqual(len(queries), 11)
+        self.assertEqual(
+            sorted(WaitlistEntry.objects.filter(status='WAITING').values_list('email', flat=True)),
+            [f'w2-{slot.id}@example.com' for slot in self.time_slots]
+        )
+        self.assertFalse(TimeSlot.objects.filter(available_spots__gt=0).exists())
+
+    def test_admin_capacity_action_promotes(self):
+        self._join('w1@example.com')
+        self._join('w2@example.com')
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        response = self.client.post(reverse('admin:bookings_timeslot_changelist'), {
+            'action': 'add_capacity', '_selected_action': [self.time_slots[0].id], 'apply': '1', 'extra_spots': '3',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(WaitlistEntry.objects.filter(status='PROMOTED').count(), 2)
+        self.time_slots[0].refresh_from_db()
+        self.assertEqual(self.time_slots[0].available_spots, 1)
+
+
+@without_throttling
+class BatchBookingTests(APITestCase):
+    def setUp(self):
+        self.gym_class = GymClass.objects.create(
+            name='Circuit', class_type='STRENGTH', description='Stations', max_participants=10
+        )
+        start = timezone.now() + timedelta(days=1)
+        self.time_slots = [
+            TimeSlot.objects.create(
+                gym_class=self.gym_class, start_time=start + timedelta(days=index),
+                end_time=start + timedelta(days=index, hours=1), available_spots=2
+            )
+            for index in range(3)
+        ]
+        self.url = reverse('booking-batch')
+
+    def _item(self, time_slot, email='pat@example.com'):
+        return {
+            'first_name': 'Pat', 'last_name': 'Lift', 'email': email, 'phone': '1',
+            'gym_class': self.gym_class.id, 'time_slot': time_slot.id
+        }
+
+    def _spots(self):
+        return [slot.available_spots for slot in TimeSlot.objects.order_by('pk')]
+
+    def test_books_a_week_with_one_email(self):
+        items = [self._item(slot) for slot in self.time_slots]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'bookings': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([row['index'] for row in response.data['booked']], [0, 1, 2])
+        self.assertEqual(response.data['booked'][0]['booking']['time_slot']['id'], self.time_slots[0].id)
+        self.assertEqual(self._spots(), [1, 1, 1])
+        self.assertEqual(EmailOutbox.objects.get().subject, 'Booking Confirmation - 3 classes')
+        # slots, duplicates, insert, one claim per slot, waitlists, outbox, re-read, savepoints
+        self.assertLessEqual(len(queries), 11)
+
+    def test_atomic_mode_books_nothing_when_an_item_fails(self):
+        items = [self._item(self.time_slots[0], f'p{index}@example.com') for index in range(3)]
+        response = self.client.post(self.url, {'bookings': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['failures'], [{'index': 2, 'error': 'This time slot is fully booked'}])
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(self._spots(), [2, 2, 2])
+
+    def test_best_effort_mode_books_what_fits(self):
+        Booking.objects.create(
+            booking_reference='GYM-HAVE', first_name='Pat', last_name='Lift', email='pat@example.com',
+            phone='1', gym_class=self.gym_class, time_slot=self.time_slots[1]
+        )
+        items = [
+            self._item(self.time_slots[0], 'a@example.com'),
+            self._item(self.time_slots[0], 'b@example.com'),
+            self._item(self.time_slots[0], 'c@example.com'),
+            self._item(self.time_slots[1]),
+            self._item(self.time_slots[2]),
+            self._item(self.time_slots[2]),
+        ]
+        response = self.client.post(self.url, {'mode': 'best_effort', 'bookings': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([row['index'] for row in response.data['booked']], [0, 1, 4])
+        self.assertEqual([row['index'] for row in response.data['failures']], [2, 3, 5])
+        self.assertEqual(self._spots(), [0, 2, 1])
+        self.assertEqual(EmailOutbox.objects.count(), 3)
+
+
+class CapacityReconciliationTests(APITestCase):
+    def setUp(self):
+        self.gym_class = GymClass.objects.create(
+            name='Bootcamp', class_type='GROUP', description='Outdoors', max_participants=4
+        )
+        start = timezone.now() + timedelta(days=1)
+        self.time_slots = []
+        for index, (capacity, available_spots) in enumerate([(None, 3), (None, 4), (6, 1), (None, 4)]):
+            self.time_slots.append(TimeSlot.objects.create(
+                gym_class=self.gym_class, start_time=start + timedelta(hours=index),
+                end_time=start + timedelta(hours=index + 1), capacity=capacity, available_spots=available_spots
+            ))
+        # Slot 0 is right; slot 1 lost a decrement; slot 2 lost releases;
+        # slot 3 holds more active bookings than it has spots
+        bookings = [(0, 'CONFIRMED'), (1, 'CONFIRMED'), (1, 'PENDING'), (2, 'CANCELLED')]
+        bookings += [(3, 'CONFIRMED')] * 5
+        for index, (slot, booking_status) in enumerate(bookings):
+            Booking.objects.create(
+                booking_reference=f'GYM-REC{index}', first_name='Rec', last_name='On',
+                email=f'rec{index}@example.com', phone='1', gym_class=self.gym_class,
+                time_slot=self.time_slots[slot], status=booking_status
+            )
+
+    def _spots(self):
+        return [(slot.available_spots, slot.is_available) for slot in TimeSlot.objects.order_by('pk')]
+
+    def test_reports_then_fixes_drift_in_batches(self):
+        before = self._spots()
+        out = StringIO()
+        call_command('reconcile_capacity', '--dry-run', stdout=out)
+        self.assertIn('Found 3 with drift, 1 overbooked', out.getvalue())
+        self.assertIn(f'time slot {self.time_slots[1].pk}: available_spots 4 -> 2', out.getvalue())
+        self.assertEqual(self._spots(), before)
+
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('reconcile_capacity', '--batch-size', '2', stdout=out)
+        self.assertIn('Checked 4 time slots. Fixed 3 with drift, 1 overbooked.', out.getvalue())
+        self.assertEqual(self._spots(), [(3, True), (2, True), (6, True), (0, False)])
+        # Slots and one grouped count per batch, the empty last batch, and a
+        # waitlist pass for the batch that freed spots: never one per slot
+        selects = [query for query in queries if query['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 7)
+
+        out = StringIO()
+        call_command('reconcile_capacity', stdout=out)
+        self.assertIn('Fixed 0 with drift.', out.getvalue())
+
+    def test_backfill_and_admin_edits_record_capacity(self):
+        backfill = import_module('bookings.migrations.0016_backfill_time_slot_capacity').backfill_capacity
+        backfill(django_apps, None)
+        # Slot 0 matches its class; slots 1 and 3 were resized, by their spots and active bookings
+        self.assertEqual(
+            list(TimeSlot.objects.order_by('pk').values_list('capacity', flat=True)), [None, 6, 6, 9]
+        )
+
+        time_slot = self.time_slots[0]
+        time_slot.available_spots = 7
+        TimeSlotAdmin(TimeSlot, admin.site).save_model(
+            mock.Mock(), time_slot, mock.Mock(changed_data=['available_spots']), True
+        )
+        time_slot.refresh_from_db()
+        self.assertEqual(time_slot.capacity, 8)
+
+        out = StringIO()
+        call_command('reconcile_capacity', stdout=out)
+        self.assertEqual(TimeSlot.objects.get(pk=time_slot.pk).available_spots, 7)
+        self.assertEqual(TimeSlot.objects.get(pk=self.time_slots[1].pk).available_spots, 4)
+
+
+@without_throttling
+class ScheduleGridTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.yoga = GymClass.objects.create(
+            name='Vinyasa', class_type='YOGA', description='Flow', max_participants=2, instructor='Ira'
+        )
+        self.strength = GymClass.objects.create(
+            name='Deadlift', class_type='STRENGTH', description='Pull', max_participants=2, instructor='Bo'
+        )
+        self.monday = timezone.localdate() + timedelta(days=7 - timezone.localdate().weekday())
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_time_slots(
+                [self.yoga, self.strength], [0, 2], [time(7, 0), time(18, 0)], self.monday,
+                self.monday + timedelta(days=6)
+            )
+        self.url = reverse('schedule-list')
+
+    def test_week_is_grouped_from_one_read(self):
+        response = self.assertQueryBudget(1, self.url, {'start': self.monday.isoformat()})
+        days = response.data['days']
+        self.assertEqual([day['date'] for day in days], [self.monday, self.monday + timedelta(days=2)])
+        groups = days[0]['groups']
+        self.assertEqual([(group['class_type'], group['instructor']) for group in groups], [('STRENGTH', 'Bo'), ('YOGA', 'Ira')])
+        self.assertEqual([slot['class_name'] for slot in groups[1]['slots']], ['Vinyasa', 'Vinyasa'])
+        self.assertEqual(set(groups[1]['slots'][0]), {
+            'id', 'gym_class', 'class_name', 'start_time', 'end_time', 'available_spots', 'is_available'
+        })
+
+        response = self.client.get(self.url, {'start': self.monday.isoformat(), 'days': 1, 'class_type': 'YOGA'})
+        self.assertEqual([group['class_type'] for group in response.data['days'][0]['groups']], ['YOGA'])
+        self.assertEqual(self.client.get(self.url, {'days': 90}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'start': 'monday'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bookings_and_class_edits_update_the_grid(self):
+        time_slot = TimeSlot.objects.filter(gym_class=self.yoga).first()
+        data = {
+            'first_name': 'Una', 'last_name': 'Pose', 'email': 'una@example.com', 'phone': '1',
+            'gym_class': self.yoga.id, 'time_slot': time_slot.id
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('booking-list'), data, format='json')
+        entry = ScheduleEntry.objects.get(time_slot=time_slot)
+        self.assertEqual(entry.available_spots, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('booking-cancel', args=[response.data['id']]),
+                {'booking_reference': response.data['booking_reference']}, format='json'
+            )
+        entry.refresh_from_db()
+        self.assertEqual(entry.available_spots, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.yoga.instructor = 'Mo'
+            self.yoga.save()
+        entry.refresh_from_db()
+        self.assertEqual(entry.instructor, 'Mo')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.yoga.is_active = False
+            self.yoga.save()
+        self.assertFalse(ScheduleEntry.objects.filter(gym_class=self.yoga).exists())
+
+    def test_rebuild_command(self):
+        ScheduleEntry.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_schedule_grid', stdout=out)
+        self.assertIn('Wrote 8 schedule entries', out.getvalue())
+
+
+class TimeSlotSearchTests(APITestCase):
+    def setUp(self):
+        self.yoga = GymClass.objects.create(
+            name='Vinyasa', class_type='YOGA', description='Flow', max_participants=4, instructor='Ira'
+        )
+        self.strength = GymClass.objects.create(
+            name='Deadlift', class_type='STRENGTH', description='Pull', max_participants=2, instructor='Bo'
+        )
+        self.start = timezone.localdate() + timedelta(days=1)
+        generate_time_slots(
+            [self.yoga, self.strength], range(7), [time(7, 0), time(18, 0)], self.start,
+            self.start + timedelta(days=6)
+        )
+        self.url = reverse('timeslot-list')
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results']
+
+    def test_filters_combine(self):
+        self.assertEqual(len(self.search(class_type='YOGA')), 14)
+        self.assertEqual(len(self.search(instructor='Bo')), 14)
+        self.assertEqual(len(self.search(gym_class=self.yoga.id, date_from=self.start, date_to=self.start)), 2)
+
+        evenings = self.search(class_type='STRENGTH', time_from='12:00', date_to=self.start + timedelta(days=2))
+        self.assertEqual(len(evenings), 3)
+        self.assertTrue(all(timezone.localtime(slot.start_time).hour == 18 for slot in TimeSlot.objects.filter(
+            pk__in=[slot['id'] for slot in evenings]
+        )))
+        self.assertEqual(len(self.search(time_to='08:00', min_spots=3)), 7)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.strength.is_active = False
+            self.strength.save()
+        self.assertEqual(self.search(instructor='Bo'), [])
+
+    def test_invalid_filters_are_rejected(self):
+        for params in (
+            {'class_type': 'DANCE'}, {'date_from': 'tomorrow'}, {'min_spots': 0}, {'time_to': '25:00'},
+            {'date_from': self.start + timedelta(days=1), 'date_to': self.start},
+        ):
+            self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_every_filter_seeks_an_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("Plan assertions read SQLite's EXPLAIN QUERY PLAN")
+        for params in (
+            {}, {'gym_class': self.yoga.id}, {'class_type': 'YOGA'}, {'instructor': 'Ira'},
+            {'date_from': self.start, 'date_to': self.start + timedelta(days=2)},
+            {'time_from': '06:00', 'time_to': '09:00'}, {'min_spots': 2},
+            {'class_type': 'YOGA', 'date_from': self.start, 'min_spots': 3},
+        ):
+            view = TimeSlotViewSet(action='list', request=Request(APIRequestFactory().get(self.url, params)))
+            plan = view.get_queryset().order_by('start_time', 'id')[:20].explain()
+            accesses = [line for line in plan.splitlines() if 'bookings_timeslot' in line]
+            self.assertTrue(accesses, plan)
+            for line in accesses:
+                self.assertIn('SEARCH bookings_timeslot USING', line, f"{params}:\n{plan}")
+
+
+@override_settings(THROTTLING={'RATES': {'booking': '2/min', 'contact': '1/min'}})
+class ThrottlingTests(APITestCase):
+    def setUp(self):
+        reset_store()
+        self.gym_class = GymClass.objects.create(
+            name='Spin', class_type='CARDIO', description='Ride', max_participants=10, instructor='Ada'
+        )
+        self.time_slot = TimeSlot.objects.create(
+            gym_class=self.gym_class, start_time=timezone.now() + timedelta(days=1),
+            end_time=timezone.now() + timedelta(days=1, hours=1), available_spots=10
+        )
+        self.url = reverse('booking-list')
+
+    def book(self, email, ip='10.0.0.1'):
+        data = {
+            'first_name': 'Rae', 'last_name': 'Pace', 'email': email, 'phone': '1',
+            'gym_class': self.gym_class.id, 'time_slot': self.time_slot.id
+        }
+        return self.client.post(self.url, data, format='json', REMOTE_ADDR=ip)
+
+    def test_ip_and_email_budgets(self):
+        self.assertEqual(self.book('a@example.com').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.book('b@example.com').status_code, status.HTTP_201_CREATED)
+        response = self.book('c@example.com')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+
+        # Another address has its own bucket, but an email's is shared
+        self.assertEqual(self.book('d@example.com', ip='10.0.0.2').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.book('d@example.com', ip='10.0.0.3').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.book('D@example.com', ip='10.0.0.4').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.client.get(reverse('timeslot-list'), REMOTE_ADDR='10.0.0.1').status_code, status.HTTP_200_OK)
+
+    def test_forwarded_for_header_does_not_pick_the_bucket(self):
+        for index in range(2):
+            response = self.client.post(self.url, {}, format='json', HTTP_X_FORWARDED_FOR=f'203.0.113.{index}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, {}, format='json', HTTP_X_FORWARDED_FOR='203.0.113.9')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_memory_store_evicts_least_recently_used(self):
+        store = MemoryStore(max_keys=2)
+        store.take('a', 1, 1, 1000.0)
+        store.take('b', 1, 1, 1000.0)
+        self.assertGreater(store.take('a', 1, 1, 1000.0), 0)
+        store.take('c', 1, 1, 1000.0)
+        self.assertEqual(list(store.buckets), ['a', 'c'])
+        # A clock stepping back does not drain the bucket
+        self.assertGreater(store.take('a', 1, 1, 900.0), 0)
+        self.assertGreater(store.take('a', 1, 1, 1000.5), 0)
+        self.assertEqual(store.take('a', 1, 1, 1001.0), 0)
+
+    def test_buckets_refill(self):
+        with mock.patch('bookings.throttling.time.time', return_value=1000.0) as clock:
+            self.book('a@example.com')
+            self.book('b@example.com')
+            self.assertEqual(self.book('c@example.com').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            clock.return_value = 1030.0
+            self.assertEqual(self.book('c@example.com').status_code, status.HTTP_201_CREATED)
+            self.assertEqual(self.book('d@example.com').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_contact_budget(self):
+        data = {'name': 'Rae', 'email': 'rae@example.com', 'subject': 'Hi', 'message': 'Hello'}
+        self.assertEqual(self.client.post(reverse('contact-list'), data, format='json').status_code, status.HTTP_201_CREATED)
+        response = self.client.post(reverse('contact-list'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '60')
+
+    @override_settings(THROTTLING={'STORE': 'cache', 'RATES': {'booking': '1/min'}})
+    def test_shared_cache_store(self):
+        cache.clear()
+        self.assertEqual(self.book('a@example.com').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.book('b@example.com').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIsNotNone(cache.get('throttle:booking:ip:10.0.0.1'))
+
+
+@without_throttling
+class ContactMessageTests(APITestCase):
+    def setUp(self):
+        self.url = reverse('contact-list')
+        self.data = {'name': 'Rae', 'email': 'rae@example.com', 'phone': '1', 'message': 'Do you have lockers?'}
+
+    def test_submission_is_written_once(self):
+        with mock.patch('bookings.views.send_contact_confirmation') as send, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(queries), 1, "\n".join(query['sql'] for query in queries))
+        self.assertEqual(ContactMessage.objects.count(), 1)
+        self.assertEqual(response.data['data']['id'], ContactMessage.objects.get().id)
+        send.assert_called_once()
+
+    @override_settings(CONTACT_INGEST={'BUFFERED': True})
+    def test_buffered_submissions_are_batched_and_deduplicated(self):
+        buffer = ContactBuffer(flush_interval=3600)
+        self.addCleanup(buffer.shutdown)
+        with mock.patch('bookings.views.get_contact_buffer', return_value=buffer):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url, self.data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            self.assertEqual(len(queries), 0)
+            self.client.post(self.url, {**self.data, 'email': 'RAE@example.com'}, format='json')
+            self.client.post(self.url, {**self.data, 'message': 'And towels?'}, format='json')
+
+            self.assertEqual(buffer.flush(), 2)
+            self.assertEqual(ContactMessage.objects.count(), 2)
+            self.assertEqual(EmailOutbox.objects.count(), 2)
+
+            # A retry after the batch was written is still a repeat, in any case
+            self.client.post(self.url, self.data, format='json')
+            self.client.post(self.url, {**self.data, 'email': 'RAE@Example.com'}, format='json')
+            self.assertEqual(buffer.flush(), 0)
+            self.assertEqual(ContactMessage.objects.count(), 2)
+
+    def test_failed_batch_is_saved_row_by_row_or_requeued(self):
+        buffer = ContactBuffer(flush_interval=3600)
+        self.addCleanup(buffer.shutdown)
+        for email in ('a@example.com', 'bad@example.com', 'b@example.com'):
+            buffer._queue.put_nowait(ContactMessage(name='Rae', email=email, message='Hi'))
+        real_write_batch = write_batch
+
+        def flaky(contact_messages, dedupe_seconds):
+            if len(contact_messages) > 1 or contact_messages[0].email == 'bad@example.com':
+                raise DatabaseError("deadlock")
+            return real_write_batch(contact_messages, dedupe_seconds)
+
+        with mock.patch('bookings.ingest.write_batch', side_effect=flaky):
+            self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(sorted(ContactMessage.objects.values_list('email', flat=True)), ['a@example.com', 'b@example.com'])
+        self.assertEqual(buffer._queue.qsize(), 1)
+        self.assertEqual(buffer.flush(), 1)
+
+
+class ReminderTests(APITestCase):
+    def setUp(self):
+        self.gym_class = GymClass.objects.create(
+            name='Spin', class_type='CARDIO', description='Ride', max_participants=10, instructor='Ada'
+        )
+        now = timezone.now()
+        soon = TimeSlot.objects.create(
+            gym_class=self.gym_class, start_time=now + timedelta(hours=3),
+            end_time=now + timedelta(hours=4), available_spots=10
+        )
+        later = TimeSlot.objects.create(
+            gym_class=self.gym_class, start_time=now + timedelta(days=3),
+            end_time=now + timedelta(days=3, hours=1), available_spots=10
+        )
+        for index, (time_slot, booking_status) in enumerate([
+            (soon, 'CONFIRMED'), (soon, 'CONFIRMED'), (soon, 'CONFIRMED'), (soon, 'CANCELLED'),
+            (soon, 'PENDING'), (later, 'CONFIRMED'),
+        ]):
+            Booking.objects.create(
+                booking_reference=f'GYM-REM{index}', first_name='Rae', last_name='Pace',
+                email=f'member{index}@example.com', phone='1', gym_class=self.gym_class,
+                time_slot=time_slot, status=booking_status
+            )
+
+    def _statements(self, queries):
+        return [query['sql'] for query in queries if not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+
+    def test_reminders_are_sent_in_batches_once(self):
+        with mock.patch('bookings.reminders.get_connection', wraps=get_connection) as connect, \
+                CaptureQueriesContext(connection) as queries:
+            self.assertEqual(send_reminders(hours_before=24, batch_size=2), 3)
+        connect.assert_called_once()
+        # A locked read and a claiming stamp per batch
+        self.assertEqual(len(self._statements(queries)), 4)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [
+            'member0@example.com', 'member1@example.com', 'member2@example.com'
+        ])
+        self.assertIn('Booking Reference: GYM-REM0', mail.outbox[0].body)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(send_reminders(hours_before=24), 0)
+        self.assertEqual(len(self._statements(queries)), 1)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_overlapping_runs_and_cancellations_are_not_reminded(self):
+        # Another run has claimed the first booking
+        self.assertEqual(len(claim_batch(24, 1)), 1)
+        real_send = LocmemEmailBackend.send_messages
+
+        def send_then_cancel(backend, messages):
+            Booking.objects.filter(booking_reference='GYM-REM2').update(status='CANCELLED')
+            return real_send(backend, messages)
+
+        with mock.patch.object(LocmemEmailBackend, 'send_messages', send_then_cancel):
+            self.assertEqual(send_reminders(hours_before=24, batch_size=1), 1)
+        self.assertEqual([message.to[0] for message in mail.outbox], ['member1@example.com'])
+
+    def test_failed_send_releases_the_batch(self):
+        with mock.patch.object(LocmemEmailBackend, 'send_messages', side_effect=ConnectionError("smtp down")):
+            with self.assertRaises(ConnectionError):
+                send_reminders(hours_before=24)
+        self.assertFalse(Booking.objects.exclude(reminder_sent_at=None).exists())
+        self.assertEqual(send_reminders(hours_before=24), 3)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('send_reminders', '--hours', '96', stdout=out)
+        self.assertIn('Sent 4 reminders', out.getvalue())
+        self.assertFalse(Booking.objects.filter(status='CONFIRMED', reminder_sent_at__isnull=True).exists())
@@ -0,0 +1,182 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.throttling import BaseThrottle
+
+DEFAULTS = {
+    'ENABLED': True,
+    # 'memory' keeps the buckets in this process; 'cache' shares them
+    # through CACHE_ALIAS so every worker draws on the same budget.
+    'STORE': 'memory',
+    'CACHE_ALIAS': 'default',
+    # The memory store evicts its least recently used buckets beyond this
+    'MAX_KEYS': 100000,
+    # Per endpoint: burst size / refill period, applied to the client IP
+    # and to the submitted email separately. None turns a scope off.
+    'RATES': {
+        'booking': '20/min',
+        'contact': '5/min',
+    },
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def get_throttle_settings():
+    configured = getattr(settings, 'THROTTLING', {})
+    return {**DEFAULTS, **configured, 'RATES': {**DEFAULTS['RATES'], **configured.get('RATES', {})}}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """
+    ``'20/min'`` -> ``(20, 20 / 60)``: bucket capacity and tokens refilled
+    per second.
+    """
+    count, period = rate.split('/')
+    count = int(count)
+    return count, count / PERIODS[period[0]]
+
+
+def take_token(state, capacity, refill, now):
+    """
+    Refill a ``(tokens, stamp)`` bucket up to ``now`` and take one token.
+    Returns the new state and 0, or the seconds until a token is due.
+    """
+    if state is None:
+        tokens = capacity
+    else:
+        tokens, stamp = state
+        # Wall clocks step backwards, and cache store hosts disagree: time
+        # before the last stamp is neither refilled nor counted twice
+        tokens = min(capacity, tokens + max(0, now - stamp) * refill)
+        now = max(now, stamp)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / refill
+
+
+class MemoryStore:
+    """
+    Buckets in a dict behind one lock: no I/O on the request path, but
+    each process enforces its own budget.
+    """
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()
+
+    def take(self, key, capacity, refill, now):
+        with self.lock:
+            self.buckets[key], wait = take_token(self.buckets.get(key), capacity, refill, now)
+            self.buckets.move_to_end(key)
+            # Forgetting a bucket hands its owner a full one, so the
+            # longest idle go first
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+class CacheStore:
+    """
+    Buckets in a shared cache, one get and one set per key. The read and
+    write are not atomic, so concurrent requests of one client can
+    overdraw a bucket by a token or two.
+    """
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def take(self, key, capacity, refill, now):
+        state, wait = take_token(self.cache.get(key), capacity, refill, now)
+        # Kept until it would have refilled anyway
+        self.cache.set(key, state, timeout=int((capacity - state[0]) / refill) + 1)
+        return wait
+
+    def clear(self):
+        pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = get_throttle_settings()
+                if config['STORE'] == 'cache':
+                    _store = CacheStore(config['CACHE_ALIAS'])
+                else:
+                    _store = MemoryStore(config['MAX_KEYS'])
+    return _store
+
+
+def reset_store():
+    """
+    Forget every bucket and re-read the store settings.
+    """
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.clear()
+        _store = None
+
+
+@receiver(setting_changed)
+def reset_store_on_settings_change(sender, setting, **kwargs):
+    if setting == 'THROTTLING':
+        reset_store()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Lets a request through while both the client IP's bucket and the
+    submitted email's bucket for ``scope`` hold a token; otherwise DRF
+    answers 429 with Retry-After.
+    """
+    scope = None
+
+    def allow_request(self, request, view):
+        config = get_throttle_settings()
+        rate = config['RATES'].get(self.scope)
+        if not config['ENABLED'] or rate is None:
+            return True
+        capacity, refill = parse_rate(rate)
+        store = get_store()
+        now = time.time()
+        for key in self.get_keys(request):
+            self.retry_after = store.take(f'throttle:{self.scope}:{key}', capacity, refill, now)
+            if self.retry_after:
+                return False
+        return True
+
+    def get_keys(self, request):
+        keys = [f'ip:{self.get_ident(request)}']
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if isinstance(email, str) and email.strip():
+            keys.append(f'email:{email.strip().lower()}')
+        return keys
+
+    def wait(self):
+        return self.retry_after
+
+
+class BookingThrottle(TokenBucketThrottle):
+    scope = 'booking'
+
+
+class ContactThrottle(TokenBucketThrottle):
+    scope = 'contact'
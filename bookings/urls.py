@@ -1,13 +1,20 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import GymClassViewSet, TimeSlotViewSet, BookingViewSet, ContactMessageViewSet
+from .metrics import metrics_view
+from .views import (
+    GymClassViewSet, TimeSlotViewSet, ScheduleViewSet, BookingViewSet, WaitlistViewSet, ContactMessageViewSet, availability_stream
+)
 
 router = DefaultRouter()
 router.register(r'classes', GymClassViewSet)
 router.register(r'timeslots', TimeSlotViewSet, basename='timeslot')
+router.register(r'schedule', ScheduleViewSet, basename='schedule')
 router.register(r'bookings', BookingViewSet, basename='booking')
+router.register(r'waitlist', WaitlistViewSet, basename='waitlist')
 router.register(r'contact', ContactMessageViewSet, basename='contact')
 
 urlpatterns = [
+    path('availability/stream/', availability_stream, name='availability-stream'),
+    path('metrics/', metrics_view, name='metrics'),
     path('', include(router.urls)),
 ]
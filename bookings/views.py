@@ -1,45 +1,133 @@
-from django.db import transaction
-from django.db.models import F
+import json
+from datetime import date, timedelta
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import Value
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
 from rest_framework import viewsets, status, mixins
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 
-from .models import GymClass, TimeSlot, Booking, ContactMessage
+from .models import GymClass, TimeSlot, Booking, ContactMessage, ArchivedBooking, WaitlistEntry
 from .serializers import (
     GymClassSerializer, 
     TimeSlotSerializer, 
     BookingSerializer, 
+    BookingCompactSerializer,
     BookingCreateSerializer,
+    BookingBatchSerializer,
+    ArchivedBookingSerializer,
+    WaitlistEntrySerializer,
     ContactMessageSerializer
 )
+from . import idempotency
+from .cache import CachedResponseMixin
+from .conditional import ConditionalGetMixin
+from .pagination import (
+    ArchivedBookingCursorPagination, BookingCursorPagination, MyBookingsCursorPagination, TimeSlotCursorPagination
+)
+from .events import EVICTED, SubscriberLimitReached, current_availability, get_broker, get_stream_settings
+from .batch import BatchRejected, book_batch
+from .forms import TimeSlotSearchForm
+from .grid import week_grid
+from .holds import confirm_hold, hold_expiry, release_lapsed_hold
+from .ingest import get_contact_buffer, get_ingest_settings
+from .throttling import BookingThrottle, ContactThrottle
+from .waitlist import leave_waitlists, position as waitlist_position, promote_waitlist
 from .emails import send_booking_confirmation, send_booking_cancellation, send_contact_confirmation
 
-class GymClassViewSet(viewsets.ReadOnlyModelViewSet):
+class GymClassViewSet(CachedResponseMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = GymClass.objects.filter(is_active=True)
     serializer_class = GymClassSerializer
     permission_classes = [AllowAny]
+    cache_resource = 'classes'
+    replica_reads = True
 
 
-class TimeSlotViewSet(viewsets.ReadOnlyModelViewSet):
+class TimeSlotViewSet(CachedResponseMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = TimeSlotSerializer
     permission_classes = [AllowAny]
+    cache_resource = 'timeslots'
+    pagination_class = TimeSlotCursorPagination
+    replica_reads = True
 
-    def get_queryset(self):
-        queryset = TimeSlot.objects.filter(is_available=True, start_time__gt=timezone.now())
+    def get_cache_scopes(self):
+        # A class-filtered listing only goes stale when that class changes
         gym_class_id = self.request.query_params.get('gym_class')
         if gym_class_id:
-            queryset = queryset.filter(gym_class_id=gym_class_id)
-        return queryset
+            return [f'timeslots:class:{gym_class_id}']
+        return ['timeslots']
+
+    def get_queryset(self):
+        # Value(True) keeps ``is_available = true`` in the SQL; a bare
+        # boolean column in the WHERE clause cannot seek on the
+        # (is_available, start_time, ...) index on every backend.
+        queryset = TimeSlot.objects.select_related('gym_class').filter(
+            is_available=Value(True), start_time__gt=timezone.now()
+        )
+        if self.action != 'list':
+            return queryset
+        form = TimeSlotSearchForm(self.request.query_params)
+        if not form.is_valid():
+            raise ValidationError(form.errors)
+        return form.filter(queryset)
+
+
+class ScheduleViewSet(viewsets.ViewSet):
+    """
+    Weekly timetable: ``?start=YYYY-MM-DD&days=7`` with optional
+    ``class_type`` and ``instructor``, grouped by day, class type and
+    instructor. Served from the ScheduleEntry summary table.
+    """
+    permission_classes = [AllowAny]
+    replica_reads = True
+    max_days = 31
+
+    def list(self, request):
+        try:
+            start = request.query_params.get('start')
+            start = date.fromisoformat(start) if start else timezone.localdate()
+            days = int(request.query_params.get('days', 7))
+        except ValueError:
+            return Response(
+                {"error": "Invalid request", "message": "start must be YYYY-MM-DD and days a number."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 1 <= days <= self.max_days:
+            return Response(
+                {"error": "Invalid request", "message": f"days must be between 1 and {self.max_days}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            "start": start,
+            "end": start + timedelta(days=days - 1),
+            "days": week_grid(
+                start, days,
+                class_type=request.query_params.get('class_type'),
+                instructor=request.query_params.get('instructor'),
+            ),
+        })
 
 
 class BookingViewSet(viewsets.ModelViewSet):
     permission_classes = [AllowAny]
+    pagination_class = BookingCursorPagination
+
+    def get_throttles(self):
+        # Only the endpoints that take a slot lock and send email
+        if self.action in ('create', 'hold', 'batch'):
+            return [BookingThrottle()]
+        return super().get_throttles()
 
     def get_serializer_class(self):
-        if self.action == 'create':
+        if self.action in ('create', 'hold'):
             return BookingCreateSerializer
+        if self.action == 'batch':
+            return BookingBatchSerializer
         return BookingSerializer
 
     def get_queryset(self):
@@ -47,43 +135,75 @@ class BookingViewSet(viewsets.ModelViewSet):
         # For admin/debug purposes, listed all or filtered by user could be done here.
         # Restricting standard list to empty for security if no auth is used, 
         # but PRD implies open for now or just my_bookings.
-        return Booking.objects.all()
+        # Join the nested class and slot rows so a page costs a fixed number of queries.
+        return Booking.objects.select_related('gym_class', 'time_slot__gym_class')
 
-    @transaction.atomic
     def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        
-        try:
-            # Lock the time slot
-            time_slot = TimeSlot.objects.select_for_update().get(id=serializer.validated_data['time_slot'].id)
-            
-            if time_slot.available_spots <= 0:
+        # A retry of a request that already succeeded is answered from the
+        # stored response: no validation queries and no slot update.
+        idempotency_key = idempotency.get_key(request)
+        if idempotency_key:
+            if len(idempotency_key) > 255:
                 return Response(
-                    {"error": "No spots available", "message": "This class is fully booked."},
+                    {"error": "Invalid Idempotency-Key", "message": "Keys must be at most 255 characters."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            
-            # Create booking
-            booking = serializer.save()
-            
-            # Decrement spots
-            time_slot.available_spots -= 1
-            if time_slot.available_spots == 0:
-                time_slot.is_available = False
-            time_slot.save()
-            
-            # Send confirmation email
-            send_booking_confirmation(booking)
-            
-            # Return full booking details
-            response_serializer = BookingSerializer(booking)
-            return Response(response_serializer.data, status=status.HTTP_201_CREATED)
-            
-        except TimeSlot.DoesNotExist:
-             return Response(
-                {"error": "Time slot not found"},
-                status=status.HTTP_404_NOT_FOUND
+            request_fingerprint = idempotency.fingerprint(request)
+            record = idempotency.find(idempotency_key)
+            if record is not None:
+                return idempotency.replay(record, request_fingerprint)
+
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            # A concurrent request with the same key may have committed since
+            # the lookup above, making this one look like a duplicate
+            record = idempotency_key and idempotency.find(idempotency_key)
+            if record:
+                return idempotency.replay(record, request_fingerprint)
+            raise ValidationError(serializer.errors)
+        time_slot = serializer.validated_data['time_slot']
+        
+        try:
+            with transaction.atomic():
+                # Taken first so a concurrent retry waits for this request's outcome
+                if idempotency_key:
+                    record = idempotency.reserve(idempotency_key, request_fingerprint)
+
+                # The member's lapsed hold would still trip the unique constraint
+                if serializer.lapsed_hold_id:
+                    release_lapsed_hold(serializer.lapsed_hold_id)
+
+                # Create booking
+                booking = serializer.save()
+                
+                # Claim a spot with a conditional update instead of locking the
+                # slot up front. It runs last so the row lock it takes is only
+                # held until the commit straight after.
+                if not TimeSlot.objects.claim_spots(time_slot.id):
+                    transaction.set_rollback(True)
+                    return Response(
+                        {"error": "No spots available", "message": "This class is fully booked."},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                
+                leave_waitlists([booking])
+
+                # Queue confirmation email; it is only sent if this commits
+                send_booking_confirmation(booking)
+
+                data = BookingSerializer(booking).data
+                if idempotency_key:
+                    idempotency.complete(record, status.HTTP_201_CREATED, data)
+        except IntegrityError:
+            # Either a concurrent request with the same key committed first,
+            # or this email already holds an active booking for the slot.
+            if idempotency_key:
+                record = idempotency.find(idempotency_key)
+                if record is not None:
+                    return idempotency.replay(record, request_fingerprint)
+            return Response(
+                {"error": "Duplicate booking", "message": "You already have a booking for this time slot."},
+                status=status.HTTP_409_CONFLICT
             )
         except Exception as e:
             # Log error
@@ -91,6 +211,9 @@ class BookingViewSet(viewsets.ModelViewSet):
                 {"error": "Booking failed", "message": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        
+        # Return full booking details
+        return Response(data, status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['get'])
     def my_bookings(self, request):
@@ -101,12 +224,158 @@ class BookingViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        bookings = Booking.objects.filter(email=email).exclude(status='CANCELLED').order_by('-created_at')
-        serializer = BookingSerializer(bookings, many=True)
-        return Response(serializer.data)
+        when = request.query_params.get('when')
+        if when not in (None, 'upcoming', 'past'):
+            return Response(
+                {"error": "when must be 'upcoming' or 'past'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        compact = request.query_params.get('compact') in ('1', 'true')
+        
+        # Served by the (email, created_at, status) index: rows come out in
+        # page order and the status test needs no table lookup.
+        bookings = Booking.objects.filter(email=email).exclude(status__in=['CANCELLED', 'EXPIRED'])
+        if when == 'upcoming':
+            bookings = bookings.filter(time_slot__start_time__gt=timezone.now())
+        elif when == 'past':
+            bookings = bookings.filter(time_slot__start_time__lte=timezone.now())
+        
+        if compact:
+            bookings = bookings.select_related('gym_class', 'time_slot').only(*BookingCompactSerializer.load_fields)
+            serializer_class = BookingCompactSerializer
+        else:
+            bookings = bookings.select_related('gym_class', 'time_slot__gym_class')
+            serializer_class = BookingSerializer
+        
+        paginator = MyBookingsCursorPagination()
+        page = paginator.paginate_queryset(bookings, request, view=self)
+        serializer = serializer_class(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def history(self, request):
+        """
+        Archived bookings for an email. my_bookings only covers the live
+        tables; bookings older than the retention window are read here.
+        """
+        email = request.query_params.get('email')
+        if not email:
+            return Response(
+                {"error": "Email parameter is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        bookings = ArchivedBooking.objects.filter(email=email).select_related('gym_class', 'time_slot')
+        paginator = ArchivedBookingCursorPagination()
+        page = paginator.paginate_queryset(bookings, request, view=self)
+        serializer = ArchivedBookingSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Book several slots or several people in one request:
+        ``{"mode": "atomic" | "best_effort", "bookings": [...]}``.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['bookings']
+
+        try:
+            booked, failures = book_batch(items, serializer.validated_data['mode'])
+        except BatchRejected as e:
+            return Response(
+                {
+                    "error": "Batch rejected",
+                    "message": "No bookings were made.",
+                    "failures": [{"index": index, "error": error} for index, error in sorted(e.failures.items())],
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except IntegrityError:
+            return Response(
+                {"error": "Duplicate booking", "message": "One of these bookings already exists."},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        # Re-read by reference: bulk_create cannot return ids on MySQL
+        saved = Booking.objects.select_related('gym_class', 'time_slot__gym_class').in_bulk(
+            [booking.booking_reference for _, booking in booked], field_name='booking_reference'
+        )
+        results = [
+            {"index": index, "booking": BookingSerializer(saved[booking.booking_reference]).data}
+            for index, booking in booked
+        ]
+        return Response(
+            {
+                "booked": results,
+                "failures": [{"index": index, "error": error} for index, error in sorted(failures.items())],
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['post'])
+    def hold(self, request):
+        """
+        Reserve a spot for BOOKING_HOLDS['HOLD_SECONDS'] as a PENDING booking.
+        POST /bookings/{id}/confirm/ finalizes it; lapsed holds are released
+        by the release_expired_holds command.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        time_slot = serializer.validated_data['time_slot']
+
+        try:
+            with transaction.atomic():
+                if serializer.lapsed_hold_id:
+                    release_lapsed_hold(serializer.lapsed_hold_id)
+                booking = serializer.save(status='PENDING', expires_at=hold_expiry())
+                if not TimeSlot.objects.claim_spots(time_slot.id):
+                    transaction.set_rollback(True)
+                    return Response(
+                        {"error": "No spots available", "message": "This class is fully booked."},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+        except IntegrityError:
+            return Response(
+                {"error": "Duplicate booking", "message": "You already have a booking for this time slot."},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        return Response(BookingSerializer(booking).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def confirm(self, request, pk=None):
+        booking = self.get_object()
+
+        booking_reference = request.data.get('booking_reference')
+        if booking.booking_reference != booking_reference:
+            return Response(
+                {"error": "Invalid request", "message": "Booking reference matches are required for confirmation."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        with transaction.atomic():
+            confirmed = confirm_hold(booking.pk)
+            if confirmed:
+                booking.refresh_from_db()
+                leave_waitlists([booking])
+                send_booking_confirmation(booking)
+
+        if confirmed:
+            return Response(BookingSerializer(booking).data, status=status.HTTP_200_OK)
+        booking.refresh_from_db()
+        if booking.status in ('PENDING', 'EXPIRED'):
+            return Response(
+                {"error": "Hold expired", "message": "This hold has expired; please book again."},
+                status=status.HTTP_410_GONE
+            )
+        return Response(
+            {"error": "Not a hold", "message": f"This booking is {booking.status.lower()}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
     @action(detail=True, methods=['post'])
-    @transaction.atomic
     def cancel(self, request, pk=None):
         booking = self.get_object()
         
@@ -118,24 +387,28 @@ class BookingViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        if booking.status == 'CANCELLED':
+        with transaction.atomic():
+            # Update booking status only if it still holds a spot (nobody
+            # cancelled it and its hold was not swept concurrently), so a
+            # spot is released at most once per booking.
+            cancelled = Booking.objects.filter(pk=booking.pk, status__in=['PENDING', 'CONFIRMED']).update(
+                status='CANCELLED', updated_at=timezone.now()
+            )
+            
+            if cancelled:
+                # Increment spots, then hand the spot to the next in line
+                TimeSlot.objects.release_spots(booking.time_slot_id)
+                promote_waitlist([booking.time_slot_id])
+                
+                # Queue cancellation email alongside the status change
+                booking.refresh_from_db()
+                send_booking_cancellation(booking)
+
+        if not cancelled:
             return Response(
                 {"error": "Already cancelled", "message": "This booking is already cancelled."},
                 status=status.HTTP_400_BAD_REQUEST
             )
-
-        # Update booking status
-        booking.status = 'CANCELLED'
-        booking.save()
-        
-        # Increment spots
-        time_slot = TimeSlot.objects.select_for_update().get(id=booking.time_slot.id)
-        time_slot.available_spots += 1
-        time_slot.is_available = True
-        time_slot.save()
-        
-        # Send cancellation email
-        send_booking_cancellation(booking)
         
         return Response(
             {"message": "Booking cancelled successfully", "booking": BookingSerializer(booking).data},
@@ -147,25 +420,132 @@ class ContactMessageViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
     queryset = ContactMessage.objects.all()
     serializer_class = ContactMessageSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [ContactThrottle]
 
     def create(self, request, *args, **kwargs):
-        response = super().create(request, *args, **kwargs)
-        # Send confirmation email
-        # Need to fetch the instance created to pass to email function.
-        # But 'super().create' returns response data, not instance.
-        # So we can just use validated_data or retrieve instance if needed.
-        # Actually simplest is to override perform_create or access serializer.instance?
-        # But for generic viewset 'create' method logic:
-        # It calls serializer.save().
-        
-        # Let's customize to get instance easily.
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+
+        if get_ingest_settings()['BUFFERED']:
+            # Saved with the next batch; repeats of a recent message are dropped there
+            if get_contact_buffer().submit(ContactMessage(**serializer.validated_data)):
+                return Response(
+                    {"message": "Message received", "data": serializer.data},
+                    status=status.HTTP_202_ACCEPTED
+                )
+
         contact_message = serializer.save()
-        
         send_contact_confirmation(contact_message)
-        
+
         return Response(
             {"message": "Message sent successfully", "data": serializer.data},
             status=status.HTTP_201_CREATED
         )
+
+
+class WaitlistViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
+    queryset = WaitlistEntry.objects.all()
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [AllowAny]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        time_slot = serializer.validated_data['time_slot']
+        if time_slot.is_available and time_slot.available_spots > 0:
+            return Response(
+                {"error": "Spots available", "message": "This class has free spots; book it directly."},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        try:
+            with transaction.atomic():
+                entry = serializer.save()
+                # A spot freed while this request was in flight goes to the queue now
+                promote_waitlist([time_slot.id])
+        except IntegrityError:
+            # Already waiting: hand back that entry rather than queueing twice
+            entry = WaitlistEntry.objects.get(
+                email=serializer.validated_data['email'], time_slot=time_slot, status='WAITING'
+            )
+            return Response(
+                {**WaitlistEntrySerializer(entry).data, "position": waitlist_position(entry)},
+                status=status.HTTP_200_OK
+            )
+
+        entry.refresh_from_db()
+        place = waitlist_position(entry) if entry.status == 'WAITING' else None
+        return Response(
+            {**WaitlistEntrySerializer(entry).data, "position": place},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=True, methods=['post'])
+    def leave(self, request, pk=None):
+        entry = self.get_object()
+        if entry.email != request.data.get('email'):
+            return Response(
+                {"error": "Invalid request", "message": "The email the entry was made with is required."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        left = WaitlistEntry.objects.filter(pk=entry.pk, status='WAITING').update(status='LEFT')
+        if not left:
+            return Response(
+                {"error": "Not waiting", "message": "This entry is no longer on the waitlist."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({"message": "Left the waitlist"}, status=status.HTTP_200_OK)
+
+
+async def availability_stream(request):
+    """
+    Server-Sent Events stream of spot changes for ``?gym_class=1,2`` (every
+    class if omitted). Starts with a snapshot of upcoming slots, then pushes
+    each change. Needs an ASGI server (gym_project.asgi).
+    """
+    try:
+        gym_class_ids = {int(pk) for pk in request.GET.get('gym_class', '').split(',') if pk}
+    except ValueError:
+        return JsonResponse(
+            {"error": "Invalid request", "message": "gym_class must be a comma-separated list of ids."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    broker = get_broker()
+    try:
+        subscription = broker.subscribe(gym_class_ids)
+    except SubscriberLimitReached:
+        return JsonResponse(
+            {"error": "Unavailable", "message": "Too many open availability streams."},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    response = StreamingHttpResponse(
+        _availability_events(broker, subscription), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _sse(event):
+    return f"event: availability\ndata: {json.dumps(event)}\n\n"
+
+
+async def _availability_events(broker, subscription):
+    heartbeat = get_stream_settings()['HEARTBEAT_SECONDS']
+    try:
+        # Subscribed before the snapshot is read, so no change can slip between them
+        for event in await sync_to_async(current_availability)(subscription.gym_class_ids):
+            yield _sse(event)
+        while True:
+            event = await subscription.get(heartbeat)
+            if event is None:
+                yield ": heartbeat\n\n"
+            elif event is EVICTED:
+                yield "event: evicted\ndata: {}\n\n"
+                return
+            else:
+                yield _sse(event)
+    finally:
+        broker.unsubscribe(subscription)
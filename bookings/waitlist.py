@@ -0,0 +1,123 @@
+import logging
+import operator
+import uuid
+from functools import reduce
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Exists, F, OuterRef, Q, Value, When, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .emails import send_waitlist_promotions
+from .models import Booking, TimeSlot, WaitlistEntry
+
+logger = logging.getLogger(__name__)
+
+
+def position(entry):
+    """
+    1-based place of a waiting entry in its slot's queue.
+    """
+    return WaitlistEntry.objects.filter(
+        time_slot_id=entry.time_slot_id, status='WAITING', created_at__lte=entry.created_at
+    ).exclude(created_at=entry.created_at, id__gt=entry.id).count()
+
+
+def leave_waitlists(bookings):
+    """
+    Close the waiting entries of members who have just booked those slots
+    themselves, so cancelling later does not promote them straight back
+    in. One UPDATE; returns the number of entries closed.
+    """
+    if not bookings:
+        return 0
+    booked = reduce(operator.or_, (Q(email=booking.email, time_slot_id=booking.time_slot_id) for booking in bookings))
+    return WaitlistEntry.objects.filter(booked, status='WAITING').update(status='LEFT')
+
+
+def promote_waitlist(time_slot_ids):
+    """
+    Fill the free spots of ``time_slot_ids`` from their waitlists, oldest
+    entry first, and queue a notification for each promoted member. Works
+    on any number of slots with a fixed number of queries. Call it inside
+    the transaction that freed the spots; returns the new bookings.
+    """
+    if not time_slot_ids:
+        return []
+    try:
+        with transaction.atomic():
+            return _promote(time_slot_ids)
+    except IntegrityError:
+        # A promoted member booked the slot directly in the meantime; the
+        # spots stay free and are filled by the next promotion.
+        logger.warning("Waitlist promotion for time slots %s hit a duplicate booking", list(time_slot_ids))
+        return []
+
+
+def _promote(time_slot_ids):
+    now = timezone.now()
+    # Slot rows are locked in id order, so promoters queue up per slot
+    # instead of deadlocking, and the free spot counts cannot change under us.
+    time_slots = {
+        time_slot.pk: time_slot
+        for time_slot in TimeSlot.objects.select_for_update(of=('self',)).select_related('gym_class')
+        .filter(pk__in=time_slot_ids, is_available=True, available_spots__gt=0, start_time__gt=now)
+        .order_by('pk')
+    }
+    if not time_slots:
+        return []
+
+    already_booked = Booking.objects.filter(
+        email=OuterRef('email'), time_slot_id=OuterRef('time_slot_id'), status__in=['PENDING', 'CONFIRMED']
+    )
+    # Members confirmed in the slot some other way (the admin, or before
+    # leave_waitlists existed) leave its queue. A live hold may still
+    # lapse, so its member is only skipped below.
+    WaitlistEntry.objects.filter(time_slot_id__in=time_slots, status='WAITING').filter(
+        Exists(already_booked.filter(status='CONFIRMED'))
+    ).update(status='LEFT')
+    # The first N waiting entries of every slot, N being its free spots, in one query
+    next_in_line = (
+        WaitlistEntry.objects.filter(time_slot_id__in=time_slots, status='WAITING')
+        .exclude(Exists(already_booked))
+        .annotate(
+            free_spots=F('time_slot__available_spots'),
+            place=Window(RowNumber(), partition_by=F('time_slot_id'), order_by=[F('created_at').asc(), F('id').asc()]),
+        )
+        .filter(place__lte=F('free_spots'))
+        .values_list('pk', flat=True)
+    )
+    entries = list(
+        WaitlistEntry.objects.select_for_update()
+        .filter(pk__in=list(next_in_line), status='WAITING')
+        .order_by('time_slot_id', 'created_at', 'id')
+    )
+    if not entries:
+        return []
+
+    bookings = [
+        Booking(
+            booking_reference=f"GYM-{uuid.uuid4().hex[:8].upper()}",
+            first_name=entry.first_name, last_name=entry.last_name, email=entry.email, phone=entry.phone,
+            special_requests=entry.special_requests, status='CONFIRMED',
+            gym_class=time_slots[entry.time_slot_id].gym_class, time_slot=time_slots[entry.time_slot_id],
+        )
+        for entry in entries
+    ]
+    Booking.objects.bulk_create(bookings)
+    WaitlistEntry.objects.filter(pk__in=[entry.pk for entry in entries]).update(
+        status='PROMOTED',
+        promoted_at=now,
+        booking_reference=Case(
+            *[When(pk=entry.pk, then=Value(booking.booking_reference)) for entry, booking in zip(entries, bookings)]
+        ),
+    )
+
+    taken = {}
+    for entry in entries:
+        taken[entry.time_slot_id] = taken.get(entry.time_slot_id, 0) + 1
+    for time_slot_id, count in taken.items():
+        # Cannot fail: the slot is locked and had at least this many spots
+        TimeSlot.objects.claim_spots(time_slot_id, count)
+
+    send_waitlist_promotions(bookings)
+    return bookings
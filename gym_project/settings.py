@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 
 import os
 from pathlib import Path
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -46,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'bookings.metrics.MetricsMiddleware',
+    'bookings.routers.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -90,6 +93,19 @@ DATABASES = {
     }
 }
 
+# Read replicas: set DB_REPLICA_HOSTS to a comma-separated host list.
+# Safe reads of the schedule endpoints and admin list pages go to a replica
+# (bookings.routers); clients stay on the primary for REPLICA_PIN_SECONDS
+# after they write.
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['bookings.routers.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -128,11 +144,54 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'gym-booking',
+        'OPTIONS': {
+            # Entries beyond MAX_ENTRIES are evicted, 1/CULL_FREQUENCY at a time
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 10000)),
+            'CULL_FREQUENCY': 3,
+        },
+    }
+}
+
+# Versioned response cache for /api/classes/ and /api/timeslots/ (bookings.cache)
+SCHEDULE_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': int(os.environ.get('SCHEDULE_CACHE_TIMEOUT', 30)),
+    'KEY_PREFIX': 'schedule',
+}
+
+# Server-Sent Events availability stream (bookings.events)
+AVAILABILITY_STREAM = {
+    'BACKEND': 'bookings.events.InProcessBroker',
+    'QUEUE_SIZE': 100,
+    'HEARTBEAT_SECONDS': 15,
+    'MAX_SUBSCRIBERS': 5000,
+}
+
+# Addresses allowed to scrape /api/metrics/ (bookings.metrics)
+METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:5500",
 ]
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed', 'Retry-After']
+
+# Responses to POST /api/bookings/ sent with an Idempotency-Key header are
+# replayed to retries for this long (bookings.idempotency)
+IDEMPOTENCY = {
+    'TTL_SECONDS': 24 * 60 * 60,
+}
 
 # Email Configuration
 import os
@@ -144,8 +203,75 @@ EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = 'Gym Fitness <noreply@example.com>'
 
+# Background email delivery (bookings.delivery)
+EMAIL_DELIVERY = {
+    'WORKERS': int(os.environ.get('EMAIL_DELIVERY_WORKERS', 2)),
+    'QUEUE_SIZE': 1000,
+    'ENQUEUE_TIMEOUT': 1.0,
+    'MAX_RETRIES': 3,
+    'RETRY_BACKOFF': 1.0,
+    'IDLE_TIMEOUT': 30.0,
+}
+
+# Transactional email outbox (python manage.py dispatch_outbox)
+EMAIL_OUTBOX = {
+    'BATCH_SIZE': 100,
+    'LEASE_SECONDS': 300,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BACKOFF': 60,
+}
+
+# POST /api/bookings/hold/ reserves a spot for this long; lapsed holds are
+# released by python manage.py release_expired_holds --loop
+BOOKING_HOLDS = {
+    'HOLD_SECONDS': 300,
+    'BATCH_SIZE': 500,
+}
+
+# Class reminder emails (python manage.py send_reminders --loop)
+BOOKING_REMINDERS = {
+    'HOURS_BEFORE': 24,
+    'BATCH_SIZE': 100,
+    'INTERVAL_SECONDS': 300,
+}
+
+# Finished slots and their bookings older than this move to the archive
+# tables (python manage.py archive_bookings)
+BOOKING_ARCHIVE = {
+    'RETENTION_DAYS': 365,
+    'BATCH_SIZE': 500,
+    'PAUSE_SECONDS': 0,
+}
+
+# Token bucket throttling of booking and contact submissions, per client
+# IP and per email (bookings.throttling). STORE 'cache' shares the buckets
+# between workers through CACHE_ALIAS.
+THROTTLING = {
+    'ENABLED': os.environ.get('THROTTLING_ENABLED', '1') == '1',
+    'STORE': os.environ.get('THROTTLING_STORE', 'memory'),
+    'CACHE_ALIAS': 'default',
+    'RATES': {
+        'booking': '20/min',
+        'contact': '5/min',
+    },
+}
+
+# With BUFFERED on, contact submissions are answered 202 and saved in
+# batches by a background thread; repeats of a message sent in the last
+# DEDUPE_SECONDS are dropped (bookings.ingest).
+CONTACT_INGEST = {
+    'BUFFERED': os.environ.get('CONTACT_INGEST_BUFFERED', '0') == '1',
+    'BATCH_SIZE': 100,
+    'FLUSH_INTERVAL': 1.0,
+    'QUEUE_SIZE': 10000,
+    'DEDUPE_SECONDS': 600,
+}
+
 # DRF Configuration
 REST_FRAMEWORK = {
+    # Proxies in front of the app. Throttles key on the client address,
+    # and with None DRF would trust a client-supplied X-Forwarded-For.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
     'DEFAULT_PERMISSION_CLASSES': [